@@ -1,12 +1,37 @@
+import time
+
+# Marcado antes dos demais imports para medir o tempo de inicialização
+INICIO = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, messagebox
-import requests
+from tkinter import ttk, messagebox, filedialog
 import os
+import sys
 import json
-from PIL import Image, ImageTk
+import queue
+import importlib
+import threading
 from datetime import datetime
-from num2words import num2words
-from babel.numbers import format_currency
+from concurrent.futures import ThreadPoolExecutor
+
+import cnpj_core
+from cnpj_core import caminhos
+from cnpj_core.cache import CacheConsultas, CACHE_TTL_HORAS
+from cnpj_core.formatacao import ESQUEMA_SOCIO, ESQUEMA_INSCRICAO
+from cnpj_core.cliente import ClienteCNPJa, LimitadorTaxa, LIMITE_POR_MINUTO, TIMEOUT_CONEXAO, TIMEOUT_LEITURA
+from cnpj_core.validacao import limpar_cnpj, validar_cnpj
+from cnpj_core.historico import HistoricoDB
+from cnpj_core.persistencia import ArquivoJSON
+from cnpj_core.lote import ConsultaLote, ler_cnpjs
+from cnpj_core import exportacao
+from cnpj_core.metricas import Metricas, ETAPAS_REDE, ETAPAS_APLICATIVO
+from cnpj_core.relacionadas import IndiceSocios, NIVEIS_MAXIMO
+from cnpj_core.busca import IndiceBusca
+from cnpj_core.snapshots import BaseSnapshots
+from cnpj_core.monitoramento import ListaMonitoramento, Monitor, MONITOR_POR_MINUTO
+from cnpj_core.antecipacao import Antecipador
+from cnpj_core.provedores import PROVEDORES, PROVEDORES_PADRAO, criar_provedores
+from cnpj_core.relatorios import RelatorioCarteira, RELATORIOS, salvar_relatorios
 
 # Configuração de estilo moderno
 BG_COLOR = "#f0f0f0"
@@ -15,6 +40,26 @@ ACCENT_COLOR = "#4a6fa5"
 ENTRY_COLOR = "#ffffff"
 TEXT_BG = "#ffffff"
 
+# Acompanhamento da consulta em segundo plano
+INTERVALO_VERIFICACAO_MS = 50
+
+# Janela de histórico: linhas carregadas por vez ao rolar
+HISTORICO_PAGINA = 200
+HISTORICO_ATRASO_BUSCA_MS = 150
+
+# Janela de busca por nome: resultados exibidos
+BUSCA_RESULTADOS = 100
+
+# Aba Relacionadas: empresas carregadas por vez
+RELACIONADAS_PAGINA = 200
+
+# Alertas do monitoramento chegam por uma fila lida periodicamente
+INTERVALO_ALERTAS_MS = 2000
+
+# Janela de diagnóstico: atualização enquanto estiver aberta
+INTERVALO_DIAGNOSTICO_MS = 1000
+
+
 class CNPJApp:
     def __init__(self, root):
         self.root = root
@@ -28,6 +73,54 @@ class CNPJApp:
         # Carregar preferências
         self.preferences = self.load_preferences()
         
+        # Cache local das respostas (funciona também sem internet)
+        self.cache = CacheConsultas(
+            self.get_cache_path(),
+            ttl_horas=float(self.preferences.get("cache_ttl_horas", CACHE_TTL_HORAS))
+        )
+        
+        # Histórico de consultas (migra o antigo arquivo JSON na primeira execução)
+        self.historico = self.abrir_historico()
+        
+        # Índice de sócios das empresas consultadas (aba Relacionadas)
+        self.indice_socios = self.abrir_indice_socios()
+        
+        # Índice de busca por nome das empresas já vistas (Histórico > Buscar empresas)
+        self.indice_busca = self.abrir_indice_busca()
+        
+        # Cópia por coluna de cada resposta obtida (python -m cnpj_core.snapshots)
+        self.snapshots = self.abrir_snapshots()
+        
+        # Limite de taxa compartilhado entre consultas individuais e em lote
+        self.limitador = LimitadorTaxa(float(self.preferences.get("limite_por_minuto", LIMITE_POR_MINUTO)))
+        self.metricas = Metricas()
+        self._cliente = None
+        self._cliente_lock = threading.Lock()
+        
+        # Consultas rodam em segundo plano para não travar a interface
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="consulta")
+        self.consulta_atual = 0
+        self.consulta_pendente = None
+        self.future_pendente = None
+        self.parar_pendente = None
+        self.root.protocol("WM_DELETE_WINDOW", self.fechar)
+        
+        # Monitoramento de CNPJs em segundo plano (menu Monitoramento)
+        self.monitoramento = None
+        self.monitor = None
+        self.alertas_novos = queue.Queue()
+        self.monitoramento_var = tk.BooleanVar(value=self.preferences.get("monitoramento_ativo", False))
+        
+        # Antecipação de consultas em segundo plano (menu Cache, desligada por padrão)
+        self.antecipador = None
+        self.antecipar_var = tk.BooleanVar(value=self.preferences.get("antecipar_consultas", False))
+        
+        # APIs consultadas (menu Preferências > Provedores); a CNPJá vem primeiro
+        # e é a única ligada por padrão, assim como a repetição em outro provedor
+        ativos = self.preferences.get("provedores_ativos", list(PROVEDORES_PADRAO))
+        self.provedores_vars = {nome: tk.BooleanVar(value=nome in ativos) for nome in PROVEDORES}
+        self.reforco_var = tk.BooleanVar(value=self.preferences.get("reforco_provedores", False))
+        
         # Adicionando MenuStrip
         self.create_menu()
         
@@ -35,6 +128,50 @@ class CNPJApp:
         
         # Definir foco na textbox ao iniciar
         self.cnpj_entry.focus_set()
+        
+        # Dependências pesadas carregam depois que a janela já está na tela
+        self.root.after_idle(self.precarregar_dependencias)
+        if self.monitoramento_var.get():
+            self.root.after_idle(self.iniciar_monitor)
+    
+    @property
+    def cliente(self):
+        # Criado sob demanda (importa requests); compartilhado pelas consultas
+        with self._cliente_lock:
+            if self._cliente is None:
+                self._cliente = ClienteCNPJa(
+                    cache=self.cache, limitador=self.limitador, timeout=self.get_timeout(),
+                    http2=bool(self.preferences.get("http2", False)),
+                    base_local=self.abrir_base_local(), metricas=self.metricas,
+                    indice_socios=self.indice_socios, indice_busca=self.indice_busca, snapshots=self.snapshots,
+                    provedores=criar_provedores(PROVEDORES, self.limitador),
+                    reforco=self.reforco_var.get()
+                )
+                self.aplicar_provedores(self._cliente)
+            return self._cliente
+    
+    def abrir_base_local(self):
+        # Base importada com "python -m cnpj_core.receita", consultada antes da API
+        caminho = caminhos.caminho_base_receita()
+        if not self.preferences.get("usar_base_local", True) or not os.path.exists(caminho):
+            return None
+        try:
+            from cnpj_core.receita import BaseReceita
+            return BaseReceita(caminho)
+        except Exception as e:
+            print(f"Erro ao abrir base local: {e}")
+            return None
+    
+    def precarregar_dependencias(self):
+        def carregar():
+            try:
+                self.cliente
+                cnpj_core.format_currency(0)  # Carrega os dados de localidade do Babel
+                importlib.import_module("num2words")
+            except Exception as e:
+                print(f"Erro ao pré-carregar dependências: {e}")
+        
+        threading.Thread(target=carregar, name="precarregar", daemon=True).start()
     
     def load_icon(self):
         try:
@@ -50,35 +187,99 @@ class CNPJApp:
     
     def get_preferences_path(self):
         # Salvar em Documentos (1)
-        documents_path = os.path.join(os.path.expanduser('~'), 'Documents')
-        return os.path.join(documents_path, 'CNPJConsult_preferences.json')
+        return caminhos.caminho_preferencias()
     
     def get_historico_path(self):
-        documents_path = os.path.join(os.path.expanduser('~'), 'Documents')
-        return os.path.join(documents_path, 'HistoricoConsult_preferences.json')
+        return caminhos.caminho_historico_json()
+    
+    def get_historico_db_path(self):
+        return caminhos.caminho_historico_db()
+    
+    def abrir_historico(self):
+        try:
+            caminho = self.get_historico_db_path()
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            historico = HistoricoDB(caminho)
+        except Exception as e:
+            print(f"Erro ao abrir histórico: {e}")
+            return None
+        try:
+            historico.migrar_json(self.get_historico_path())
+        except Exception as e:
+            print(f"Erro ao migrar histórico: {e}")
+        return historico
+    
+    def abrir_indice_socios(self):
+        try:
+            return IndiceSocios(caminhos.caminho_socios())
+        except Exception as e:
+            print(f"Erro ao abrir índice de sócios: {e}")
+            return None
+    
+    def abrir_indice_busca(self):
+        try:
+            return IndiceBusca(caminhos.caminho_busca())
+        except Exception as e:
+            print(f"Erro ao abrir índice de busca: {e}")
+            return None
+    
+    def abrir_snapshots(self):
+        try:
+            return BaseSnapshots(caminhos.caminho_snapshots())
+        except Exception as e:
+            print(f"Erro ao abrir snapshots: {e}")
+            return None
+    
+    def get_cache_path(self):
+        return caminhos.caminho_cache()
     
     def load_preferences(self):
+        # Gravação atômica e com trava entre instâncias (cnpj_core.persistencia)
         try:
-            pref_path = self.get_preferences_path()
-            if os.path.exists(pref_path):
-                with open(pref_path, 'r') as f:
-                    return json.load(f)
+            self.arquivo_preferencias = ArquivoJSON(self.get_preferences_path(), padrao=self.preferencias_padrao())
+            return self.arquivo_preferencias.dados
         except Exception as e:
             print(f"Erro ao carregar preferências: {e}")
+            self.arquivo_preferencias = None
+            return self.preferencias_padrao()
+    
+    @staticmethod
+    def preferencias_padrao():
         return {
             "copiar_nome_empresarial": True,
             "copiar_cnpj": True,
             "copiar_telefone": True,
             "copiar_endereco": True,
-            "alertas_situacao": False
+            "alertas_situacao": False,
+            "timeout_conexao": TIMEOUT_CONEXAO,
+            "timeout_leitura": TIMEOUT_LEITURA,
+            "cache_ttl_horas": CACHE_TTL_HORAS,
+            "limite_por_minuto": LIMITE_POR_MINUTO,
+            "http2": False,
+            "usar_base_local": True,
+            "monitoramento_ativo": False,
+            "antecipar_consultas": False,
+            "provedores_ativos": list(PROVEDORES_PADRAO),
+            "reforco_provedores": False,
+            "monitor_por_minuto": MONITOR_POR_MINUTO
         }
     
-    def save_preferences(self):
+    def get_timeout(self):
+        conexao = float(self.preferences.get("timeout_conexao", TIMEOUT_CONEXAO))
+        leitura = float(self.preferences.get("timeout_leitura", TIMEOUT_LEITURA))
+        return (conexao, leitura)
+    
+    def save_preferences(self, agendar=False):
+        # agendar=True junta alterações seguidas numa única gravação
         try:
-            pref_path = self.get_preferences_path()
-            with open(pref_path, 'w') as f:
-                json.dump(self.preferences, f)
-            return pref_path
+            if self.arquivo_preferencias is None:
+                self.arquivo_preferencias = ArquivoJSON(self.get_preferences_path())
+                self.arquivo_preferencias.dados.update(self.preferences)
+                self.preferences = self.arquivo_preferencias.dados
+            if agendar:
+                self.arquivo_preferencias.agendar()
+                return self.arquivo_preferencias.caminho
+            return self.arquivo_preferencias.salvar()
         except Exception as e:
             messagebox.showerror("Erro", f"Falha ao salvar preferências: {e}")
             return None
@@ -89,19 +290,64 @@ class CNPJApp:
         # Menu Preferências
         pref_menu = tk.Menu(menubar, tearoff=0)
         pref_menu.add_command(label="Salvar preferências", command=self.salvar_preferencias)
+        provedores_menu = tk.Menu(pref_menu, tearoff=0)
+        for nome, var in self.provedores_vars.items():
+            provedores_menu.add_checkbutton(label=PROVEDORES[nome].titulo, variable=var,
+                                            command=lambda nome=nome: self.alternar_provedor(nome))
+        provedores_menu.add_separator()
+        provedores_menu.add_checkbutton(label="Repetir em outro provedor quando demorar", variable=self.reforco_var,
+                                        command=self.alternar_provedor)
+        pref_menu.add_cascade(label="Provedores", menu=provedores_menu)
         menubar.add_cascade(label="Preferências", menu=pref_menu)
         
         # Menu Histórico
         historico_menu = tk.Menu(menubar, tearoff=0)
         historico_menu.add_command(label="Ver Histórico", command=self.mostrar_historico)
+        historico_menu.add_command(label="Buscar empresas... (Ctrl+F)", command=self.mostrar_busca)
         menubar.add_cascade(label="Histórico", menu=historico_menu)
         
+        # Menu Lote
+        lote_menu = tk.Menu(menubar, tearoff=0)
+        lote_menu.add_command(label="Consulta em lote...", command=self.consulta_em_lote)
+        lote_menu.add_command(label="Relatórios da carteira...", command=self.relatorio_carteira)
+        menubar.add_cascade(label="Lote", menu=lote_menu)
+        
+        # Menu Exportar
+        exportar_menu = tk.Menu(menubar, tearoff=0)
+        exportar_menu.add_command(label="Consulta atual...", command=lambda: self.exportar("atual"))
+        exportar_menu.add_command(label="Todo o histórico...", command=lambda: self.exportar("historico"))
+        exportar_menu.add_command(label="Resultado de lote...", command=lambda: self.exportar("lote"))
+        menubar.add_cascade(label="Exportar", menu=exportar_menu)
+        
+        # Menu Monitoramento
+        monitor_menu = tk.Menu(menubar, tearoff=0)
+        monitor_menu.add_command(label="Monitorar CNPJ atual", command=self.monitorar_cnpj_atual)
+        monitor_menu.add_command(label="Importar lista para monitorar...", command=self.importar_monitoramento)
+        monitor_menu.add_command(label="Alertas", command=self.mostrar_alertas)
+        monitor_menu.add_checkbutton(label="Verificar em segundo plano", variable=self.monitoramento_var,
+                                     command=self.alternar_monitoramento)
+        menubar.add_cascade(label="Monitoramento", menu=monitor_menu)
+        
+        # Menu Cache
+        cache_menu = tk.Menu(menubar, tearoff=0)
+        cache_menu.add_command(label="Atualizar consulta atual", command=lambda: self.consultar_cnpj(forcar=True))
+        cache_menu.add_command(label="Limpar cache", command=self.limpar_cache)
+        cache_menu.add_checkbutton(label="Antecipar consultas em segundo plano", variable=self.antecipar_var,
+                                   command=self.alternar_antecipacao)
+        menubar.add_cascade(label="Cache", menu=cache_menu)
+        
+        # Menu Diagnóstico
+        diagnostico_menu = tk.Menu(menubar, tearoff=0)
+        diagnostico_menu.add_command(label="Tempos e uso da API", command=self.mostrar_diagnostico)
+        menubar.add_cascade(label="Diagnóstico", menu=diagnostico_menu)
+        
         self.root.config(menu=menubar)
+        self.root.bind_all("<Control-f>", lambda e: self.mostrar_busca())
     
     def salvar_preferencias(self):
         top = tk.Toplevel(self.root)
         top.title("Salvar Preferências")
-        top.geometry("300x250")
+        top.geometry("300x330")
         top.resizable(False, False)
         
         try:
@@ -116,6 +362,8 @@ class CNPJApp:
         self.copiar_telefone_var = tk.BooleanVar(value=self.preferences.get("copiar_telefone", True))
         self.copiar_endereco_var = tk.BooleanVar(value=self.preferences.get("copiar_endereco", True))
         self.alertas_var = tk.BooleanVar(value=self.preferences.get("alertas_situacao", False))
+        self.timeout_conexao_var = tk.StringVar(value=str(self.preferences.get("timeout_conexao", TIMEOUT_CONEXAO)))
+        self.timeout_leitura_var = tk.StringVar(value=str(self.preferences.get("timeout_leitura", TIMEOUT_LEITURA)))
         
         tk.Checkbutton(top, text="Copiar Nome empresarial", variable=self.copiar_nome_var, font=('Arial', 11)).pack(anchor=tk.W, pady=(10, 0), padx=20)
         tk.Checkbutton(top, text="Copiar CNPJ", variable=self.copiar_cnpj_var, font=('Arial', 11)).pack(anchor=tk.W, pady=(10, 0), padx=20)
@@ -123,44 +371,497 @@ class CNPJApp:
         tk.Checkbutton(top, text="Copiar Endereço", variable=self.copiar_endereco_var, font=('Arial', 11)).pack(anchor=tk.W, pady=(10, 0), padx=20)
         tk.Checkbutton(top, text="Alertas de Situação Cadastral", variable=self.alertas_var, font=('Arial', 11)).pack(anchor=tk.W, pady=(10, 0), padx=20)
         
+        timeout_frame = tk.Frame(top)
+        timeout_frame.pack(anchor=tk.W, pady=(10, 0), padx=20)
+        tk.Label(timeout_frame, text="Timeout conexão (s):", font=('Arial', 10)).grid(row=0, column=0, sticky=tk.W)
+        tk.Spinbox(timeout_frame, from_=1, to=120, width=5, textvariable=self.timeout_conexao_var).grid(row=0, column=1, padx=5)
+        tk.Label(timeout_frame, text="Timeout leitura (s):", font=('Arial', 10)).grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        tk.Spinbox(timeout_frame, from_=1, to=300, width=5, textvariable=self.timeout_leitura_var).grid(row=1, column=1, padx=5, pady=(5, 0))
+        
         tk.Button(top, text="Salvar", command=lambda: self.save_prefs_and_close(top), 
                  bg=ACCENT_COLOR, fg="white", font=('Arial', 11), padx=20).pack(pady=20)
     
     def save_prefs_and_close(self, top):
-        self.preferences = {
+        try:
+            timeout_conexao = float(self.timeout_conexao_var.get())
+            timeout_leitura = float(self.timeout_leitura_var.get())
+            if timeout_conexao <= 0 or timeout_leitura <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showwarning("Timeout inválido", "Os timeouts devem ser números positivos (em segundos).", parent=top)
+            return
+        self.preferences.update({
             "copiar_nome_empresarial": self.copiar_nome_var.get(),
             "copiar_cnpj": self.copiar_cnpj_var.get(),
             "copiar_telefone": self.copiar_telefone_var.get(),
             "copiar_endereco": self.copiar_endereco_var.get(),
-            "alertas_situacao": self.alertas_var.get()
-        }
+            "alertas_situacao": self.alertas_var.get(),
+            "timeout_conexao": timeout_conexao,
+            "timeout_leitura": timeout_leitura
+        })
         saved_path = self.save_preferences()
         top.destroy()
         if saved_path:
             messagebox.showinfo("Sucesso", f"Preferências salvas com sucesso em:\n{saved_path}")
+    
+    def consulta_em_lote(self):
+        entrada = filedialog.askopenfilename(
+            parent=self.root, title="Arquivo com CNPJs",
+            filetypes=[("CSV ou TXT", "*.csv *.txt"), ("Todos os arquivos", "*.*")]
+        )
+        if not entrada:
+            return
+        saida = filedialog.asksaveasfilename(
+            parent=self.root, title="Salvar resultados", defaultextension=".csv",
+            confirmoverwrite=False,
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")]
+        )
+        if not saida:
+            return
+        
+        try:
+            cnpjs, invalidos = ler_cnpjs(entrada)
+            lote = ConsultaLote(cnpjs, saida, self.cliente, timeout=self.get_timeout(), invalidos=invalidos)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível iniciar o lote: {e}")
+            return
+        
+        top = tk.Toplevel(self.root)
+        top.title("Consulta em Lote")
+        top.geometry("420x170")
+        top.resizable(False, False)
+        
+        barra = ttk.Progressbar(top, length=380, maximum=max(1, lote.total))
+        barra.pack(pady=(20, 10), padx=20)
+        progresso_label = ttk.Label(top, text="Iniciando...", font=('Arial', 10))
+        progresso_label.pack(padx=20)
+        btn_parar = ttk.Button(top, text="Parar", command=lote.parar)
+        btn_parar.pack(pady=15)
+        top.protocol("WM_DELETE_WINDOW", lambda: (lote.parar(), top.destroy()))
+        
+        thread = threading.Thread(target=lote.executar, name="lote", daemon=True)
+        thread.start()
+        self.acompanhar_lote(lote, thread, top, barra, progresso_label, btn_parar)
+    
+    def acompanhar_lote(self, lote, thread, top, barra, progresso_label, btn_parar):
+        if not top.winfo_exists():
+            return
+        p = lote.progresso()
+        barra['value'] = p['feitos']
+        texto = f"{p['feitos']}/{p['total']} consultados - {p['por_segundo'] * 60:.1f} consultas/min"
+        if p['pulados']:
+            texto += f" - {p['pulados']} já feitos"
+        if p['erros']:
+            texto += f" - {p['erros']} erros"
+        if thread.is_alive():
+            if p['restante_s'] is not None:
+                texto += f"\nTempo restante estimado: {int(p['restante_s'] // 60)} min"
+            progresso_label.config(text=texto)
+            self.root.after(500, self.acompanhar_lote, lote, thread, top, barra, progresso_label, btn_parar)
+        else:
+            progresso_label.config(text=texto + "\nConcluído.")
+            btn_parar.config(text="Fechar", command=top.destroy)
+    
+    def relatorio_carteira(self):
+        # CNAEs, inscrições inativas por UF e capital por porte de uma lista
+        # de CNPJs, atualizados enquanto as consultas chegam
+        entrada = filedialog.askopenfilename(
+            parent=self.root, title="Arquivo com CNPJs",
+            filetypes=[("CSV ou TXT", "*.csv *.txt"), ("Todos os arquivos", "*.*")]
+        )
+        if not entrada:
+            return
+        try:
+            cnpjs, invalidos = ler_cnpjs(entrada)
+            relatorio = RelatorioCarteira(cnpjs, self.cliente, timeout=self.get_timeout())
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível iniciar o relatório: {e}")
+            return
+        for _ in invalidos:
+            relatorio.agregados.acrescentar("inválido")
+        
+        top = tk.Toplevel(self.root)
+        top.title("Relatórios da Carteira")
+        top.geometry("760x520")
+        
+        progresso_label = ttk.Label(top, text="Iniciando...", font=('Arial', 10))
+        progresso_label.pack(fill=tk.X, padx=10, pady=(10, 5))
+        notebook = ttk.Notebook(top)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        arvores = {}
+        for nome, (titulo, colunas) in RELATORIOS.items():
+            frame = ttk.Frame(notebook)
+            notebook.add(frame, text=titulo)
+            tree = ttk.Treeview(frame, columns=colunas, show="headings")
+            for col in colunas:
+                tree.heading(col, text=col)
+                tree.column(col, width=320 if col == "Descrição" else 110,
+                            anchor=tk.W if col in ("Descrição", "Porte", "UF", "CNAE") else tk.E)
+            scroll_y = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+            tree.configure(yscrollcommand=scroll_y.set)
+            scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+            tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            arvores[nome] = tree
+        
+        btn_frame = ttk.Frame(top)
+        btn_frame.pack(pady=5)
+        btn_parar = ttk.Button(btn_frame, text="Parar", command=relatorio.parar)
+        btn_parar.pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Salvar...",
+                   command=lambda: self.salvar_relatorio(relatorio, top)).pack(side=tk.LEFT, padx=5)
+        top.protocol("WM_DELETE_WINDOW", lambda: (relatorio.parar(), top.destroy()))
+        
+        thread = threading.Thread(target=relatorio.executar, name="relatorio", daemon=True)
+        thread.start()
+        self.acompanhar_relatorio(relatorio, thread, top, arvores, progresso_label, btn_parar, None)
+    
+    def acompanhar_relatorio(self, relatorio, thread, top, arvores, progresso_label, btn_parar, versao):
+        if not top.winfo_exists():
+            return
+        # Só redesenha as tabelas quando chegou resultado novo
+        if relatorio.agregados.versao != versao:
+            versao = relatorio.agregados.versao
+            for nome, linhas in relatorio.agregados.tabelas(formatar=True).items():
+                self.preencher_tree(arvores[nome], linhas)
+        p = relatorio.progresso()
+        texto = f"{p['feitos']}/{p['total']} consultados - {p['por_segundo'] * 60:.1f} consultas/min"
+        if p['erros']:
+            texto += f" - {p['erros']} erros"
+        if thread.is_alive():
+            if p['restante_s'] is not None:
+                texto += f" - restam {int(p['restante_s'] // 60)} min"
+            progresso_label.config(text=texto)
+            self.root.after(500, self.acompanhar_relatorio, relatorio, thread, top, arvores, progresso_label,
+                            btn_parar, versao)
+        else:
+            progresso_label.config(text=texto + " - Concluído.")
+            btn_parar.config(text="Fechar", command=top.destroy)
+    
+    def salvar_relatorio(self, relatorio, top):
+        saida = filedialog.asksaveasfilename(
+            parent=top, title="Salvar relatórios", defaultextension=".csv",
+            filetypes=[("CSV (um arquivo por relatório)", "*.csv"), ("JSON", "*.json")]
+        )
+        if not saida:
+            return
+        try:
+            arquivos = salvar_relatorios(relatorio.agregados, saida)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível salvar: {e}", parent=top)
+            return
+        messagebox.showinfo("Sucesso", "Relatórios salvos em:\n" + "\n".join(arquivos), parent=top)
+    
+    def exportar(self, origem):
+        if origem == "atual" and not hasattr(self, 'empresa_data'):
+            messagebox.showwarning("Aviso", "Nenhuma consulta para exportar.")
+            return
+        if origem == "historico" and self.historico is None:
+            messagebox.showwarning("Aviso", "Histórico indisponível.")
+            return
+        if origem == "lote":
+            entrada = filedialog.askopenfilename(
+                parent=self.root, title="Resultado do lote",
+                filetypes=[("CSV ou JSON Lines", "*.csv *.jsonl"), ("Todos os arquivos", "*.*")]
+            )
+            if not entrada:
+                return
+        saida = filedialog.asksaveasfilename(
+            parent=self.root, title="Exportar para", defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"), ("Parquet", "*.parquet"), ("Excel", "*.xlsx")]
+        )
+        if not saida:
+            return
+        
+        if origem == "atual":
+            registros = exportacao.registros_empresa(self.empresa_data)
+        elif origem == "historico":
+            registros = exportacao.registros_historico(self.historico, self.cache)
+        else:
+            registros = exportacao.registros_lote(entrada, self.cache)
+        
+        top = tk.Toplevel(self.root)
+        top.title("Exportação")
+        top.geometry("420x150")
+        top.resizable(False, False)
+        
+        barra = ttk.Progressbar(top, length=380, mode="indeterminate")
+        barra.pack(pady=(20, 10), padx=20)
+        barra.start(15)
+        progresso_label = ttk.Label(top, text="Exportando...", font=('Arial', 10))
+        progresso_label.pack(padx=20)
+        parar = threading.Event()
+        btn_parar = ttk.Button(top, text="Parar", command=parar.set)
+        btn_parar.pack(pady=15)
+        top.protocol("WM_DELETE_WINDOW", lambda: (parar.set(), top.destroy()))
+        
+        # A thread só atualiza `estado`; a janela lê pelo root.after
+        estado = {"feitos": 0, "erro": None}
+        
+        def executar():
+            try:
+                exportacao.exportar(registros, saida, ao_progresso=lambda n: estado.update(feitos=n), parar=parar)
+            except Exception as e:
+                estado["erro"] = e
+        
+        thread = threading.Thread(target=executar, name="exportacao", daemon=True)
+        thread.start()
+        self.acompanhar_exportacao(estado, thread, top, barra, progresso_label, btn_parar, saida)
+    
+    def acompanhar_exportacao(self, estado, thread, top, barra, progresso_label, btn_parar, saida):
+        if not top.winfo_exists():
+            return
+        if thread.is_alive():
+            progresso_label.config(text=f"{estado['feitos']} empresas exportadas...")
+            self.root.after(500, self.acompanhar_exportacao, estado, thread, top, barra, progresso_label, btn_parar, saida)
+            return
+        barra.stop()
+        if estado["erro"] is not None:
+            progresso_label.config(text=f"Erro: {estado['erro']}", wraplength=380)
+        else:
+            progresso_label.config(text=f"{estado['feitos']} empresas exportadas em\n{os.path.basename(saida)}")
+        btn_parar.config(text="Fechar", command=top.destroy)
+    
+    def abrir_monitoramento(self):
+        if self.monitoramento is None:
+            try:
+                self.monitoramento = ListaMonitoramento(caminhos.caminho_monitoramento())
+            except Exception as e:
+                messagebox.showerror("Erro", f"Falha ao abrir a lista de monitoramento: {e}")
+        return self.monitoramento
+    
+    def iniciar_monitor(self):
+        if self.abrir_monitoramento() is None:
+            return
+        if self.monitor is None:
+            self.monitor = Monitor(
+                self.monitoramento, self.cliente,
+                por_minuto=float(self.preferences.get("monitor_por_minuto", MONITOR_POR_MINUTO)),
+                ao_alertar=self.alertas_novos.put
+            )
+        self.monitor.iniciar()
+        self.root.after(INTERVALO_ALERTAS_MS, self.acompanhar_alertas)
+    
+    def alternar_monitoramento(self):
+        self.preferences["monitoramento_ativo"] = self.monitoramento_var.get()
+        self.save_preferences(agendar=True)
+        if self.monitoramento_var.get():
+            self.iniciar_monitor()
+        elif self.monitor is not None:
+            self.monitor.parar()
+    
+    def acompanhar_alertas(self):
+        alertas = []
+        while not self.alertas_novos.empty():
+            alertas.append(self.alertas_novos.get())
+        if alertas:
+            self.definir_status(f"{len(alertas)} novo(s) alerta(s) de monitoramento - menu Monitoramento > Alertas")
+        if self.monitor is not None and self.monitor.thread is not None and self.monitor.thread.is_alive():
+            self.root.after(INTERVALO_ALERTAS_MS, self.acompanhar_alertas)
+    
+    def adicionar_monitoramento(self, cnpjs):
+        if self.abrir_monitoramento() is None:
+            return
+        incluidos = self.monitoramento.adicionar(cnpjs)
+        if self.monitor is not None:
+            self.monitor.acordar()
+        aviso = "" if self.monitoramento_var.get() else "\nAtive \"Verificar em segundo plano\" para acompanhar as mudanças."
+        messagebox.showinfo(
+            "Monitoramento",
+            f"{incluidos} CNPJ(s) incluído(s); {self.monitoramento.contar()} monitorado(s).{aviso}"
+        )
+    
+    def monitorar_cnpj_atual(self):
+        if not hasattr(self, 'empresa_data'):
+            messagebox.showwarning("Aviso", "Nenhum CNPJ consultado ainda.")
+            return
+        self.adicionar_monitoramento([limpar_cnpj(self.empresa_data.get("taxId", ""))])
+    
+    def importar_monitoramento(self):
+        entrada = filedialog.askopenfilename(
+            parent=self.root, title="Arquivo com CNPJs para monitorar",
+            filetypes=[("CSV ou TXT", "*.csv *.txt"), ("Todos os arquivos", "*.*")]
+        )
+        if not entrada:
+            return
+        try:
+            cnpjs, _ = ler_cnpjs(entrada)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível ler o arquivo: {e}")
+            return
+        self.adicionar_monitoramento(cnpjs)
+    
+    def mostrar_alertas(self):
+        if self.abrir_monitoramento() is None:
+            return
+        top = tk.Toplevel(self.root)
+        top.title("Alertas de Monitoramento")
+        top.geometry("900x400")
+        
+        colunas = [("Data", 120), ("CNPJ", 140), ("Empresa", 200), ("Mudança", 130), ("Antes", 150), ("Depois", 150)]
+        tree = ttk.Treeview(top, columns=[c for c, _ in colunas], show="headings")
+        for col, width in colunas:
+            tree.heading(col, text=col)
+            tree.column(col, width=width, anchor=tk.W)
+        tree.tag_configure("novo", font=('Arial', 11, 'bold'))
+        
+        for _, cnpj, nome, data, campo, antes, depois, lido in self.monitoramento.alertas():
+            tree.insert("", tk.END, values=(
+                HistoricoDB.formatar_data(data), self.format_cnpj(cnpj), nome or "", campo, antes or "", depois or ""
+            ), tags=() if lido else ("novo",))
+        
+        scroll_y = ttk.Scrollbar(top, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scroll_y.set)
+        
+        rodape = ttk.Frame(top)
+        rodape.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
+        ttk.Label(rodape, text=f"{self.monitoramento.contar()} CNPJs monitorados", font=('Arial', 9)).pack(side=tk.LEFT, padx=10)
+        ttk.Button(rodape, text="Marcar como lidos",
+                   command=lambda: (self.monitoramento.marcar_lidos(),
+                                    [tree.item(i, tags=()) for i in tree.get_children()])).pack(side=tk.RIGHT, padx=10)
+        
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+    
+    def alternar_provedor(self, nome=None):
+        # Pelo menos um provedor fica ligado
+        if nome is not None and not any(var.get() for var in self.provedores_vars.values()):
+            self.provedores_vars[nome].set(True)
+            messagebox.showwarning("Provedores", "Pelo menos um provedor precisa ficar ativo.")
+            return
+        self.preferences["provedores_ativos"] = [n for n, var in self.provedores_vars.items() if var.get()]
+        self.preferences["reforco_provedores"] = self.reforco_var.get()
+        self.save_preferences(agendar=True)
+        if self._cliente is not None:
+            self.aplicar_provedores(self._cliente)
+    
+    def aplicar_provedores(self, cliente):
+        for provedor in cliente.agendador.provedores:
+            provedor.ativo = self.provedores_vars[provedor.nome].get()
+        cliente.agendador.reforco = self.reforco_var.get()
+    
+    def alternar_antecipacao(self):
+        self.preferences["antecipar_consultas"] = self.antecipar_var.get()
+        self.save_preferences(agendar=True)
+        if not self.antecipar_var.get() and self.antecipador is not None:
+            self.antecipador.parar()
+            self.antecipador = None
+    
+    def antecipar(self, texto):
+        # Chamado ao digitar, colar ou selecionar no histórico; só CNPJs válidos são consultados
+        if not self.antecipar_var.get():
+            return
+        if self.antecipador is None:
+            self.antecipador = Antecipador(self.cliente)
+        self.antecipador.pedir(texto)
+    
+    def limpar_cache(self):
+        try:
+            self.cache.limpar()
+            messagebox.showinfo("Cache", "Cache de consultas limpo.")
+        except Exception as e:
+            messagebox.showerror("Erro", f"Falha ao limpar cache: {e}")
+    
+    def mostrar_diagnostico(self):
+        top = tk.Toplevel(self.root)
+        top.title("Diagnóstico")
+        top.geometry("760x560")
+        
+        resumo_label = ttk.Label(top, font=('Arial', 10), justify=tk.LEFT)
+        resumo_label.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(10, 5))
+        
+        colunas = [("Etapa", 200), ("Qtde", 60), ("Média", 80), ("p50", 80), ("p95", 80), ("p99", 80), ("Máx", 80)]
+        etapas = ttk.Treeview(top, columns=[c for c, _ in colunas], show="headings", height=10)
+        for col, width in colunas:
+            etapas.heading(col, text=col)
+            etapas.column(col, width=width, anchor=tk.W if col == "Etapa" else tk.E)
+        etapas.pack(side=tk.TOP, fill=tk.X, padx=10)
+        
+        ttk.Label(top, text="Erros recentes", font=('Arial', 10, 'bold')).pack(side=tk.TOP, anchor=tk.W, padx=10, pady=(10, 0))
+        erros = ttk.Treeview(top, columns=["Data", "Origem", "Erro"], show="headings", height=6)
+        for col, width in (("Data", 140), ("Origem", 100), ("Erro", 480)):
+            erros.heading(col, text=col)
+            erros.column(col, width=width, anchor=tk.W)
+        
+        rodape = ttk.Frame(top)
+        rodape.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
+        ttk.Button(rodape, text="Copiar (formato Prometheus)",
+                   command=lambda: (self.root.clipboard_clear(),
+                                    self.root.clipboard_append(self.metricas.texto_prometheus()))).pack(side=tk.LEFT, padx=10)
+        ttk.Button(rodape, text="Zerar", command=lambda: (self.metricas.zerar(), atualizar(False))).pack(side=tk.RIGHT, padx=10)
+        erros.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10)
+        
+        def atualizar(repetir=True):
+            if not top.winfo_exists():
+                return
+            resumo = self.metricas.resumo()
+            c = resumo["contadores"]
+            fichas = resumo["medidores"].get("fichas_disponiveis")
+            if fichas is None:
+                fichas = self.limitador.disponiveis()
+            resumo_label.config(text=(
+                f"Tempo médio por consulta: rede/servidor {self.metricas.tempo_medio(ETAPAS_REDE):.0f} ms - "
+                f"limite de taxa {self.metricas.tempo_medio(('espera_limite',)):.0f} ms - "
+                f"aplicativo {self.metricas.tempo_medio(ETAPAS_APLICATIVO):.0f} ms\n"
+                f"Cache/base local: {c.get('acertos', 0)} - API: {c.get('faltas', 0)} - "
+                f"agrupadas: {c.get('agrupadas', 0)} - novas tentativas: {c.get('novas_tentativas', 0)} - "
+                f"antecipadas: {c.get('antecipadas', 0)} (aproveitadas: {c.get('antecipacoes_aproveitadas', 0)})\n"
+                f"Respostas 429: {c.get('respostas_429', 0)} - 5xx: {c.get('respostas_5xx', 0)} - "
+                f"falhas de rede: {c.get('erros_rede', 0)} - conexões abertas: {c.get('conexoes_novas', 0)}\n"
+                f"Recebidos: {c.get('bytes_recebidos', 0) / 1024:.1f} KiB em {c.get('requisicoes', 0)} requisições - "
+                f"fichas disponíveis no limite: {fichas:.1f} de {self.limitador.capacidade}"
+                + self.resumo_provedores(c)
+            ))
+            linhas = []
+            for (nome, rotulos), v in sorted(resumo["medidas"].items()):
+                etapa = nome + "".join(f" ({valor})" for _, valor in rotulos)
+                linhas.append((etapa, v["quantidade"], *(f"{v[k]:.1f} ms" for k in
+                                                         ("media_ms", "p50_ms", "p95_ms", "p99_ms", "maximo_ms"))))
+            self.preencher_tree(etapas, linhas)
+            self.preencher_tree(erros, [(e["data"], e["origem"], f"{e['tipo']}: {e['mensagem']}")
+                                        for e in reversed(resumo["erros"])])
+            if repetir:
+                top.after(INTERVALO_DIAGNOSTICO_MS, atualizar)
+        
+        atualizar()
 
+    def resumo_provedores(self, contadores):
+        if self._cliente is None or len(self._cliente.agendador.provedores) < 2:
+            return ""
+        partes = []
+        for estado in self._cliente.agendador.estado():
+            if not estado["ativo"]:
+                continue
+            texto = f"{PROVEDORES[estado['provedor']].titulo} {estado['fichas']:.1f} fichas"
+            if estado["p95_ms"] is not None:
+                texto += f", p95 {estado['p95_ms']:.0f} ms"
+            if estado["suspenso_s"]:
+                texto += f", suspenso por {estado['suspenso_s']:.0f} s"
+            partes.append(texto)
+        return (f"\nProvedores: {' - '.join(partes)}\n"
+                f"Trocas de provedor: {contadores.get('trocas_provedor', 0)} - "
+                f"repetidas em outro provedor: {contadores.get('reforcos', 0)} "
+                f"(respondidas primeiro por ele: {contadores.get('reforcos_vencedores', 0)})")
+    
     def copiar_informacoes(self):
         if not hasattr(self, 'empresa_data'):
             messagebox.showwarning("Aviso", "Nenhum CNPJ consultado ainda.")
             return
         texto_para_copiar = ""
+        # Mesma projeção da aba de informações e da exportação em lote
+        campos, _ = self.campos_info(self.empresa_data)
 
         if self.preferences.get("copiar_nome_empresarial", True):
-            nome = self.get_nested_value(self.empresa_data, "company.name")
-            fantasia = self.get_nested_value(self.empresa_data, "alias")
-            texto_para_copiar += f"Nome Empresarial: {nome}\nNome Fantasia: {fantasia}\n\n"
+            texto_para_copiar += f"Nome Empresarial: {campos['Nome Empresarial']}\nNome Fantasia: {campos['Nome Fantasia']}\n\n"
         
         if self.preferences.get("copiar_cnpj", True):
             cnpj = self.get_nested_value(self.empresa_data, "taxId")
             texto_para_copiar += f"CNPJ: {self.format_cnpj(cnpj)}\n\n"
         
         if self.preferences.get("copiar_telefone", True):
-            telefone = self.format_phone(self.empresa_data.get("phones", []))
-            texto_para_copiar += f"Telefone: {telefone}\n\n"
+            texto_para_copiar += f"Telefone: {campos['Telefone']}\n\n"
         
         if self.preferences.get("copiar_endereco", True):
-            endereco = self.format_address(self.empresa_data.get("address", {}))
-            texto_para_copiar += f"Endereço:\n{endereco}\n"
+            texto_para_copiar += f"Endereço:\n{campos['Endereço']}\n"
         
         if texto_para_copiar:
             self.root.clipboard_clear()
@@ -171,53 +872,159 @@ class CNPJApp:
     
     def salvar_no_historico(self, nome, cnpj):
         try:
-            cnpj_limpo = ''.join(filter(str.isdigit, cnpj))
-            cnpj_formatado = cnpj_limpo.zfill(14)[:14]
-            historico_path = self.get_historico_path()
-            historico = []
-            
-            if os.path.exists(historico_path):
-                with open(historico_path, 'r') as f:
-                    historico = json.load(f)
-            
-            existe = any(item['cnpj'] == cnpj_formatado for item in historico)
-            if not existe:
-                historico.append({
-                    'nome': nome,
-                    'cnpj': cnpj_formatado,
-                    'data': datetime.now().strftime("%d/%m/%Y %H:%M")
-                })
-                with open(historico_path, 'w') as f:
-                    json.dump(historico, f, indent=4)
-                    
+            cnpj_formatado = limpar_cnpj(cnpj).zfill(14)[:14]
+            if self.historico:
+                self.historico.salvar(nome, cnpj_formatado)
         except Exception as e:
             print(f"Erro ao salvar histórico: {e}")
 
-    def sort_historico(self, tree, historico, sort_type):
+    def sort_historico(self, tree, estado, sort_type=None):
+        # Recomeça a lista com a ordenação/busca atual e carrega só a primeira página
+        if sort_type:
+            estado["ordem"] = sort_type
         tree.delete(*tree.get_children())
+        estado["carregados"] = 0
+        estado["total"] = self.historico.contar(estado["busca"])
+        estado["contador"].config(text=f"{estado['total']} registro(s)")
+        self.carregar_pagina_historico(tree, estado)
+        tree.yview_moveto(0)
+    
+    def carregar_pagina_historico(self, tree, estado):
+        linhas = self.historico.listar(estado["ordem"], estado["busca"], HISTORICO_PAGINA, estado["carregados"])
+        for nome, cnpj, data in linhas:
+            tree.insert("", tk.END, values=(nome, cnpj, self.historico.formatar_data(data)))
+        estado["carregados"] += len(linhas)
+    
+    def rolar_historico(self, tree, estado, scroll_y, primeiro, ultimo):
+        scroll_y.set(primeiro, ultimo)
+        # Perto do fim da lista, busca a próxima página
+        if float(ultimo) >= 0.9 and estado["carregados"] < estado["total"]:
+            self.carregar_pagina_historico(tree, estado)
+    
+    def buscar_historico(self, tree, estado, texto):
+        # Espera o usuário parar de digitar antes de consultar o banco
+        if estado.get("busca_agendada"):
+            tree.after_cancel(estado["busca_agendada"])
         
-        if sort_type == "name_asc":
-            sorted_items = sorted(historico, key=lambda x: x['nome'].upper())
-        elif sort_type == "date_desc":
-            sorted_items = sorted(historico, key=lambda x: datetime.strptime(x['data'], "%d/%m/%Y %H:%M"), reverse=True)
-        elif sort_type == "date_asc":
-            sorted_items = sorted(historico, key=lambda x: datetime.strptime(x['data'], "%d/%m/%Y %H:%M"))
-        else:
-            sorted_items = historico
+        def aplicar():
+            estado["busca_agendada"] = None
+            estado["busca"] = texto.get()
+            self.sort_historico(tree, estado)
         
-        for item in sorted_items:
-            tree.insert("", tk.END, values=(item['nome'], item['cnpj'], item['data']))
+        estado["busca_agendada"] = tree.after(HISTORICO_ATRASO_BUSCA_MS, aplicar)
 
+    def mostrar_busca(self):
+        if self.indice_busca is None:
+            messagebox.showwarning("Busca", "Índice de busca indisponível.")
+            return
+        top = tk.Toplevel(self.root)
+        top.title("Buscar Empresas")
+        top.geometry("820x500")
+        
+        busca_frame = ttk.Frame(top)
+        busca_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(busca_frame, text="Nome, fantasia, cidade, atividade ou sócio:").pack(side=tk.LEFT, padx=2)
+        busca_var = tk.StringVar()
+        busca_entry = ttk.Entry(busca_frame, textvariable=busca_var)
+        busca_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2)
+        contador = ttk.Label(busca_frame, text="", font=('Arial', 9))
+        contador.pack(side=tk.LEFT, padx=5)
+        
+        colunas = [("Nome", 260), ("Fantasia", 160), ("CNPJ", 140), ("Cidade", 150), ("Situação", 80)]
+        tree = ttk.Treeview(top, columns=[c for c, _ in colunas], show="headings")
+        for col, width in colunas:
+            tree.heading(col, text=col)
+            tree.column(col, width=width)
+        scroll_y = ttk.Scrollbar(top, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scroll_y.set)
+        
+        btn_frame = ttk.Frame(top)
+        ttk.Label(btn_frame, text="Abre os dados guardados localmente, sem consultar a API",
+                  font=('Arial', 9)).pack(pady=(0, 5))
+        btn_ok = ttk.Button(btn_frame, text="Abrir", command=lambda: self.abrir_da_busca(tree, top))
+        btn_ok.pack(pady=5)
+        btn_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
+        scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        
+        estado = {"busca_agendada": None}
+        
+        def aplicar():
+            estado["busca_agendada"] = None
+            inicio = time.perf_counter()
+            try:
+                linhas, aproximada, parcial = self.indice_busca.buscar(busca_var.get(), BUSCA_RESULTADOS)
+            except Exception as e:
+                contador.config(text=f"Erro: {e}")
+                return
+            decorrido = (time.perf_counter() - inicio) * 1000
+            self.preencher_tree(tree, [
+                (nome or "", fantasia or "", self.format_cnpj(cnpj), f"{cidade or ''}/{uf or ''}", situacao or "")
+                for cnpj, nome, fantasia, cidade, uf, situacao, _ in linhas
+            ])
+            contador.config(text=f"{len(linhas)} resultado(s){' aproximados' if aproximada else ''} "
+                                 f"em {decorrido:.0f} ms{' - refine a busca' if parcial else ''}")
+        
+        def agendar(*args):
+            # Espera o usuário parar de digitar antes de consultar o índice
+            if estado["busca_agendada"]:
+                tree.after_cancel(estado["busca_agendada"])
+            estado["busca_agendada"] = tree.after(HISTORICO_ATRASO_BUSCA_MS, aplicar)
+        
+        def ir_para_resultados(event):
+            # Seta para baixo no campo de busca passa para o primeiro resultado
+            primeiros = tree.get_children()[:1]
+            if primeiros:
+                tree.focus_set()
+                tree.selection_set(primeiros)
+                tree.focus(primeiros[0])
+        
+        busca_var.trace_add("write", agendar)
+        tree.bind("<Double-1>", lambda e: self.abrir_da_busca(tree, top))
+        tree.bind("<Return>", lambda e: self.abrir_da_busca(tree, top))
+        busca_entry.bind("<Down>", ir_para_resultados)
+        busca_entry.focus_set()
+    
+    def abrir_da_busca(self, tree, top):
+        # Exibe o resultado com os dados locais: cache, última captura nos
+        # snapshots ou base da Receita. Só consulta a API se nenhum tiver.
+        selecionado = tree.focus()
+        if not selecionado:
+            return
+        cnpj = limpar_cnpj(tree.item(selecionado)['values'][2])
+        top.destroy()
+        self.cnpj_entry.delete(0, tk.END)
+        self.cnpj_entry.insert(0, self.format_cnpj(cnpj))
+        
+        entrada = self.cache.obter(cnpj)
+        dados = entrada["empresa"] if entrada else None
+        if dados is None and self.snapshots is not None:
+            try:
+                dados = self.snapshots.obter(cnpj)
+            except Exception as e:
+                print(f"Erro ao ler snapshots: {e}")
+        if dados is None and self.cliente.base_local is not None:
+            try:
+                dados = self.cliente.base_local.obter(cnpj)
+            except Exception as e:
+                print(f"Erro ao ler base local: {e}")
+        if dados is None:
+            self.consultar_cnpj()
+            return
+        
+        self.cancelar_consulta(silencioso=True)
+        self.limpar_dados()
+        inicio = time.perf_counter()
+        self.exibir_empresa(dados, cnpj)
+        self.metricas.registrar("consulta_total", time.perf_counter() - inicio, origem="busca local")
+        self.definir_status("Consulta concluída (busca local)")
+    
     def mostrar_historico(self):
         try:
-            historico_path = self.get_historico_path()
-            if not os.path.exists(historico_path):
+            if not self.historico or self.historico.contar() == 0:
                 messagebox.showinfo("Histórico", "Nenhuma consulta realizada ainda.")
                 return
                 
-            with open(historico_path, 'r') as f:
-                historico = json.load(f)
-                
             top = tk.Toplevel(self.root)
             top.title("Histórico de Consultas")
             top.geometry("600x500")
@@ -227,11 +1034,24 @@ class CNPJApp:
             filter_frame.pack(fill=tk.X, padx=5, pady=5)
             
             ttk.Button(filter_frame, text="Ordenar por Nome (A-Z)", 
-                      command=lambda: self.sort_historico(tree, historico, "name_asc")).pack(side=tk.LEFT, padx=2)
+                      command=lambda: self.sort_historico(tree, estado, "name_asc")).pack(side=tk.LEFT, padx=2)
             ttk.Button(filter_frame, text="Ordenar por Data (Recente)", 
-                      command=lambda: self.sort_historico(tree, historico, "date_desc")).pack(side=tk.LEFT, padx=2)
+                      command=lambda: self.sort_historico(tree, estado, "date_desc")).pack(side=tk.LEFT, padx=2)
             ttk.Button(filter_frame, text="Ordenar por Data (Antiga)", 
-                      command=lambda: self.sort_historico(tree, historico, "date_asc")).pack(side=tk.LEFT, padx=2)
+                      command=lambda: self.sort_historico(tree, estado, "date_asc")).pack(side=tk.LEFT, padx=2)
+            
+            busca_frame = ttk.Frame(top)
+            busca_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+            
+            ttk.Label(busca_frame, text="Buscar (nome ou CNPJ):").pack(side=tk.LEFT, padx=2)
+            busca_var = tk.StringVar()
+            busca_entry = ttk.Entry(busca_frame, textvariable=busca_var)
+            busca_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2)
+            contador = ttk.Label(busca_frame, text="", font=('Arial', 9))
+            contador.pack(side=tk.LEFT, padx=5)
+            
+            estado = {"ordem": "date_desc", "busca": "", "carregados": 0, "total": 0, "contador": contador}
+            busca_var.trace_add("write", lambda *args: self.buscar_historico(tree, estado, busca_var))
             
             tree = ttk.Treeview(top, columns=("Nome", "CNPJ", "Data"), show="headings")
             tree.heading("Nome", text="Nome")
@@ -242,11 +1062,15 @@ class CNPJApp:
             tree.column("CNPJ", width=150)
             tree.column("Data", width=150)
             
-            self.sort_historico(tree, historico, "date_desc")
-                
             scroll_y = ttk.Scrollbar(top, orient="vertical", command=tree.yview)
             scroll_x = ttk.Scrollbar(top, orient="horizontal", command=tree.xview)
-            tree.configure(yscrollcommand=scroll_y.set, xscrollcommand=scroll_x.set)
+            tree.configure(
+                yscrollcommand=lambda primeiro, ultimo: self.rolar_historico(tree, estado, scroll_y, primeiro, ultimo),
+                xscrollcommand=scroll_x.set
+            )
+            
+            self.sort_historico(tree, estado)
+            busca_entry.focus_set()
             
             btn_frame = ttk.Frame(top)
             
@@ -254,6 +1078,7 @@ class CNPJApp:
                      font=('Arial', 9)).pack(pady=(0, 5))
             
             btn_ok = ttk.Button(btn_frame, text="OK", command=lambda: self.selecionar_do_historico(tree, top))
+            tree.bind("<<TreeviewSelect>>", lambda e: self.antecipar_do_historico(tree))
             
             tree.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
             scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
@@ -275,11 +1100,12 @@ class CNPJApp:
             top.destroy()
             self.consultar_cnpj()
 
-    def format_cnpj(self, cnpj):
-        cnpj = ''.join(filter(str.isdigit, str(cnpj)))
-        if len(cnpj) == 14:
-            return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:14]}"
-        return cnpj
+    def antecipar_do_historico(self, tree):
+        selecionado = tree.focus()
+        if selecionado:
+            self.antecipar(str(tree.item(selecionado)['values'][1]).zfill(14))
+    
+    format_cnpj = staticmethod(cnpj_core.format_cnpj)
 
     def create_widgets(self):
         self.configure_styles()
@@ -307,9 +1133,20 @@ class CNPJApp:
         self.btn_copiar = ttk.Button(self.input_frame, text="Copiar", command=self.copiar_informacoes, style='Accent.TButton')
         self.btn_copiar.pack(side=tk.LEFT, padx=5)
 
-        self.btn_consultar = ttk.Button(self.main_frame, text="Consultar CNPJ", command=self.consultar_cnpj, style='Accent.TButton')
-        self.btn_consultar.pack(pady=(0, 10))
+        self.acao_frame = ttk.Frame(self.main_frame)
+        self.acao_frame.pack(pady=(0, 5))
+        
+        self.btn_consultar = ttk.Button(self.acao_frame, text="Consultar CNPJ", command=self.consultar_cnpj, style='Accent.TButton')
+        self.btn_consultar.pack(side=tk.LEFT, padx=5)
+        self.btn_cancelar = ttk.Button(self.acao_frame, text="Cancelar", command=self.cancelar_consulta, state='disabled')
+        self.btn_cancelar.pack(side=tk.LEFT, padx=5)
+        self.ignorar_cache_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.acao_frame, text="Ignorar cache", variable=self.ignorar_cache_var).pack(side=tk.LEFT, padx=5)
         self.cnpj_entry.bind('<Return>', lambda event: self.consultar_cnpj())
+        self.cnpj_entry.bind('<KeyRelease>', self.verificar_digitacao)
+        
+        self.status_label = ttk.Label(self.main_frame, text="", font=('Arial', 9), foreground="#777777")
+        self.status_label.pack(pady=(0, 5))
         
         self.notebook = ttk.Notebook(self.main_frame)
         self.notebook.pack(fill=tk.BOTH, expand=True)
@@ -318,6 +1155,21 @@ class CNPJApp:
         self.create_socios_tab()
         self.create_atividades_tab()
         self.create_registrations_tab()
+        self.create_relacionadas_tab()
+        
+        # Só a aba visível é preenchida ao chegar o resultado; as outras na
+        # primeira vez que forem abertas
+        self.preencher_aba = {
+            str(self.info_frame): ("Informações Básicas", self.preencher_info_tab),
+            str(self.socios_frame): ("Sócios", self.preencher_socios_tab),
+            str(self.atividades_frame): ("Atividades", self.preencher_atividades_tab),
+            str(self.registrations_frame): ("Inscrições", self.preencher_registrations_tab),
+            str(self.relacionadas_frame): ("Relacionadas", self.preencher_relacionadas_tab),
+        }
+        self.abas_pendentes = set()
+        self.tempos_renderizacao = {}
+        self.ao_renderizar = None  # Opcional: função(aba, milissegundos)
+        self.notebook.bind("<<NotebookTabChanged>>", lambda event: self.renderizar_aba_atual())
         
         ttk.Label(self.main_frame, 
                  text="© Feito por Barba", 
@@ -377,6 +1229,9 @@ class CNPJApp:
         self.info_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.info_text.tag_configure("bold", font=('Arial', 12, 'bold'))
+        self.info_text.tag_config("capital_link", foreground="blue", underline=1)
+        self.info_text.tag_bind("capital_link", "<Button-1>", lambda e: self.mostrar_capital_extenso(self.capital_social))
+        self.capital_social = 0.0
     
     def create_socios_tab(self):
         self.socios_frame = ttk.Frame(self.notebook)
@@ -472,50 +1327,296 @@ class CNPJApp:
         scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
         scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
     
-    def consultar_cnpj(self):
-        cnpj = self.cnpj_entry.get().strip()
-        cnpj = ''.join(filter(str.isdigit, cnpj))
+    def create_relacionadas_tab(self):
+        self.relacionadas_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.relacionadas_frame, text="Relacionadas")
+        
+        filtro_frame = ttk.Frame(self.relacionadas_frame)
+        filtro_frame.pack(side=tk.TOP, fill=tk.X, pady=5)
         
-        if len(cnpj) != 14:
-            messagebox.showwarning("CNPJ inválido", "O CNPJ deve conter 14 dígitos numéricos.")
+        ttk.Label(filtro_frame, text="Níveis:").pack(side=tk.LEFT, padx=(5, 2))
+        self.niveis_var = tk.IntVar(value=1)
+        ttk.Spinbox(filtro_frame, from_=1, to=NIVEIS_MAXIMO, width=3, textvariable=self.niveis_var, state='readonly',
+                    command=self.atualizar_relacionadas).pack(side=tk.LEFT, padx=2)
+        
+        ttk.Label(filtro_frame, text="Buscar sócio (nome ou documento):").pack(side=tk.LEFT, padx=(15, 2))
+        self.busca_socio_var = tk.StringVar()
+        busca_entry = ttk.Entry(filtro_frame, textvariable=self.busca_socio_var)
+        busca_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2)
+        busca_entry.bind('<Return>', lambda event: self.buscar_socio())
+        ttk.Button(filtro_frame, text="Buscar", command=self.buscar_socio).pack(side=tk.LEFT, padx=5)
+        
+        rodape = ttk.Frame(self.relacionadas_frame)
+        rodape.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
+        self.relacionadas_status = ttk.Label(rodape, text="", font=('Arial', 9))
+        self.relacionadas_status.pack(side=tk.LEFT, padx=5)
+        self.btn_mais_relacionadas = ttk.Button(rodape, text="Carregar mais", state='disabled',
+                                                command=self.carregar_relacionadas)
+        self.btn_mais_relacionadas.pack(side=tk.RIGHT, padx=5)
+        
+        colunas = [
+            ("Nível", 50),
+            ("CNPJ", 140),
+            ("Empresa", 250),
+            ("Sócio", 200),
+            ("Cargo", 150),
+            ("Via", 140)
+        ]
+        self.relacionadas_tree = ttk.Treeview(
+            self.relacionadas_frame, columns=[c for c, _ in colunas], show="headings"
+        )
+        for col, width in colunas:
+            self.relacionadas_tree.heading(col, text=col)
+            self.relacionadas_tree.column(col, width=width, anchor=tk.W)
+        self.relacionadas_tree.bind("<Double-1>", self.abrir_relacionada)
+        
+        scroll_y = ttk.Scrollbar(self.relacionadas_frame, orient="vertical", command=self.relacionadas_tree.yview)
+        self.relacionadas_tree.configure(yscrollcommand=scroll_y.set)
+        
+        self.relacionadas_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+        self.estado_relacionadas = None
+    
+    def preencher_relacionadas_tab(self, empresa):
+        # Rede em torno da empresa exibida, a partir do índice de sócios
+        self.estado_relacionadas = {"cnpj": limpar_cnpj(empresa.get("taxId", "")), "niveis": self.niveis_var.get()}
+        self.relacionadas_tree.delete(*self.relacionadas_tree.get_children())
+        self.carregar_relacionadas()
+    
+    def atualizar_relacionadas(self):
+        if hasattr(self, 'empresa_data'):
+            self.preencher_relacionadas_tab(self.empresa_data)
+    
+    def buscar_socio(self):
+        busca = self.busca_socio_var.get().strip()
+        if not busca:
+            return
+        self.estado_relacionadas = {"busca": busca}
+        self.relacionadas_tree.delete(*self.relacionadas_tree.get_children())
+        self.carregar_relacionadas()
+    
+    def carregar_relacionadas(self):
+        estado = self.estado_relacionadas
+        if estado is None or self.indice_socios is None:
+            self.relacionadas_status.config(text="Índice de sócios indisponível" if estado else "")
+            return
+        carregados = len(self.relacionadas_tree.get_children())
+        try:
+            if "busca" in estado:
+                linhas = [
+                    ("", self.format_cnpj(cnpj), empresa or "", nome, cargo or "", documento or "")
+                    for cnpj, empresa, nome, documento, cargo in
+                    self.indice_socios.empresas_do_socio(estado["busca"], RELACIONADAS_PAGINA + 1, carregados)
+                ]
+                ha_mais, cortados = len(linhas) > RELACIONADAS_PAGINA, 0
+                linhas = linhas[:RELACIONADAS_PAGINA]
+            else:
+                rede, ha_mais, cortados = self.indice_socios.rede(
+                    estado["cnpj"], estado["niveis"], RELACIONADAS_PAGINA, carregados
+                )
+                linhas = [
+                    (nivel, self.format_cnpj(cnpj), empresa or "", nome, cargo or "", self.format_cnpj(origem))
+                    for nivel, cnpj, empresa, nome, cargo, origem in rede
+                ]
+        except Exception as e:
+            self.relacionadas_status.config(text=f"Erro ao consultar o índice: {e}")
+            return
+        
+        for valores in linhas:
+            self.relacionadas_tree.insert("", tk.END, values=valores)
+        total = carregados + len(linhas)
+        texto = f"{total} empresa(s)" if total else "Nenhuma empresa relacionada no índice"
+        if cortados:
+            texto += " - alguns sócios/empresas com vínculos demais foram resumidos"
+        self.relacionadas_status.config(text=texto)
+        self.btn_mais_relacionadas.config(state='normal' if ha_mais else 'disabled')
+    
+    def abrir_relacionada(self, event):
+        selecionado = self.relacionadas_tree.focus()
+        if not selecionado:
+            return
+        self.cnpj_entry.delete(0, tk.END)
+        self.cnpj_entry.insert(0, self.relacionadas_tree.item(selecionado)['values'][1])
+        self.consultar_cnpj()
+    
+    def consultar_cnpj(self, forcar=False):
+        texto = self.cnpj_entry.get().strip()
+        cnpj = validar_cnpj(texto)
+        
+        if cnpj is None:
+            if len(limpar_cnpj(texto)) != 14:
+                messagebox.showwarning("CNPJ inválido", "O CNPJ deve conter 14 caracteres (números ou letras).")
+            else:
+                messagebox.showwarning("CNPJ inválido", "Os dígitos verificadores do CNPJ não conferem.")
+            return
+        
+        # Uma nova consulta abandona a anterior que ainda esteja em andamento
+        self.cancelar_consulta(silencioso=True)
+        if self.antecipador is not None:
+            self.antecipador.descartar(cnpj)
+        self.limpar_dados()
+        
+        forcar = forcar or self.ignorar_cache_var.get()
+        entrada = self.cache.obter(cnpj)
+        if entrada and not forcar and not self.cache.expirada(entrada):
+            self.metricas.contar("acertos")
+            inicio = time.perf_counter()
+            self.exibir_empresa(entrada["empresa"], cnpj)
+            # As respostas da API já são indexadas pelo cliente; as do cache
+            # entram só nos índices (não são uma captura nova), fora da interface
+            self.executor.submit(lambda empresa=entrada["empresa"]: self.cliente.indexar(empresa, capturar=False))
+            antecipada = self.antecipador is not None and self.antecipador.aproveitar(cnpj)
+            self.metricas.registrar("consulta_total", time.perf_counter() - inicio,
+                                    origem="antecipada" if antecipada else "cache")
+            self.definir_status("Consulta concluída (cache)")
+            return
+        
+        self.consulta_atual += 1
+        self.consulta_pendente = cnpj
+        self.parar_pendente = threading.Event()
+        self.definir_status("Consultando...", ativo=True)
+        
+        self.future_pendente = self.executor.submit(
+            self.cliente.buscar, cnpj, entrada=entrada, timeout=self.get_timeout(), parar=self.parar_pendente,
+            usar_local=not forcar
+        )
+        self.root.after(INTERVALO_VERIFICACAO_MS, self.acompanhar_consulta,
+                        self.future_pendente, self.consulta_atual, cnpj, time.perf_counter())
+    
+    def acompanhar_consulta(self, future, consulta_id, cnpj, inicio):
+        import requests
+        
+        if consulta_id != self.consulta_atual:
+            return  # Consulta cancelada ou substituída por outra
+        
+        if not future.done():
+            self.root.after(INTERVALO_VERIFICACAO_MS, self.acompanhar_consulta, future, consulta_id, cnpj, inicio)
             return
         
+        self.consulta_pendente = None
+        self.future_pendente = None
+        
         try:
-            self.limpar_dados()
-            self.root.update_idletasks()
+            status_code, empresa, origem = future.result()
             
-            url = f"https://open.cnpja.com/office/{cnpj}"
-            headers = {"Accept": "application/json"}
-            response = requests.get(url, headers=headers)
-
-            if response.status_code == 404:
+            if status_code == 404:
+                self.definir_status("CNPJ não encontrado")
                 messagebox.showerror("Não encontrado", "CNPJ não encontrado na base de dados.")
-            elif response.status_code == 400:
+                return
+            elif status_code == 400:
+                self.definir_status("CNPJ inválido")
                 messagebox.showerror("Erro de Requisição", "CNPJ inválido. Verifique e tente novamente.")
                 return
-                
-            response.raise_for_status()
-
-            empresa = response.json()
-            self.empresa_data = empresa  # Salvar os dados para cópia
             
-            nome_empresa = self.get_nested_value(empresa, "company.name")
-            if nome_empresa:
-                self.salvar_no_historico(nome_empresa, cnpj)
-            
-            if self.preferences.get("alertas_situacao", False):
-                self.verificar_situacao_cadastral(empresa)
-            
-            self.preencher_info_tab(empresa)
-            self.preencher_socios_tab(empresa)
-            self.preencher_atividades_tab(empresa)
-            self.preencher_registrations_tab(empresa)
+            self.exibir_empresa(empresa, cnpj)
+            self.metricas.registrar("consulta_total", time.perf_counter() - inicio, origem=origem)
+            if origem == "api":
+                self.definir_status("Consulta concluída")
+            else:
+                self.definir_status(f"Consulta concluída ({origem})")
             
+        except InterruptedError:
+            return
+        except requests.exceptions.Timeout as e:
+            self.metricas.erro("consulta", e)
+            self.definir_status("Tempo esgotado")
+            messagebox.showerror("Erro", "A consulta excedeu o tempo limite. Tente novamente.")
         except requests.exceptions.RequestException as e:
+            self.metricas.erro("consulta", e)
+            self.definir_status("Erro na consulta")
             messagebox.showerror("Erro", f"Falha na consulta: {str(e)}")
         except Exception as e:
+            self.metricas.erro("consulta", e)
+            self.definir_status("Erro na consulta")
             messagebox.showerror("Erro", f"Erro inesperado: {str(e)}")
     
+    def exibir_empresa(self, empresa, cnpj):
+        self.empresa_data = empresa  # Salvar os dados para cópia
+        
+        nome_empresa = self.get_nested_value(empresa, "company.name")
+        if nome_empresa:
+            self.salvar_no_historico(nome_empresa, cnpj)
+        
+        if self.preferences.get("alertas_situacao", False):
+            self.verificar_situacao_cadastral(empresa)
+        
+        self.abas_pendentes = set(self.preencher_aba)
+        self.renderizar_aba_atual()
+    
+    def renderizar_aba_atual(self):
+        aba = self.notebook.select()
+        if aba not in self.abas_pendentes or not hasattr(self, 'empresa_data'):
+            return
+        self.abas_pendentes.discard(aba)
+        
+        nome, preencher = self.preencher_aba[aba]
+        inicio = time.perf_counter()
+        preencher(self.empresa_data)
+        self.root.update_idletasks()  # Inclui o redesenho no tempo medido
+        ms = (time.perf_counter() - inicio) * 1000
+        self.tempos_renderizacao[nome] = ms
+        self.metricas.registrar("renderizacao", ms / 1000, aba=nome)
+        if self.ao_renderizar:
+            self.ao_renderizar(nome, ms)
+    
+    def cancelar_consulta(self, silencioso=False):
+        if not self.consulta_pendente:
+            return
+        # A requisição em curso não pode ser interrompida, mas esperas de
+        # limite de taxa/novas tentativas param e o resultado é descartado
+        if self.future_pendente:
+            self.future_pendente.cancel()
+        if self.parar_pendente:
+            self.parar_pendente.set()
+            self.parar_pendente = None
+        self.consulta_atual += 1
+        self.consulta_pendente = None
+        self.future_pendente = None
+        self.definir_status("" if silencioso else "Consulta cancelada")
+    
+    def verificar_digitacao(self, event):
+        if event.keysym == 'Return':
+            return
+        cnpj = limpar_cnpj(self.cnpj_entry.get())
+        self.antecipar(cnpj)
+        # Digitar outro CNPJ abandona a consulta em andamento
+        if self.consulta_pendente and cnpj != self.consulta_pendente:
+            self.cancelar_consulta()
+    
+    def definir_status(self, texto, ativo=False):
+        self.status_label.config(text=texto)
+        self.btn_cancelar.config(state='normal' if ativo else 'disabled')
+        self.root.config(cursor='watch' if ativo else '')
+    
+    def fechar(self):
+        if self.parar_pendente:
+            self.parar_pendente.set()
+        if self.antecipador is not None:
+            self.antecipador.parar()
+        if self.monitor is not None:
+            self.monitor.parar()
+            if self.monitor.thread is not None:
+                self.monitor.thread.join(2)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self._cliente is not None:
+            self._cliente.fechar()
+        if self.historico:
+            self.historico.fechar()
+        if self.indice_socios is not None:
+            self.indice_socios.fechar()
+        if self.indice_busca is not None:
+            self.indice_busca.fechar()
+        if self.snapshots is not None:
+            self.snapshots.fechar()
+        if self.monitoramento is not None:
+            self.monitoramento.fechar()
+        if self.arquivo_preferencias is not None:
+            try:
+                self.arquivo_preferencias.fechar()
+            except Exception as e:
+                print(f"Erro ao salvar preferências: {e}")
+        self.root.destroy()
+    
     def verificar_situacao_cadastral(self, empresa):
         situacao = self.get_nested_value(empresa, "status.text")
         
@@ -533,43 +1634,30 @@ class CNPJApp:
             messagebox.showinfo("Situação Cadastral", f"Situação: {situacao}")
 
     def preencher_info_tab(self, empresa):
-        self.info_text.config(state='normal')
-        self.info_text.delete(1.0, tk.END)
+        with self.metricas.medir("parse"):
+            campos, self.capital_social = self.campos_info(empresa)
         
-        capital_social = float(self.get_nested_value(empresa, 'company.equity') or 0)
-        capital_formatado = format_currency(capital_social, 'BRL', locale='pt_BR')
-        
-        campos = [
-            ("Nome Empresarial", self.get_nested_value(empresa, "company.name")),
-            ("Nome Fantasia", self.get_nested_value(empresa, "alias")),
-            ("Data de Abertura", datetime.strptime(self.get_nested_value(empresa, "founded"), "%Y-%m-%d").strftime("%d-%m-%Y")),
-            ("Situação Cadastral", self.get_nested_value(empresa, "status.text")),
-            ("Natureza Jurídica", self.get_nested_value(empresa, "company.nature.text")),
-            ("Porte da Empresa", self.get_nested_value(empresa, "company.size.text")),
-            ("Capital Social", capital_formatado),
-            ("Telefone", self.format_phone(empresa.get("phones", []))),
-            ("Endereço", self.format_address(empresa.get("address", {}))),
-            ("Atividade Principal", self.get_nested_value(empresa, "mainActivity.text"))
-        ]
-        
-        for label, valor in campos:
-            self.info_text.insert(tk.END, f"{label}: ", "bold")
-            
+        # Monta todo o texto (pares texto/tags) e insere numa única chamada
+        trechos = []
+        for label, valor in campos.items():
+            trechos += [f"{label}: ", "bold"]
             if label == "Capital Social":
-                self.info_text.insert(tk.END, valor)
-                self.info_text.insert(tk.END, "    [Clique aqui]", "capital_link")
-                self.info_text.tag_config("capital_link", foreground="blue", underline=1)
-                self.info_text.tag_bind("capital_link", "<Button-1>", 
-                                      lambda e, cs=capital_social: self.mostrar_capital_extenso(cs))
+                trechos += [valor, (), "    [Clique aqui]", "capital_link"]
             else:
-                self.info_text.insert(tk.END, f"{valor or 'Não informado'}")
-            
-            self.info_text.insert(tk.END, "\n")
+                trechos += [f"{valor or 'Não informado'}", ()]
+            trechos += ["\n", ()]
         
+        self.info_text.config(state='normal')
+        self.info_text.delete(1.0, tk.END)
+        self.info_text.insert(tk.END, *trechos)
         self.info_text.config(state='disabled')
     
+    # Formatação e leitura dos dados ficam no núcleo (cnpj_core)
+    campos_info = staticmethod(cnpj_core.campos_info)
+    
     def mostrar_capital_extenso(self, valor):
         try:
+            from num2words import num2words
             valor_extenso = num2words(valor, lang='pt_BR', to='currency')
             valor_extenso = valor_extenso.capitalize() + ""
             messagebox.showinfo("Capital Social por Extenso", valor_extenso)
@@ -577,15 +1665,16 @@ class CNPJApp:
             messagebox.showerror("Erro", f"Não foi possível converter o valor: {str(e)}")
 
     def preencher_socios_tab(self, empresa):
-        for member in empresa.get("company", {}).get("members", []):
-            self.socios_tree.insert("", tk.END, values=(
-                member.get("person", {}).get("name", "N/A"),
-                member.get("person", {}).get("taxId", "N/A"),
-                member.get("person", {}).get("type", "N/A"),
-                member.get("role", {}).get("text", "N/A"),
-                member.get("since", "N/A"),
-                member.get("person", {}).get("age", "N/A")
-            ))
+        linhas = ESQUEMA_SOCIO.linhas(self.get_nested_value(empresa, "company.members"))
+        self.preencher_tree(self.socios_tree, linhas)
+    
+    @staticmethod
+    def preencher_tree(tree, linhas):
+        # Linhas já montadas antes de tocar no widget: limpa numa chamada só e
+        # insere tudo no mesmo evento, com um único redesenho no final
+        tree.delete(*tree.get_children())
+        for valores in linhas:
+            tree.insert("", tk.END, values=valores)
     
     def preencher_atividades_tab(self, empresa):
         self.atividade_principal.config(state='normal')
@@ -593,35 +1682,29 @@ class CNPJApp:
         self.atividade_principal.insert(0, self.get_nested_value(empresa, "mainActivity.text") or "Não informado")
         self.atividade_principal.config(state='readonly')
         
-        self.atividades_secundarias.config(state='normal')
-        self.atividades_secundarias.delete(1.0, tk.END)
-        
         side_activities = empresa.get("sideActivities", [])
         if side_activities:
-            for atividade in side_activities:
-                self.atividades_secundarias.insert(tk.END, f"• {atividade.get('text', 'N/A')}\n")
+            texto = "".join(f"• {atividade.get('text', 'N/A')}\n" for atividade in side_activities)
         else:
-            self.atividades_secundarias.insert(tk.END, "Nenhuma atividade secundária registrada")
+            texto = "Nenhuma atividade secundária registrada"
         
+        self.atividades_secundarias.config(state='normal')
+        self.atividades_secundarias.delete(1.0, tk.END)
+        self.atividades_secundarias.insert(tk.END, texto)
         self.atividades_secundarias.config(state='disabled')
     
     def preencher_registrations_tab(self, empresa):
-        for reg in empresa.get("registrations", []):
-            self.registrations_tree.insert("", tk.END, values=(
-                reg.get("number", "N/A"),
-                reg.get("state", "N/A"),
-                self.get_nested_value(reg, "status.text"),
-                self.get_nested_value(reg, "type.text"),
-                reg.get("statusDate", "N/A")
-            ))
+        linhas = ESQUEMA_INSCRICAO.linhas(empresa.get("registrations"))
+        self.preencher_tree(self.registrations_tree, linhas)
     
     def limpar_dados(self):
+        self.abas_pendentes = set()
+        
         self.info_text.config(state='normal')
         self.info_text.delete(1.0, tk.END)
         self.info_text.config(state='disabled')
         
-        for item in self.socios_tree.get_children():
-            self.socios_tree.delete(item)
+        self.socios_tree.delete(*self.socios_tree.get_children())
         
         self.atividade_principal.config(state='normal')
         self.atividade_principal.delete(0, tk.END)
@@ -631,47 +1714,72 @@ class CNPJApp:
         self.atividades_secundarias.delete(1.0, tk.END)
         self.atividades_secundarias.config(state='disabled')
         
-        for item in self.registrations_tree.get_children():
-            self.registrations_tree.delete(item)
+        self.registrations_tree.delete(*self.registrations_tree.get_children())
+        
+        self.relacionadas_tree.delete(*self.relacionadas_tree.get_children())
+        self.relacionadas_status.config(text="")
+        self.btn_mais_relacionadas.config(state='disabled')
+        self.estado_relacionadas = None
     
     def colar_cnpj(self):
         self.cnpj_entry.delete(0, tk.END)
         try:
             texto = self.root.clipboard_get()
             self.cnpj_entry.insert(0, texto)
+            self.antecipar(texto)
         except:
             messagebox.showinfo("Erro", "Nada para colar na área de transferência.")
         finally:
             self.cnpj_entry.focus_set()
     
-    @staticmethod
-    def get_nested_value(data, key):
-        keys = key.split('.')
-        for k in keys:
-            if isinstance(data, dict) and k in data:
-                data = data[k]
-            else:
-                return None
-        return data
+    get_nested_value = staticmethod(cnpj_core.get_nested_value)
+    format_phone = staticmethod(cnpj_core.format_phone)
+    format_address = staticmethod(cnpj_core.format_address)
+
+def registrar_inicio(root):
+    # Chamado quando o Tk fica ocioso pela primeira vez, com a janela desenhada
+    segundos = time.perf_counter() - INICIO
+    registro = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "segundos": round(segundos, 4),
+        "executavel": sys.executable,
+        "empacotado": bool(getattr(sys, "frozen", False)),
+        "modulos": len(sys.modules)
+    }
+    try:
+        caminho = caminhos.caminho_medicoes_inicio()
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro) + "\n")
+    except Exception as e:
+        print(f"Erro ao registrar inicialização: {e}")
+    root.destroy()
+
+
+def main(argv=None):
+    # No executável (PyInstaller), cada processo do lote (--processos) abre o
+    # próprio .exe de novo; freeze_support desvia esses processos para o lote
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+    argv = sys.argv[1:] if argv is None else argv
     
-    @staticmethod
-    def format_phone(phones):
-        if not phones:
-            return "Não informado"
-        phone = phones[0]
-        return f"({phone.get('area', '')}) {phone.get('number', '')}"
+    # --medir-inicio registra o tempo até a janela ficar interativa e fecha o app
+    medir_inicio = "--medir-inicio" in argv
+    argv = [arg for arg in argv if arg != "--medir-inicio"]
+    
+    # Com argumentos, funciona como a linha de comando do núcleo (ex.: --lote)
+    if argv:
+        from cnpj_core.cli import main as main_cli
+        return main_cli(argv)
     
-    @staticmethod
-    def format_address(address):
-        if not address:
-            return "Não informado"
-        return (
-            f"{address.get('street', '')}, {address.get('number', '')} - "
-            f"{address.get('district', '')}, {address.get('city', '')} - "
-            f"{address.get('state', '')}, CEP: {address.get('zip', '')}"
-        )
-
-if __name__ == "__main__":
     root = tk.Tk()
     app = CNPJApp(root)
-    root.mainloop()
\ No newline at end of file
+    if medir_inicio:
+        root.after_idle(registrar_inicio, root)
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+import platform
+import subprocess
+import statistics
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+# Funções compartilhadas pelos benchmarks: todos gravam um JSON com o mesmo
+# cabeçalho (benchmark, rótulo, versão do código, plataforma) para comparar
+# resultados entre versões.
+
+
+def versao_codigo():
+    try:
+        return subprocess.run(
+            ["git", "-C", RAIZ, "describe", "--always", "--dirty"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return None
+    indice = (len(ordenados) - 1) * p / 100
+    baixo = int(indice)
+    alto = min(baixo + 1, len(ordenados) - 1)
+    return ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (indice - baixo)
+
+
+def resumo_ms(segundos):
+    # Latências em milissegundos: p50/p95/p99, média, mínimo e máximo
+    if not segundos:
+        return None
+    ordenados = sorted(s * 1000 for s in segundos)
+    return {
+        "amostras": len(ordenados),
+        "p50_ms": round(percentil(ordenados, 50), 3),
+        "p95_ms": round(percentil(ordenados, 95), 3),
+        "p99_ms": round(percentil(ordenados, 99), 3),
+        "media_ms": round(statistics.fmean(ordenados), 3),
+        "minimo_ms": round(ordenados[0], 3),
+        "maximo_ms": round(ordenados[-1], 3)
+    }
+
+
+def gravar_resultado(benchmark, rotulo, resultados, saida=None, **extras):
+    resultado = {
+        "benchmark": benchmark,
+        "rotulo": rotulo,
+        "versao": versao_codigo(),
+        "plataforma": platform.platform(),
+        "python": platform.python_version(),
+        **extras,
+        "resultados": resultados
+    }
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if saida:
+        with open(saida, 'w', encoding='utf-8') as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    return resultado
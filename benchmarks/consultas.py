@@ -0,0 +1,305 @@
+"""Benchmarks das consultas contra o servidor simulado (benchmarks/servidor_simulado.py).
+
+Cenários:
+  latencia     consultas individuais em sequência (p50/p95/p99 de ponta a ponta)
+  lote         vazão da consulta em lote com N workers simultâneos
+  processamento  leitura do JSON, get_nested_value, projeção compilada e campos_info, sem rede
+  provedores   um provedor contra dois (failover e reforço): latência com cauda lenta e
+               vazão do lote com o limite de taxa de cada provedor
+  relatorio    relatórios da carteira (asyncio + agrupamento incremental): vazão e pico
+               de memória com N consultas simultâneas
+  processos    lote em 1, 2, 4... processos (--processos) com o limite de taxa compartilhado
+
+    python benchmarks/consultas.py --rotulo v1.3 --saida consultas_v1.3.json
+    python benchmarks/consultas.py --cenarios lote --workers 1 8 32 --latencia 150 --taxa-429 0.02
+    python benchmarks/consultas.py --cenarios provedores --taxa-lenta 0.05 --lentidao 1500
+    python benchmarks/consultas.py --cenarios relatorio --lote 20000 --workers 8 32
+    python benchmarks/consultas.py --cenarios processos --lote 20000 --processos 1 2 4 8 --latencia 0
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import functools
+import tracemalloc
+
+from comum import gravar_resultado, resumo_ms
+from servidor_simulado import ServidorSimulado, carregar_respostas
+
+from cnpj_core import campos_info, get_nested_value
+from cnpj_core.cliente import ClienteCNPJa, LimitadorTaxa
+from cnpj_core.formatacao import ESQUEMA_INFO, ESQUEMA_SOCIO
+from cnpj_core.lote import ConsultaLote
+from cnpj_core.processos import LoteProcessos
+from cnpj_core.provedores import ProvedorCNPJa
+from cnpj_core.relatorios import RelatorioCarteira
+from cnpj_core.validacao import digito_verificador, PESOS_DV1, PESOS_DV2
+
+# Sem limite de taxa: mede o cliente e a rede, não a espera pelo limitador
+SEM_LIMITE = 1e9
+
+
+def gerar_cnpjs(quantidade, inicio=1):
+    cnpjs = []
+    for i in range(inicio, inicio + quantidade):
+        base = f"{i:08d}0001"
+        dv1 = digito_verificador(base, PESOS_DV1)
+        cnpjs.append(base + dv1 + digito_verificador(base + dv1, PESOS_DV2))
+    return cnpjs
+
+
+def criar_cliente(servidor, conexoes=10):
+    return ClienteCNPJa(limitador=LimitadorTaxa(SEM_LIMITE), api_url=servidor.url, conexoes=conexoes)
+
+
+def cenario_latencia(args):
+    with ServidorSimulado(latencia_ms=args.latencia, variacao_ms=args.variacao,
+                          taxa_erro=args.taxa_erro, taxa_429=args.taxa_429) as servidor:
+        cliente = criar_cliente(servidor)
+        tempos, falhas = [], 0
+        try:
+            for cnpj in gerar_cnpjs(args.consultas):
+                inicio = time.perf_counter()
+                try:
+                    cliente.buscar(cnpj, usar_local=False)
+                    tempos.append(time.perf_counter() - inicio)
+                except Exception:
+                    falhas += 1
+        finally:
+            cliente.fechar()
+        return {"consultas": args.consultas, "falhas": falhas, "latencia": resumo_ms(tempos),
+                "respostas_servidor": dict(servidor.contagem)}
+
+
+def cenario_lote(args):
+    resultados = []
+    for workers in args.workers:
+        with ServidorSimulado(latencia_ms=args.latencia, variacao_ms=args.variacao,
+                              taxa_erro=args.taxa_erro, taxa_429=args.taxa_429) as servidor, \
+                tempfile.TemporaryDirectory() as pasta:
+            cliente = criar_cliente(servidor, conexoes=max(10, workers))
+            lote = ConsultaLote(gerar_cnpjs(args.lote), os.path.join(pasta, "saida.csv"), cliente,
+                                workers=workers, retomar=False)
+            inicio = time.perf_counter()
+            try:
+                lote.executar()
+            finally:
+                cliente.fechar()
+            decorrido = time.perf_counter() - inicio
+            p = lote.progresso()
+            resultados.append({
+                "workers": workers,
+                "consultas": p["feitos"],
+                "erros": p["erros"],
+                "segundos": round(decorrido, 3),
+                "consultas_por_segundo": round(p["feitos"] / decorrido, 2),
+                "respostas_servidor": dict(servidor.contagem)
+            })
+    return resultados
+
+
+def cenario_processamento(args):
+    textos = [json.dumps(r, ensure_ascii=False) for r in carregar_respostas()]
+    chaves = ["company.name", "company.nature.text", "status.text", "address.city", "mainActivity.text"]
+    n = args.repeticoes
+
+    inicio = time.perf_counter()
+    for i in range(n):
+        empresa = json.loads(textos[i % len(textos)])
+    parse = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for _ in range(n):
+        for chave in chaves:
+            get_nested_value(empresa, chave)
+    busca = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for _ in range(n):
+        ESQUEMA_INFO.extrair(empresa)
+    projecao = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for _ in range(n):
+        ESQUEMA_SOCIO.linhas(empresa["company"]["members"])
+    socios = time.perf_counter() - inicio
+
+    campos_info(empresa)  # Carrega o Babel fora da medição
+    inicio = time.perf_counter()
+    for _ in range(n):
+        campos_info(empresa)
+    campos = time.perf_counter() - inicio
+
+    return {
+        "repeticoes": n,
+        "json_loads_us": round(parse / n * 1e6, 3),
+        "get_nested_value_us": round(busca / (n * len(chaves)) * 1e6, 3),
+        "projecao_info_us": round(projecao / n * 1e6, 3),
+        "linhas_socios_us": round(socios / n * 1e6, 3),
+        "campos_info_us": round(campos / n * 1e6, 3)
+    }
+
+
+def cliente_provedores(servidores, limite=SEM_LIMITE, reforco=True):
+    # Um ProvedorCNPJa por servidor simulado, cada um com o próprio limite
+    # (capacidade 1: sem rajada inicial, só a taxa)
+    provedores = [
+        ProvedorCNPJa(url=servidor.url, nome=f"simulado{i}", limitador=LimitadorTaxa(limite, capacidade=1))
+        for i, servidor in enumerate(servidores, 1)
+    ]
+    return ClienteCNPJa(provedores=provedores, reforco=reforco, conexoes=32)
+
+
+def cenario_provedores(args):
+    perfil = dict(latencia_ms=args.latencia, variacao_ms=args.variacao, taxa_erro=args.taxa_erro,
+                  taxa_429=args.taxa_429, taxa_lenta=args.taxa_lenta, lentidao_ms=args.lentidao)
+    resultados = {}
+    for rotulo, quantidade, reforco in (("um_provedor", 1, False), ("dois_com_reforco", 2, True)):
+        servidores = [ServidorSimulado(semente=i, **perfil).iniciar() for i in range(quantidade)]
+        cliente = cliente_provedores(servidores, reforco=reforco)
+        tempos, falhas = [], 0
+        try:
+            for cnpj in gerar_cnpjs(args.consultas):
+                inicio = time.perf_counter()
+                try:
+                    cliente.buscar(cnpj, usar_local=False)
+                    tempos.append(time.perf_counter() - inicio)
+                except Exception:
+                    falhas += 1
+        finally:
+            cliente.fechar()
+            for servidor in servidores:
+                servidor.parar()
+        c = cliente.metricas.contagens("reforcos", "reforcos_vencedores", "trocas_provedor")
+        resultados[rotulo] = {"consultas": args.consultas, "falhas": falhas, "latencia": resumo_ms(tempos), **c}
+
+    vazao = []
+    for quantidade in (1, 2):
+        servidores = [ServidorSimulado(semente=i, latencia_ms=args.latencia, variacao_ms=args.variacao).iniciar()
+                      for i in range(quantidade)]
+        cliente = cliente_provedores(servidores, limite=args.limite_provedor, reforco=False)
+        with tempfile.TemporaryDirectory() as pasta:
+            lote = ConsultaLote(gerar_cnpjs(args.lote), os.path.join(pasta, "saida.csv"), cliente,
+                                workers=8, retomar=False)
+            inicio = time.perf_counter()
+            try:
+                lote.executar()
+            finally:
+                cliente.fechar()
+                for servidor in servidores:
+                    servidor.parar()
+        decorrido = time.perf_counter() - inicio
+        vazao.append({
+            "provedores": quantidade,
+            "limite_por_minuto_cada": args.limite_provedor,
+            "consultas": lote.progresso()["feitos"],
+            "consultas_por_segundo": round(lote.progresso()["feitos"] / decorrido, 2)
+        })
+    resultados["vazao_lote"] = vazao
+    return resultados
+
+
+def cenario_relatorio(args):
+    # O pico de memória não deve crescer com o tamanho da lista (só o resumo
+    # de cada resposta chega aos agrupamentos)
+    resultados = []
+    for concorrencia in args.workers:
+        with ServidorSimulado(latencia_ms=args.latencia, variacao_ms=args.variacao,
+                              taxa_erro=args.taxa_erro, taxa_429=args.taxa_429) as servidor:
+            cliente = criar_cliente(servidor, conexoes=max(10, concorrencia))
+            relatorio = RelatorioCarteira(gerar_cnpjs(args.lote), cliente, concorrencia)
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            try:
+                relatorio.executar()
+            finally:
+                decorrido = time.perf_counter() - inicio
+                _, pico = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                cliente.fechar()
+            p = relatorio.progresso()
+            resultados.append({
+                "concorrencia": concorrencia,
+                "consultas": p["feitos"],
+                "erros": p["erros"],
+                "segundos": round(decorrido, 3),
+                "consultas_por_segundo": round(p["feitos"] / decorrido, 2),
+                "pico_memoria_mb": round(pico / 1024 / 1024, 2),
+                "grupos": {nome: len(linhas) for nome, linhas in relatorio.agregados.tabelas().items()}
+            })
+    return resultados
+
+
+def cliente_simulado(url, limitadores):
+    # Criado dentro de cada processo do lote (precisa ser função do módulo)
+    return ClienteCNPJa(provedores=[ProvedorCNPJa(url=url, limitador=limitadores[ProvedorCNPJa.nome])], conexoes=32)
+
+
+def cenario_processos(args):
+    # CNPJs espalhados por vários prefixos, para que haja shards para todos
+    # os processos; o servidor simulado roda neste processo, que no lote só
+    # coordena, e vira o gargalo antes da CPU dos processos consultando
+    cnpjs = [c for inicio in range(0, 100000000, 10000000) for c in gerar_cnpjs(args.lote // 10, inicio + 1)]
+    resultados = []
+    for processos in args.processos:
+        with ServidorSimulado(latencia_ms=args.latencia, variacao_ms=args.variacao,
+                              taxa_erro=args.taxa_erro, taxa_429=args.taxa_429) as servidor, \
+                tempfile.TemporaryDirectory() as pasta:
+            fabrica = functools.partial(cliente_simulado, servidor.url)
+            lote = LoteProcessos(cnpjs, os.path.join(pasta, "saida.csv"), fabrica, {ProvedorCNPJa.nome: SEM_LIMITE},
+                                 processos=processos, workers=8, retomar=False)
+            inicio = time.perf_counter()
+            lote.executar()
+            decorrido = time.perf_counter() - inicio
+            p = lote.progresso()
+            resultados.append({
+                "processos": processos,
+                "consultas": p["feitos"],
+                "erros": p["erros"],
+                "segundos": round(decorrido, 3),
+                "consultas_por_segundo": round(p["feitos"] / decorrido, 2),
+                "respostas_servidor": dict(servidor.contagem)
+            })
+    return resultados
+
+
+CENARIOS = {
+    "latencia": cenario_latencia,
+    "lote": cenario_lote,
+    "processamento": cenario_processamento,
+    "provedores": cenario_provedores,
+    "relatorio": cenario_relatorio,
+    "processos": cenario_processos,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cenarios", nargs="+", choices=list(CENARIOS), default=list(CENARIOS))
+    parser.add_argument("--consultas", type=int, default=200, help="consultas do cenário de latência")
+    parser.add_argument("--lote", type=int, default=500, help="CNPJs do cenário de lote")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--processos", type=int, nargs="+", default=[1, 2, 4], help="processos do cenário processos")
+    parser.add_argument("--repeticoes", type=int, default=20000, help="repetições do cenário de processamento")
+    parser.add_argument("--latencia", type=float, default=50.0, help="latência simulada da API (ms)")
+    parser.add_argument("--variacao", type=float, default=20.0, help="variação da latência simulada (ms)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="fração de respostas 503")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="fração de respostas 429")
+    parser.add_argument("--taxa-lenta", type=float, default=0.05, help="fração de respostas lentas (provedores)")
+    parser.add_argument("--lentidao", type=float, default=1000.0, help="atraso das respostas lentas, ms (provedores)")
+    parser.add_argument("--limite-provedor", type=float, default=1200.0,
+                        help="consultas por minuto de cada provedor no lote (provedores)")
+    parser.add_argument("--rotulo", default="", help="identificação da versão/build medida")
+    parser.add_argument("--saida", help="arquivo JSON de resultado (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    resultados = {nome: CENARIOS[nome](args) for nome in args.cenarios}
+    parametros = {k: getattr(args, k) for k in ("latencia", "variacao", "taxa_erro", "taxa_429")}
+    gravar_resultado("consultas", args.rotulo, resultados, args.saida, parametros=parametros)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
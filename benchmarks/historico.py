@@ -0,0 +1,96 @@
+"""Benchmark do histórico (SQLite) com 1 mil, 100 mil e 1 milhão de registros.
+
+Para cada tamanho mede a carga inicial, a gravação de consultas novas, a
+contagem, a primeira página em cada ordenação (como ao abrir a janela de
+histórico), uma página no meio da lista e a busca por CNPJ e por nome:
+
+    python benchmarks/historico.py --rotulo v1.3 --saida historico_v1.3.json
+    python benchmarks/historico.py --tamanhos 1000 100000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+from comum import gravar_resultado, resumo_ms
+
+from cnpj_core.historico import HistoricoDB
+
+PAGINA = 200
+REPETICOES = 20
+PALAVRAS = ["COMERCIO", "SERVICOS", "INDUSTRIA", "TRANSPORTES", "ALIMENTOS", "SISTEMAS", "CONSTRUTORA", "AGRO"]
+
+
+def registros(quantidade, semente=42):
+    aleatorio = random.Random(semente)
+    inicio = datetime(2020, 1, 1)
+    for i in range(quantidade):
+        nome = f"{aleatorio.choice(PALAVRAS)} {aleatorio.choice(PALAVRAS)} {i} LTDA"
+        data = (inicio + timedelta(minutes=aleatorio.randrange(3_000_000))).strftime("%Y-%m-%d %H:%M")
+        yield f"{aleatorio.randrange(10 ** 14):014d}", nome, data
+
+
+def medir(funcao, repeticoes=REPETICOES):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return resumo_ms(tempos)
+
+
+def medir_tamanho(quantidade, pasta):
+    caminho = os.path.join(pasta, f"historico_{quantidade}.db")
+    historico = HistoricoDB(caminho)
+    try:
+        inicio = time.perf_counter()
+        with historico.lock, historico.conn:
+            historico.conn.executemany(
+                "INSERT OR REPLACE INTO historico (cnpj, nome, data) VALUES (?, ?, ?)", registros(quantidade)
+            )
+        carga = time.perf_counter() - inicio
+        total = historico.contar()
+
+        novos = iter(registros(REPETICOES * 10, semente=7))
+
+        def gravar():
+            for _ in range(10):
+                cnpj, nome, _data = next(novos)
+                historico.salvar(nome, cnpj)
+            historico.gravar_pendentes()
+
+        resultado = {
+            "registros": total,
+            "carga_s": round(carga, 3),
+            "tamanho_mb": round(os.path.getsize(caminho) / 1e6, 2),
+            "gravar_10_consultas": medir(gravar),
+            "contar": medir(historico.contar),
+            "busca_cnpj": medir(lambda: historico.listar(busca="12.3", limite=PAGINA)),
+            "busca_nome": medir(lambda: historico.listar(busca="SISTEMAS", limite=PAGINA)),
+            "pagina_meio": medir(lambda: historico.listar("date_desc", limite=PAGINA, deslocamento=total // 2)),
+        }
+        for ordem in HistoricoDB.ORDENACOES:
+            resultado[f"primeira_pagina_{ordem}"] = medir(lambda: historico.listar(ordem, limite=PAGINA))
+        return resultado
+    finally:
+        historico.fechar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1000, 100_000, 1_000_000])
+    parser.add_argument("--rotulo", default="", help="identificação da versão/build medida")
+    parser.add_argument("--saida", help="arquivo JSON de resultado (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        resultados = [medir_tamanho(quantidade, pasta) for quantidade in args.tamanhos]
+    gravar_resultado("historico", args.rotulo, resultados, args.saida, pagina=PAGINA)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
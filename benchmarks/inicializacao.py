@@ -0,0 +1,87 @@
+"""Mede o tempo de inicialização da interface (até a janela ficar interativa).
+
+Executa o aplicativo várias vezes com --medir-inicio e grava um JSON com o
+tempo total do processo (inclui descompactação do executável one-file) e o
+tempo medido dentro do Python, para comparar entre versões:
+
+    python benchmarks/inicializacao.py --rotulo v1.2 --saida inicio_v1.2.json
+    python benchmarks/inicializacao.py --exe dist/CNPJ.exe --rotulo v1.2-onefile
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from cnpj_core import caminhos  # noqa: E402
+
+
+def ultima_medicao():
+    try:
+        with open(caminhos.caminho_medicoes_inicio(), 'r', encoding='utf-8') as f:
+            linhas = f.read().splitlines()
+        return json.loads(linhas[-1]) if linhas else None
+    except (OSError, ValueError):
+        return None
+
+
+def medir(comando, repeticoes):
+    totais, internos = [], []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        subprocess.run(comando + ["--medir-inicio"], check=True)
+        totais.append(time.perf_counter() - inicio)
+        medicao = ultima_medicao()
+        if medicao:
+            internos.append(medicao["segundos"])
+    return totais, internos
+
+
+def resumo(valores):
+    if not valores:
+        return None
+    return {
+        "mediana_s": round(statistics.median(valores), 4),
+        "minimo_s": round(min(valores), 4),
+        "maximo_s": round(max(valores), 4),
+        "amostras": [round(v, 4) for v in valores]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exe", help="executável empacotado (padrão: python CNPJ.py)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--rotulo", default="", help="identificação da versão/build medida")
+    parser.add_argument("--saida", help="arquivo JSON de resultado (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    comando = [args.exe] if args.exe else [sys.executable, os.path.join(RAIZ, "CNPJ.py")]
+    totais, internos = medir(comando, args.repeticoes)
+
+    resultado = {
+        "benchmark": "inicializacao",
+        "rotulo": args.rotulo,
+        "comando": comando,
+        "plataforma": platform.platform(),
+        "python": platform.python_version(),
+        "processo": resumo(totais),
+        "ate_janela_interativa": resumo(internos)
+    }
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Mede o tempo de exibição de cada aba da janela principal com listas grandes.
+
+Abre a interface (precisa de um display), carrega a resposta gravada em
+benchmarks/dados com 10, 1.000 e 5.000 sócios e registra quanto cada aba
+leva para ser preenchida e redesenhada, pelo mesmo gancho usado em
+Diagnóstico > Tempos e uso da API:
+
+    python benchmarks/renderizacao.py --rotulo v1.3 --saida render_v1.3.json
+    python benchmarks/renderizacao.py --socios 100 20000 --repeticoes 3
+"""
+import sys
+import argparse
+
+from comum import RAIZ, gravar_resultado, resumo_ms
+from servidor_simulado import ampliar_socios, carregar_respostas
+
+sys.path.insert(0, RAIZ)
+import CNPJ  # noqa: E402
+
+
+def criar_janela():
+    # Só os widgets da janela principal: sem preferências, cache ou histórico
+    # do usuário. As abas registram os tempos nas métricas e a Relacionadas
+    # lê o índice de sócios (sem ele, só mostra que está indisponível).
+    root = CNPJ.tk.Tk()
+    app = CNPJ.CNPJApp.__new__(CNPJ.CNPJApp)
+    app.root = root
+    app.preferences = {}
+    app.metricas = CNPJ.Metricas()
+    app.indice_socios = None
+    app.create_widgets()
+    root.update()
+    return root, app
+
+
+def medir_abas(root, app, empresa, repeticoes):
+    tempos = {}
+    for _ in range(repeticoes):
+        app.empresa_data = empresa
+        app.abas_pendentes = set(app.preencher_aba)
+        for aba, (nome, _) in app.preencher_aba.items():
+            app.notebook.select(aba)
+            app.renderizar_aba_atual()  # O mesmo que o <<NotebookTabChanged>> faria
+            root.update()
+            tempos.setdefault(nome, []).append(app.tempos_renderizacao[nome] / 1000)
+        app.limpar_dados()
+        root.update()
+    return {nome: resumo_ms(valores) for nome, valores in tempos.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socios", type=int, nargs="+", default=[10, 1000, 5000])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--rotulo", default="", help="identificação da versão/build medida")
+    parser.add_argument("--saida", help="arquivo JSON de resultado (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        root, app = criar_janela()
+    except CNPJ.tk.TclError as e:
+        print(f"Interface indisponível (sem display?): {e}", file=sys.stderr)
+        return 1
+
+    resposta = carregar_respostas()[0]
+    resultados = []
+    try:
+        for quantidade in args.socios:
+            empresa = ampliar_socios(resposta, quantidade)
+            resultados.append({"socios": quantidade, "abas": medir_abas(root, app, empresa, args.repeticoes)})
+    finally:
+        root.destroy()
+
+    gravar_resultado("renderizacao", args.rotulo, resultados, args.saida)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
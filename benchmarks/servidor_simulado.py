@@ -0,0 +1,174 @@
+"""Servidor HTTP local que imita o open.cnpja.com para testes de carga.
+
+Serve as respostas gravadas em benchmarks/dados/*.json (trocando o taxId pelo
+CNPJ pedido), com latência (e uma cauda de respostas lentas), erros 5xx e 429
+configuráveis. Também responde
+304 quando o If-None-Match confere, como a API real. Pode ser usado pelos
+outros benchmarks ou sozinho, apontando o cliente para ele:
+
+    python benchmarks/servidor_simulado.py --porta 8765 --latencia 120 --taxa-429 0.05
+"""
+import os
+import sys
+import glob
+import json
+import time
+import random
+import zlib
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PASTA_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+
+
+def carregar_respostas(pasta=PASTA_DADOS):
+    respostas = []
+    for caminho in sorted(glob.glob(os.path.join(pasta, "*.json"))):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            respostas.append(json.load(f))
+    return respostas
+
+
+def ampliar_socios(empresa, quantidade):
+    # Repete os sócios da resposta gravada até `quantidade`, para medir listas grandes
+    membros = empresa["company"]["members"]
+    empresa = json.loads(json.dumps(empresa))
+    empresa["company"]["members"] = [
+        {**membros[i % len(membros)],
+         "person": {**membros[i % len(membros)]["person"], "name": f"SOCIO {i:05d}"}}
+        for i in range(quantidade)
+    ]
+    return empresa
+
+
+class ServidorSimulado:
+    def __init__(self, porta=0, latencia_ms=0.0, variacao_ms=0.0, taxa_erro=0.0, taxa_429=0.0,
+                 retry_after=1, socios=None, semente=None, taxa_lenta=0.0, lentidao_ms=0.0):
+        self.latencia_ms = latencia_ms
+        self.variacao_ms = variacao_ms
+        # Fração `taxa_lenta` das respostas demora `lentidao_ms` a mais (cauda de latência)
+        self.taxa_lenta = taxa_lenta
+        self.lentidao_ms = lentidao_ms
+        self.taxa_erro = taxa_erro
+        self.taxa_429 = taxa_429
+        self.retry_after = retry_after
+        self.aleatorio = random.Random(semente)
+        self.respostas = carregar_respostas()
+        if socios is not None:
+            self.respostas = [ampliar_socios(r, socios) for r in self.respostas]
+        self.contagem = Counter()
+        self.lock = threading.Lock()
+
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            wbufsize = -1  # Cabeçalhos e corpo num único envio
+
+            def do_GET(self):
+                servidor.responder(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", porta), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}/office/{{cnpj}}"
+
+    def sortear(self):
+        with self.lock:
+            return self.aleatorio.random(), self.aleatorio.random(), self.aleatorio.random()
+
+    def responder(self, requisicao):
+        cnpj = requisicao.path.rstrip("/").rsplit("/", 1)[-1]
+        sorteio, variacao, cauda = self.sortear()
+        espera = self.latencia_ms + (variacao * 2 - 1) * self.variacao_ms
+        if cauda < self.taxa_lenta:
+            espera += self.lentidao_ms
+        if espera > 0:
+            time.sleep(espera / 1000)
+
+        if sorteio < self.taxa_429:
+            self.enviar(requisicao, 429, b'{"message":"Too Many Requests"}', {"Retry-After": str(self.retry_after)})
+            return
+        if sorteio < self.taxa_429 + self.taxa_erro:
+            self.enviar(requisicao, 503, b'{"message":"Service Unavailable"}')
+            return
+        if not cnpj.isalnum() or len(cnpj) != 14:
+            self.enviar(requisicao, 400, b'{"message":"Bad Request"}')
+            return
+
+        empresa = dict(self.respostas[zlib.crc32(cnpj.encode()) % len(self.respostas)])
+        empresa["taxId"] = cnpj
+        corpo = json.dumps(empresa, ensure_ascii=False).encode("utf-8")
+        etag = f'"{zlib.crc32(corpo):08x}"'
+        if requisicao.headers.get("If-None-Match") == etag:
+            self.enviar(requisicao, 304, b"", {"ETag": etag})
+            return
+        self.enviar(requisicao, 200, corpo, {"ETag": etag})
+
+    def enviar(self, requisicao, status, corpo, cabecalhos=None):
+        with self.lock:
+            self.contagem[status] += 1
+        requisicao.send_response(status)
+        requisicao.send_header("Content-Type", "application/json; charset=utf-8")
+        requisicao.send_header("Content-Length", str(len(corpo)))
+        for nome, valor in (cabecalhos or {}).items():
+            requisicao.send_header(nome, valor)
+        requisicao.end_headers()
+        requisicao.wfile.write(corpo)
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="servidor-simulado", daemon=True)
+        self.thread.start()
+        return self
+
+    def parar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *args):
+        self.parar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.0, help="latência média por resposta (ms)")
+    parser.add_argument("--variacao", type=float, default=0.0, help="variação da latência, +- (ms)")
+    parser.add_argument("--taxa-lenta", type=float, default=0.0, help="fração de respostas lentas")
+    parser.add_argument("--lentidao", type=float, default=0.0, help="atraso extra das respostas lentas (ms)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="fração de respostas 503")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="fração de respostas 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After dos 429 (s)")
+    parser.add_argument("--socios", type=int, help="quantidade de sócios em cada resposta")
+    args = parser.parse_args(argv)
+
+    servidor = ServidorSimulado(
+        porta=args.porta, latencia_ms=args.latencia, variacao_ms=args.variacao,
+        taxa_erro=args.taxa_erro, taxa_429=args.taxa_429, retry_after=args.retry_after, socios=args.socios,
+        taxa_lenta=args.taxa_lenta, lentidao_ms=args.lentidao
+    )
+    print(f"Servindo em {servidor.url} (Ctrl+C para sair)", file=sys.stderr)
+    try:
+        servidor.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.httpd.server_close()
+        print(f"\nRespostas por status: {dict(servidor.contagem)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
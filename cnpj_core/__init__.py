@@ -0,0 +1,51 @@
+# Núcleo da consulta de CNPJ, sem dependência da interface gráfica.
+# Pode ser usado por scripts/servidores ou pela linha de comando:
+#
+#     python -m cnpj_core 12.345.678/0001-95 --formato csv
+
+from .formatacao import (
+    CAMPOS_INFO,
+    normalizar_cnpj,
+    get_nested_value,
+    format_cnpj,
+    format_phone,
+    format_address,
+    format_currency,
+    campos_info,
+)
+from .projecao import Projecao, Campo
+from .validacao import limpar_cnpj, cnpj_valido, validar_cnpj, validar_cnpjs
+from .modelo import Empresa, Endereco, Socio, Atividade, Inscricao
+from .cache import CacheConsultas
+from .historico import HistoricoDB
+from .cliente import ClienteCNPJa, LimitadorTaxa
+from .lote import ConsultaLote, EscritorResultados, ler_cnpjs
+
+__all__ = [
+    "CAMPOS_INFO",
+    "normalizar_cnpj",
+    "get_nested_value",
+    "format_cnpj",
+    "format_phone",
+    "format_address",
+    "format_currency",
+    "campos_info",
+    "Projecao",
+    "Campo",
+    "limpar_cnpj",
+    "cnpj_valido",
+    "validar_cnpj",
+    "validar_cnpjs",
+    "Empresa",
+    "Endereco",
+    "Socio",
+    "Atividade",
+    "Inscricao",
+    "CacheConsultas",
+    "HistoricoDB",
+    "ClienteCNPJa",
+    "LimitadorTaxa",
+    "ConsultaLote",
+    "EscritorResultados",
+    "ler_cnpjs",
+]
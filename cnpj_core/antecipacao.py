@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+
+from .validacao import validar_cnpj
+
+# Antecipação de consultas: quando um CNPJ válido aparece no campo de busca
+# (digitado ou colado) ou é selecionado no histórico, ele é consultado em
+# segundo plano e vai para o cache antes do clique em "Consultar". Se o
+# clique chegar com a requisição ainda em voo, a consulta do usuário se
+# junta a ela (ClienteCNPJa.buscar) em vez de abrir outra.
+
+# Fichas do limite de taxa que a antecipação nunca usa: ficam sempre
+# livres para as consultas do usuário. Sem fichas sobrando, não antecipa.
+RESERVA_FICHAS = 2
+
+# Espera sem novos pedidos antes de consultar (ao percorrer o histórico
+# com as setas só o CNPJ em que o usuário parou é antecipado)
+ATRASO_ANTECIPACAO = 0.4
+
+# CNPJs lembrados (já tentados / já antecipados) nesta sessão
+LEMBRADOS = 500
+
+
+class Antecipador:
+    # Uma thread só, com prioridade abaixo das consultas interativas: nunca
+    # espera pelo limitador, faz uma única tentativa e só guarda o pedido
+    # mais recente.
+    def __init__(self, cliente, reserva=RESERVA_FICHAS, atraso=ATRASO_ANTECIPACAO):
+        self.cliente = cliente
+        self.reserva = reserva
+        self.atraso = atraso
+        self.lock = threading.Lock()
+        self.pedido = None
+        self.pedido_evento = threading.Event()
+        self.parar_evento = threading.Event()
+        self.tentados = OrderedDict()
+        self.antecipados = OrderedDict()
+        self.thread = None
+
+    def pedir(self, texto):
+        cnpj = validar_cnpj(texto)
+        if cnpj is None:
+            return
+        with self.lock:
+            if cnpj in self.tentados or cnpj == self.pedido:
+                return
+            self.pedido = cnpj
+            if self.thread is None or not self.thread.is_alive():
+                self.parar_evento.clear()
+                self.thread = threading.Thread(target=self.executar, name="antecipacao", daemon=True)
+                self.thread.start()
+        self.pedido_evento.set()
+
+    def descartar(self, cnpj):
+        # O usuário já consultou: o pedido ainda não iniciado perde o sentido
+        with self.lock:
+            if self.pedido == cnpj:
+                self.pedido = None
+
+    def parar(self):
+        self.parar_evento.set()
+        self.pedido_evento.set()
+
+    def aproveitar(self, cnpj):
+        # True se o CNPJ consultado agora foi antecipado (conta uma vez)
+        with self.lock:
+            if self.antecipados.pop(cnpj, None) is None:
+                return False
+        self.cliente.contar("antecipacoes_aproveitadas")
+        return True
+
+    @staticmethod
+    def lembrar(registro, cnpj):
+        registro[cnpj] = True
+        registro.move_to_end(cnpj)
+        while len(registro) > LEMBRADOS:
+            registro.popitem(last=False)
+
+    def executar(self):
+        while not self.parar_evento.is_set():
+            self.pedido_evento.wait()
+            self.pedido_evento.clear()
+            # Só consulta depois de `atraso` segundos sem pedido novo
+            while self.pedido_evento.wait(self.atraso) and not self.parar_evento.is_set():
+                self.pedido_evento.clear()
+            if self.parar_evento.is_set():
+                break
+            with self.lock:
+                cnpj, self.pedido = self.pedido, None
+            if cnpj is not None:
+                self.antecipar(cnpj)
+
+    def antecipar(self, cnpj):
+        cache = self.cliente.cache
+        entrada = cache.obter(cnpj) if cache is not None else None
+        if entrada and not cache.expirada(entrada):
+            return
+        try:
+            status_code, _, _ = self.cliente.buscar(
+                cnpj, entrada=entrada, tentativas=1, parar=self.parar_evento, reserva=self.reserva
+            )
+        except InterruptedError:
+            # Sem fichas livres: pode ser pedido de novo mais tarde
+            self.cliente.contar("antecipacoes_adiadas")
+            return
+        except Exception as e:
+            self.cliente.metricas.erro("antecipação", e)
+            status_code = None
+        with self.lock:
+            self.lembrar(self.tentados, cnpj)
+            if status_code == 200:
+                self.lembrar(self.antecipados, cnpj)
+        if status_code == 200:
+            self.cliente.contar("antecipadas")
@@ -0,0 +1,413 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime
+
+from .caminhos import caminho_busca, caminho_cache, caminho_base_receita
+from .formatacao import format_cnpj
+from .projecao import Projecao
+from .relacionadas import normalizar_nome
+from .validacao import limpar_cnpj
+
+# Busca local por nome: toda empresa consultada (API, cache ou base da
+# Receita) entra em índices FTS5 do SQLite com nome empresarial, nome
+# fantasia, cidade/bairro, atividade principal e nomes dos sócios. O texto é
+# normalizado antes (maiúsculas, sem acentos e pontuação, como no índice de
+# sócios). São dois índices sobre a mesma tabela:
+#
+#   palavras  por palavra e início de palavra ("pad estr" acha "PADARIA
+#             ESTRELA"); é o caminho rápido, usado primeiro
+#   trechos   trigramas: qualquer trecho ("daria") e, se nada casar, a busca
+#             aproximada pelos trigramas em comum, que tolera erros de
+#             digitação ("pdaria estrella")
+#
+# Só as colunas dos resultados ficam aqui; para abrir um resultado, o JSON
+# completo sai do cache, dos snapshots ou da base da Receita.
+
+ATRASO_GRAVACAO = 2.0
+LINHAS_POR_LOTE = 20000
+RESULTADOS = 50
+
+# Documentos lidos do índice e ordenados a cada busca, e fração mínima
+# dos trigramas de cada termo presentes no nome na busca aproximada
+CANDIDATOS = 2000
+SIMILARIDADE_MINIMA = 0.5
+
+# Peso de cada coluna na ordenação (nome, fantasia, local, atividade, sócios)
+PESOS = (10.0, 8.0, 1.0, 1.0, 2.0)
+
+COLUNAS_FTS = "t_nome, t_fantasia, t_local, t_atividade, t_socios"
+TABELA = (
+    "CREATE TABLE IF NOT EXISTS documentos ("
+    "id INTEGER PRIMARY KEY, cnpj TEXT NOT NULL UNIQUE, nome TEXT, fantasia TEXT, cidade TEXT, uf TEXT, "
+    "situacao TEXT, origem TEXT, atualizado TEXT NOT NULL, "
+    "t_nome TEXT, t_fantasia TEXT, t_local TEXT, t_atividade TEXT, t_socios TEXT)"
+)
+INDICES_FTS = {
+    "palavras": "tokenize='unicode61', prefix='2 3', detail='column'",
+    # O trigram existe a partir do SQLite 3.34; sem ele, só a busca por palavra
+    "trechos": "tokenize='trigram'",
+}
+
+
+def esquema_fts(tabela, opcoes):
+    # Índice de conteúdo externo (o texto fica só em documentos) e os
+    # gatilhos que o mantêm em sincronia com a tabela
+    novos = "new.id, " + ", ".join(f"new.{c}" for c in COLUNAS_FTS.split(", "))
+    antigos = "old.id, " + ", ".join(f"old.{c}" for c in COLUNAS_FTS.split(", "))
+    inserir = f"INSERT INTO {tabela} (rowid, {COLUNAS_FTS}) VALUES ({novos});"
+    remover = f"INSERT INTO {tabela} ({tabela}, rowid, {COLUNAS_FTS}) VALUES ('delete', {antigos});"
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabela} USING fts5("
+        f"{COLUNAS_FTS}, content='documentos', content_rowid='id', {opcoes})",
+        f"CREATE TRIGGER IF NOT EXISTS {tabela}_ai AFTER INSERT ON documentos BEGIN {inserir} END",
+        f"CREATE TRIGGER IF NOT EXISTS {tabela}_ad AFTER DELETE ON documentos BEGIN {remover} END",
+        f"CREATE TRIGGER IF NOT EXISTS {tabela}_au AFTER UPDATE ON documentos BEGIN {remover} {inserir} END",
+    )
+
+
+DOCUMENTO = Projecao({
+    "nome": "company.name",
+    "fantasia": "alias",
+    "cidade": "address.city",
+    "bairro": "address.district",
+    "uf": "address.state",
+    "situacao": "status.text",
+    "atividade": "mainActivity.text",
+    "socios": "company.members"
+})
+
+
+def trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)} if len(texto) >= 3 else set()
+
+
+def linha_documento(cnpj, nome, fantasia, cidade, bairro, uf, situacao, atividade, socios, origem):
+    # Valores da tabela documentos; os t_* são o texto normalizado indexado
+    local = " ".join(p for p in (cidade, bairro, uf) if p)
+    return (
+        cnpj, nome, fantasia, cidade, uf, situacao, origem,
+        normalizar_nome(nome), normalizar_nome(fantasia), normalizar_nome(local),
+        normalizar_nome(atividade), normalizar_nome(socios)
+    )
+
+
+def documento_empresa(empresa, origem="api"):
+    cnpj = limpar_cnpj(empresa.get("taxId") if empresa else "")
+    if len(cnpj) != 14:
+        return None
+    nome, fantasia, cidade, bairro, uf, situacao, atividade, membros = DOCUMENTO.tupla(empresa)
+    socios = " ".join((m.get("person") or {}).get("name") or "" for m in membros or ())
+    return linha_documento(cnpj, nome, fantasia, cidade, bairro, uf, situacao, atividade, socios, origem)
+
+
+class IndiceBusca:
+    # Mesmo esquema do HistoricoDB e do IndiceSocios: SQLite em WAL,
+    # gravações enfileiradas e feitas juntas.
+    def __init__(self, caminho=None):
+        self.caminho = caminho or caminho_busca()
+        self.lock = threading.Lock()
+        self.pendentes = {}
+        self.timer = None
+        self.conn = sqlite3.connect(self.caminho, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.indices = []
+        with self.conn:
+            self.conn.execute(TABELA)
+            self.migrar()
+            for tabela, opcoes in INDICES_FTS.items():
+                try:
+                    for comando in esquema_fts(tabela, opcoes):
+                        self.conn.execute(comando)
+                except sqlite3.OperationalError as e:
+                    if tabela == "palavras":
+                        raise RuntimeError(f"SQLite sem suporte a FTS5: {e}") from e
+                    continue
+                self.indices.append(tabela)
+
+    def migrar(self):
+        # Índices antigos guardavam uma cópia comprimida de cada resposta na
+        # coluna dados; sem DROP COLUMN (SQLite < 3.35), ela só é esvaziada
+        colunas = {linha[1] for linha in self.conn.execute("PRAGMA table_info(documentos)")}
+        if "dados" in colunas:
+            try:
+                self.conn.execute("ALTER TABLE documentos DROP COLUMN dados")
+            except sqlite3.OperationalError:
+                self.conn.execute("UPDATE documentos SET dados = NULL WHERE dados IS NOT NULL")
+
+    def salvar(self, empresa):
+        documento = documento_empresa(empresa)
+        if documento is None:
+            return
+        with self.lock:
+            self.pendentes[documento[0]] = documento
+            if self.timer is None:
+                self.timer = threading.Timer(ATRASO_GRAVACAO, self.gravar_agendado)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def gravar_pendentes(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.pendentes:
+                return
+            self.gravar(list(self.pendentes.values()))
+            self.pendentes.clear()
+
+    def gravar_agendado(self):
+        try:
+            self.gravar_pendentes()
+        except Exception as e:
+            print(f"Erro ao gravar índice de busca: {e}")
+
+    def gravar(self, documentos):
+        # Chamado com self.lock já adquirido
+        data = datetime.now().strftime("%Y-%m-%d %H:%M")
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO documentos (cnpj, nome, fantasia, cidade, uf, situacao, origem, "
+                "t_nome, t_fantasia, t_local, t_atividade, t_socios, atualizado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(cnpj) DO UPDATE SET nome = excluded.nome, fantasia = excluded.fantasia, "
+                "cidade = excluded.cidade, uf = excluded.uf, situacao = excluded.situacao, "
+                "origem = excluded.origem, t_nome = excluded.t_nome, t_fantasia = excluded.t_fantasia, t_local = excluded.t_local, "
+                "t_atividade = excluded.t_atividade, t_socios = excluded.t_socios, atualizado = excluded.atualizado",
+                [documento + (data,) for documento in documentos]
+            )
+
+    def gravar_lote(self, lote, ao_progresso, total):
+        if not lote:
+            return 0
+        with self.lock:
+            self.gravar(lote)
+        if ao_progresso:
+            ao_progresso(total + len(lote))
+        return len(lote)
+
+    def importar_cache(self, pasta=None, ao_progresso=None):
+        # Indexa as respostas já guardadas no cache de consultas
+        pasta = pasta or caminho_cache()
+        self.gravar_pendentes()
+        lote, total = [], 0
+        for nome_arquivo in os.listdir(pasta):
+            if not nome_arquivo.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(pasta, nome_arquivo), 'r', encoding='utf-8') as f:
+                    documento = documento_empresa(json.load(f)["empresa"])
+            except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                continue
+            if documento is not None:
+                lote.append(documento)
+            if len(lote) >= LINHAS_POR_LOTE:
+                total += self.gravar_lote(lote, ao_progresso, total)
+                lote = []
+        return total + self.gravar_lote(lote, ao_progresso, total)
+
+    def importar_receita(self, caminho=None, ao_progresso=None):
+        # Indexa todos os estabelecimentos da base local da Receita (python
+        # -m cnpj_core.receita), com os sócios da empresa (CNPJ básico)
+        from .receita import SITUACOES
+        caminho = caminho or caminho_base_receita()
+        self.gravar_pendentes()
+        uri = "file:" + caminho.replace("\\", "/") + "?mode=ro"
+        origem = sqlite3.connect(uri, uri=True)
+        try:
+            linhas = origem.execute(
+                "SELECT e.cnpj, emp.razao_social, e.fantasia, m.descricao, e.bairro, e.uf, e.situacao, "
+                "c.descricao, (SELECT group_concat(s.nome, ' ') FROM socios s WHERE s.cnpj_basico = e.cnpj_basico) "
+                "FROM estabelecimentos e "
+                "LEFT JOIN empresas emp ON emp.cnpj_basico = e.cnpj_basico "
+                "LEFT JOIN municipios m ON m.codigo = e.municipio "
+                "LEFT JOIN cnaes c ON c.codigo = e.cnae_principal"
+            )
+            lote, total = [], 0
+            for cnpj, nome, fantasia, cidade, bairro, uf, situacao, atividade, socios in linhas:
+                lote.append(linha_documento(
+                    cnpj, nome, fantasia, cidade, bairro, uf, SITUACOES.get(situacao), atividade, socios, "receita"
+                ))
+                if len(lote) >= LINHAS_POR_LOTE:
+                    total += self.gravar_lote(lote, ao_progresso, total)
+                    lote = []
+            return total + self.gravar_lote(lote, ao_progresso, total)
+        finally:
+            origem.close()
+
+    def candidatos(self, tabela, consulta, limite):
+        # Sem ORDER BY o FTS5 para no limite em vez de pontuar todos os
+        # documentos que casam (termos comuns casam com milhões)
+        with self.lock:
+            return [linha[0] for linha in self.conn.execute(
+                f"SELECT rowid FROM {tabela} WHERE {tabela} MATCH ? LIMIT ?", (consulta, limite)
+            )]
+
+    def documentos(self, ids):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT cnpj, nome, fantasia, cidade, uf, situacao, origem, "
+                "t_nome, t_fantasia, t_local, t_atividade, t_socios "
+                f"FROM documentos WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+
+    def buscar_termos(self, tabela, consulta):
+        # Primeiro quem tem tudo no nome ou na fantasia; se forem poucos,
+        # também quem casa pela cidade, atividade ou sócios
+        ids = self.candidatos(tabela, f"{{t_nome t_fantasia}} : ({consulta})", CANDIDATOS + 1)
+        parcial = len(ids) > CANDIDATOS
+        if len(ids) < RESULTADOS:
+            extras = self.candidatos(tabela, consulta, CANDIDATOS + 1)
+            parcial = len(extras) > CANDIDATOS
+            ids = list(dict.fromkeys(ids + extras))
+        return ids[:CANDIDATOS], parcial
+
+    def buscar(self, texto, limite=RESULTADOS):
+        # Devolve (linhas, aproximada, parcial). Linhas: (cnpj, nome,
+        # fantasia, cidade, uf, situação, origem), das mais relevantes para
+        # as menos. `parcial`: casaram mais de CANDIDATOS documentos e só
+        # esses foram ordenados (vale refinar a busca).
+        termos = normalizar_nome(texto).split()
+        if not termos:
+            return [], False, False
+        self.gravar_pendentes()
+
+        digitos = limpar_cnpj(texto)
+        if digitos and all(c.isdigit() or c in "./- " for c in texto.strip()):
+            with self.lock:
+                return self.conn.execute(
+                    "SELECT cnpj, nome, fantasia, cidade, uf, situacao, origem FROM documentos "
+                    "WHERE cnpj >= ? AND cnpj < ? ORDER BY cnpj LIMIT ?",
+                    (digitos, digitos + "~", limite)
+                ).fetchall(), False, False
+
+        # Palavras pelo início; letras soltas ("e", "a") ficam de fora
+        palavras = [t for t in termos if len(t) > 1] or termos
+        ids, parcial = self.buscar_termos("palavras", " ".join(f'"{t}"*' for t in palavras))
+        if ids:
+            return self.ordenar(palavras, self.documentos(ids), limite), False, parcial
+        if "trechos" not in self.indices:
+            return [], False, False
+
+        # Trechos no meio das palavras; menos de 3 letras não forma trigrama
+        trechos = [t for t in termos if len(t) >= 3]
+        if not trechos:
+            return [], False, False
+        ids, parcial = self.buscar_termos("trechos", " ".join(f'"{t}"' for t in trechos))
+        if ids:
+            return self.ordenar(trechos, self.documentos(ids), limite), False, parcial
+        return self.buscar_aproximado(trechos, limite), True, False
+
+    @staticmethod
+    def ordenar(termos, documentos, limite, minimo=0.0):
+        # Cada termo vale o peso da coluna mais importante em que aparece
+        # (inteiro ou, na busca aproximada, pela fração de trigramas em
+        # comum); nome começando pela busca e nomes curtos desempatam
+        pontuados = []
+        for *linha, t_nome, t_fantasia, t_local, t_atividade, t_socios in documentos:
+            colunas = (t_nome or "", t_fantasia or "", t_local or "", t_atividade or "", t_socios or "")
+            pontos = 0.0
+            vistos = {}
+            for termo in termos:
+                melhor = 0.0
+                for peso, coluna in zip(PESOS, colunas):
+                    if peso <= melhor:
+                        continue
+                    if termo in coluna:
+                        melhor = peso
+                    elif minimo and peso >= PESOS[1]:
+                        buscados = trigramas(termo)
+                        if buscados:
+                            if coluna not in vistos:
+                                vistos[coluna] = trigramas(coluna)
+                            melhor = max(melhor, peso * len(buscados & vistos[coluna]) / len(buscados))
+                pontos += melhor
+            if minimo and pontos < minimo * PESOS[1] * len(termos):
+                continue
+            bonus = PESOS[0] / 2 if colunas[0].startswith(termos[0]) else 0.0
+            pontuados.append((-(pontos + bonus), len(colunas[0]), tuple(linha)))
+        pontuados.sort()
+        return [linha for _, _, linha in pontuados[:limite]]
+
+    def buscar_aproximado(self, termos, limite):
+        # Tolerância a erros de digitação: candidato é quem tem qualquer
+        # trigrama dos termos no nome ou fantasia (um erro estraga até três
+        # trigramas seguidos, e numa palavra curta pode não sobrar nenhum
+        # trecho maior intacto). Cada trigrama traz no máximo CANDIDATOS
+        # documentos; ficam os que aparecem em mais trigramas, e ordenar
+        # descarta os que não chegam a SIMILARIDADE_MINIMA.
+        contagem = Counter()
+        for trigrama in sorted(set().union(*(trigramas(termo) for termo in termos))):
+            contagem.update(self.candidatos("trechos", f'{{t_nome t_fantasia}} : "{trigrama}"', CANDIDATOS))
+        if not contagem:
+            return []
+        ids = [id_ for id_, _ in contagem.most_common(CANDIDATOS)]
+        return self.ordenar(termos, self.documentos(ids), limite, SIMILARIDADE_MINIMA)
+
+    def contar(self):
+        self.gravar_pendentes()
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM documentos").fetchone()[0]
+
+    def otimizar(self):
+        # Junta os segmentos do FTS5 (depois de importações grandes)
+        self.gravar_pendentes()
+        with self.lock, self.conn:
+            for tabela in self.indices:
+                self.conn.execute(f"INSERT INTO {tabela} ({tabela}) VALUES ('optimize')")
+
+    def fechar(self):
+        self.gravar_pendentes()
+        with self.lock:
+            self.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m cnpj_core.busca",
+        description="Busca local por nome, fantasia, cidade, atividade ou sócio das empresas já consultadas"
+    )
+    parser.add_argument("--indice", default=caminho_busca(), help="arquivo do índice de busca")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    cache = sub.add_parser("importar-cache", help="indexa as respostas guardadas no cache de consultas")
+    cache.add_argument("--pasta", default=caminho_cache())
+    receita = sub.add_parser("importar-receita", help="indexa os estabelecimentos da base local da Receita")
+    receita.add_argument("--base", default=caminho_base_receita())
+    buscar = sub.add_parser("buscar", help="busca empresas (aceita trechos e erros de digitação)")
+    buscar.add_argument("texto", nargs="+")
+    buscar.add_argument("--limite", type=int, default=RESULTADOS)
+    args = parser.parse_args(argv)
+
+    indice = IndiceBusca(args.indice)
+    try:
+        progresso = lambda n: print(f"\r{n} empresas indexadas", end="", file=sys.stderr, flush=True)
+        if args.comando == "importar-cache":
+            indice.importar_cache(args.pasta, progresso)
+            indice.otimizar()
+            print(file=sys.stderr)
+        elif args.comando == "importar-receita":
+            indice.importar_receita(args.base, progresso)
+            indice.otimizar()
+            print(file=sys.stderr)
+        else:
+            inicio = time.perf_counter()
+            linhas, aproximada, parcial = indice.buscar(" ".join(args.texto), args.limite)
+            decorrido = (time.perf_counter() - inicio) * 1000
+            for cnpj, nome, fantasia, cidade, uf, situacao, _ in linhas:
+                fantasia = f" ({fantasia})" if fantasia else ""
+                print(f"{format_cnpj(cnpj)}  {nome or ''}{fantasia}  {cidade or ''}/{uf or ''}  {situacao or ''}")
+            print(f"{len(linhas)} resultado(s){' aproximados' if aproximada else ''} em {decorrido:.0f} ms"
+                  f"{f' (entre os primeiros {CANDIDATOS}; refine a busca)' if parcial else ''}", file=sys.stderr)
+    finally:
+        indice.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
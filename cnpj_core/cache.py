@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import threading
+
+# Cache local das respostas da API
+CACHE_TTL_HORAS = 24
+CACHE_MAX_ENTRADAS = 5000
+CACHE_PODA_A_CADA = 50
+
+
+class CacheConsultas:
+    # Guarda o JSON bruto de cada empresa em um arquivo por CNPJ.
+    # O mtime do arquivo marca o último acesso e é usado para a remoção LRU.
+    def __init__(self, pasta, ttl_horas=CACHE_TTL_HORAS, max_entradas=CACHE_MAX_ENTRADAS):
+        self.pasta = pasta
+        self.ttl = ttl_horas * 3600
+        self.max_entradas = max_entradas
+        self.lock = threading.Lock()
+        self.gravacoes = 0
+        os.makedirs(self.pasta, exist_ok=True)
+        self.podar()
+    
+    def caminho(self, cnpj):
+        return os.path.join(self.pasta, f"{cnpj}.json")
+    
+    def obter(self, cnpj):
+        caminho = self.caminho(cnpj)
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                entrada = json.load(f)
+            os.utime(caminho)
+        except (OSError, ValueError):
+            return None
+        return entrada
+    
+    def expirada(self, entrada):
+        return time.time() - entrada.get("salvo_em", 0) > self.ttl
+    
+    def salvar(self, cnpj, empresa, etag=None, last_modified=None):
+        entrada = {
+            "salvo_em": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "empresa": empresa
+        }
+        self.gravar(cnpj, entrada)
+        with self.lock:
+            self.gravacoes += 1
+            podar = self.gravacoes % CACHE_PODA_A_CADA == 0
+        if podar:
+            self.podar()
+        return entrada
+    
+    def renovar(self, cnpj, entrada):
+        entrada["salvo_em"] = time.time()
+        self.gravar(cnpj, entrada)
+    
+    def gravar(self, cnpj, entrada):
+        caminho = self.caminho(cnpj)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(entrada, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+    
+    def podar(self):
+        with self.lock:
+            try:
+                arquivos = [e for e in os.scandir(self.pasta) if e.name.endswith('.json')]
+                excesso = len(arquivos) - self.max_entradas
+                if excesso <= 0:
+                    return
+                arquivos.sort(key=lambda e: e.stat().st_mtime)
+                for entrada in arquivos[:excesso]:
+                    os.remove(entrada.path)
+            except OSError as e:
+                print(f"Erro ao podar cache: {e}")
+    
+    def limpar(self):
+        with self.lock:
+            for entrada in os.scandir(self.pasta):
+                if entrada.name.endswith('.json'):
+                    os.remove(entrada.path)
@@ -0,0 +1,46 @@
+import os
+
+
+# Arquivos do aplicativo ficam na pasta Documentos do usuário
+def pasta_documentos():
+    return os.path.join(os.path.expanduser('~'), 'Documents')
+
+
+def caminho_preferencias():
+    return os.path.join(pasta_documentos(), 'CNPJConsult_preferences.json')
+
+
+def caminho_historico_json():
+    return os.path.join(pasta_documentos(), 'HistoricoConsult_preferences.json')
+
+
+def caminho_historico_db():
+    return os.path.join(pasta_documentos(), 'CNPJConsult_historico.db')
+
+
+def caminho_cache():
+    return os.path.join(pasta_documentos(), 'CNPJConsult_cache')
+
+
+def caminho_medicoes_inicio():
+    return os.path.join(pasta_documentos(), 'CNPJConsult_inicializacao.jsonl')
+
+
+def caminho_base_receita():
+    return os.path.join(pasta_documentos(), 'CNPJConsult_receita.db')
+
+
+def caminho_monitoramento():
+    return os.path.join(pasta_documentos(), 'CNPJConsult_monitoramento.db')
+
+
+def caminho_socios():
+    return os.path.join(pasta_documentos(), 'CNPJConsult_socios.db')
+
+
+def caminho_busca():
+    return os.path.join(pasta_documentos(), 'CNPJConsult_busca.db')
+
+
+def caminho_snapshots():
+    return os.path.join(pasta_documentos(), 'CNPJConsult_snapshots')
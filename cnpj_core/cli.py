@@ -0,0 +1,228 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .busca import IndiceBusca
+from .caminhos import caminho_cache, caminho_base_receita, caminho_socios, caminho_busca, caminho_snapshots
+from .cache import CacheConsultas
+from .cliente import (
+    ClienteCNPJa, LimitadorTaxa, LIMITE_POR_MINUTO, TIMEOUT_CONEXAO, TIMEOUT_LEITURA, CONEXOES_POR_HOST
+)
+from .formatacao import CAMPOS_INFO
+from .lote import ConsultaLote, ler_cnpjs, registro_lote
+from .metricas import Metricas
+from .processos import LoteProcessos
+from .provedores import PROVEDORES, PROVEDORES_PADRAO, ProvedorCNPJa, criar_provedores
+from .receita import BaseReceita
+from .relacionadas import IndiceSocios
+from .snapshots import BaseSnapshots
+from .validacao import limpar_cnpj, cnpj_valido
+
+
+def criar_cliente(args, limitadores=None):
+    # `limitadores` (provedor -> limitador) vem do lote em vários processos
+    cache = None if args.sem_cache else CacheConsultas(caminho_cache())
+    base_local = None
+    if not args.sem_base_local and os.path.exists(caminho_base_receita()):
+        base_local = BaseReceita(caminho_base_receita())
+    limitador = (limitadores or {}).get(ProvedorCNPJa.nome) or LimitadorTaxa(args.limite)
+    return ClienteCNPJa(
+        cache=cache, limitador=limitador,
+        timeout=(args.timeout_conexao, args.timeout_leitura),
+        conexoes=max(args.workers, CONEXOES_POR_HOST), http2=args.http2,
+        base_local=base_local, metricas=criar_metricas(args),
+        indice_socios=None if args.sem_indice_socios else IndiceSocios(caminho_socios()),
+        indice_busca=None if args.sem_indice_busca else IndiceBusca(caminho_busca()),
+        snapshots=None if args.sem_snapshots else BaseSnapshots(caminho_snapshots()),
+        provedores=criar_provedores(args.provedores, limitador, limitadores), reforco=args.reforco
+    )
+
+
+def criar_metricas(args):
+    metricas = Metricas(log=args.metricas_log)
+    if args.metricas_porta:
+        metricas.servir(args.metricas_porta)
+        print(f"Métricas em http://127.0.0.1:{args.metricas_porta}/metrics", file=sys.stderr)
+    return metricas
+
+
+def encerrar_cliente(cliente, args):
+    # Grava o resumo final das métricas (.prom no formato do Prometheus,
+    # qualquer outra extensão em JSON) e fecha conexões, índice e log
+    cliente.fechar()
+    if cliente.indice_socios is not None:
+        cliente.indice_socios.fechar()
+    if cliente.indice_busca is not None:
+        cliente.indice_busca.fechar()
+    if cliente.snapshots is not None:
+        cliente.snapshots.fechar()
+    if args.metricas:
+        if args.metricas.endswith(".prom"):
+            texto = cliente.metricas.texto_prometheus()
+        else:
+            texto = json.dumps(cliente.metricas.resumo_json(), ensure_ascii=False, indent=2) + "\n"
+        with open(args.metricas, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    cliente.metricas.fechar()
+
+
+def main_lote(args):
+    cnpjs, invalidos = ler_cnpjs(args.lote)
+    if args.processos > 1:
+        # Cada processo cria o próprio cliente; o limite de cada provedor é compartilhado entre eles
+        cliente = None
+        limites = {nome: args.limite if nome == ProvedorCNPJa.nome else PROVEDORES[nome].limite_por_minuto
+                   for nome in args.provedores}
+        lote = LoteProcessos(
+            cnpjs, args.saida, functools.partial(criar_cliente, args), limites, processos=args.processos,
+            workers=args.workers, formato=args.formato, retomar=not args.recomecar, invalidos=invalidos,
+            bruto=args.bruto
+        )
+    else:
+        cliente = criar_cliente(args)
+        lote = ConsultaLote(
+            cnpjs, args.saida, cliente, formato=args.formato, workers=args.workers,
+            retomar=not args.recomecar, invalidos=invalidos, bruto=args.bruto
+        )
+    
+    thread = threading.Thread(target=lote.executar, name="lote")
+    thread.start()
+    try:
+        while thread.is_alive():
+            thread.join(1.0)
+            p = lote.progresso()
+            restante = f" - restante ~{int(p['restante_s'] // 60)} min" if p['restante_s'] is not None else ""
+            print(f"\r{p['feitos']}/{p['total']} - {p['por_segundo']:.2f} consultas/s - "
+                  f"{p['erros']} erros{restante}   ", end="", file=sys.stderr, flush=True)
+    except KeyboardInterrupt:
+        print("\nInterrompendo... (execute novamente para retomar)", file=sys.stderr)
+        lote.parar()
+        thread.join()
+    finally:
+        if cliente is not None:
+            encerrar_cliente(cliente, args)
+    
+    p = lote.progresso()
+    c = cliente.estatisticas() if cliente is not None else lote.estatisticas()
+    print(f"\nConcluído: {p['feitos']} consultados, {p['pulados']} já existentes, "
+          f"{p['erros']} erros, {len(invalidos)} inválidos", file=sys.stderr)
+    print(f"Cache/base local: {c['acertos']} - API: {c['faltas']} - agrupadas: {c['agrupadas']}",
+          file=sys.stderr)
+    return 1 if p['erros'] else 0
+
+
+def consultar_um(cliente, cnpj):
+    # Devolve (cnpj, status, empresa) sem deixar exceções interromperem a lista
+    if not cnpj_valido(cnpj):
+        return cnpj, "inválido", None
+    try:
+        empresa = cliente.consultar(cnpj)
+    except ValueError:
+        return cnpj, "inválido", None
+    except Exception as e:
+        return cnpj, f"erro: {e}", None
+    return cnpj, "ok" if empresa else "não encontrado", empresa
+
+
+def main_consulta(args):
+    cnpjs = [limpar_cnpj(c) for c in args.cnpjs]
+    if args.arquivo:
+        lidos, invalidos = ler_cnpjs(args.arquivo)
+        cnpjs += lidos + [limpar_cnpj(linha) for linha in invalidos]
+    
+    cliente = criar_cliente(args)
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            resultados = executor.map(lambda cnpj: consultar_um(cliente, cnpj), cnpjs)
+            
+            if args.formato == "csv":
+                writer = csv.writer(sys.stdout)
+                writer.writerow(["CNPJ", "Status"] + CAMPOS_INFO)
+                for cnpj, status, empresa in resultados:
+                    registro = registro_lote(cnpj, status, empresa.dados if empresa else None)
+                    writer.writerow([registro.get(coluna) or "" for coluna in ["CNPJ", "Status"] + CAMPOS_INFO])
+                    sys.stdout.flush()
+            else:
+                saida = []
+                for cnpj, status, empresa in resultados:
+                    registro = empresa.para_dict(args.bruto) if empresa else {"cnpj": cnpj}
+                    registro["status"] = status
+                    if args.formato == "jsonl":
+                        print(json.dumps(registro, ensure_ascii=False), flush=True)
+                    else:
+                        saida.append(registro)
+                if args.formato == "json":
+                    print(json.dumps(saida, ensure_ascii=False, indent=2))
+    finally:
+        encerrar_cliente(cliente, args)
+    return 0
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m cnpj_core",
+        description="Consulta de CNPJ (open.cnpja.com) sem interface gráfica"
+    )
+    parser.add_argument("cnpjs", nargs="*", metavar="CNPJ", help="CNPJs a consultar (com ou sem pontuação)")
+    parser.add_argument("--arquivo", metavar="ARQUIVO", help="CSV/TXT com mais CNPJs para consultar")
+    parser.add_argument("--formato", choices=["json", "jsonl", "csv"],
+                        help="formato da saída (padrão: json; csv/jsonl pela extensão em --lote)")
+    parser.add_argument("--bruto", action="store_true", help="inclui o JSON original da API na saída json/jsonl (e no lote jsonl)")
+    parser.add_argument("--lote", metavar="ARQUIVO", help="CSV/TXT com CNPJs para consulta em lote com retomada")
+    parser.add_argument("--saida", metavar="ARQUIVO", help="arquivo de saída .csv ou .jsonl do lote")
+    parser.add_argument("--workers", type=int, default=4, help="consultas simultâneas (padrão: 4)")
+    parser.add_argument("--processos", type=int, default=1,
+                        help="processos do lote, cada um com --workers consultas simultâneas, com o "
+                             "limite de taxa compartilhado (padrão: 1; use o número de núcleos em listas de milhões)")
+    parser.add_argument("--limite", type=float, default=LIMITE_POR_MINUTO,
+                        help=f"consultas por minuto na CNPJá (padrão: {LIMITE_POR_MINUTO}); "
+                             "os outros provedores usam o limite público de cada um")
+    parser.add_argument("--provedores", nargs="+", choices=list(PROVEDORES), default=list(PROVEDORES_PADRAO),
+                        metavar="PROVEDOR",
+                        help=f"APIs consultadas, em ordem de preferência (padrão: {' '.join(PROVEDORES_PADRAO)}); "
+                             "os CNPJs são enviados a cada provedor escolhido")
+    parser.add_argument("--reforco", action="store_true",
+                        help="repetir em outro provedor as consultas que passarem do p95 de latência")
+    parser.add_argument("--timeout-conexao", type=float, default=TIMEOUT_CONEXAO)
+    parser.add_argument("--timeout-leitura", type=float, default=TIMEOUT_LEITURA)
+    parser.add_argument("--http2", action="store_true", help="usa HTTP/2 (requer httpx[http2])")
+    parser.add_argument("--sem-cache", action="store_true", help="não ler nem gravar o cache local")
+    parser.add_argument("--sem-base-local", action="store_true",
+                        help="não usar a base local da Receita (python -m cnpj_core.receita)")
+    parser.add_argument("--sem-indice-socios", action="store_true",
+                        help="não gravar os sócios no índice de empresas relacionadas")
+    parser.add_argument("--sem-indice-busca", action="store_true",
+                        help="não gravar as empresas no índice de busca por nome (python -m cnpj_core.busca)")
+    parser.add_argument("--sem-snapshots", action="store_true",
+                        help="não guardar cópia das respostas para análise (python -m cnpj_core.snapshots)")
+    parser.add_argument("--recomecar", action="store_true", help="sobrescreve a saída do lote em vez de retomar")
+    parser.add_argument("--metricas", metavar="ARQUIVO",
+                        help="grava tempos e contadores ao final (.prom no formato do Prometheus, senão JSON)")
+    parser.add_argument("--metricas-log", metavar="ARQUIVO", help="registra cada tempo medido e erro em JSON Lines")
+    parser.add_argument("--metricas-porta", type=int, metavar="PORTA",
+                        help="expõe /metrics (Prometheus) e /metrics.json em 127.0.0.1 durante a execução")
+    return parser
+
+
+def main(argv=None):
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    
+    if args.lote:
+        if not args.saida:
+            parser.error("--saida é obrigatório com --lote")
+        if args.formato == "json":
+            parser.error("o lote grava csv ou jsonl")
+        if args.processos > 1 and (args.metricas or args.metricas_log or args.metricas_porta):
+            parser.error("--metricas, --metricas-log e --metricas-porta não funcionam com --processos")
+        return main_lote(args)
+    
+    if not args.cnpjs and not args.arquivo:
+        parser.error("informe ao menos um CNPJ, --arquivo ou --lote")
+    args.formato = args.formato or "json"
+    return main_consulta(args)
@@ -0,0 +1,429 @@
+import time
+import random
+import threading
+
+from .metricas import Metricas
+from .modelo import Empresa
+from .validacao import limpar_cnpj, cnpj_valido, validar_cnpj
+
+# Consulta na API
+API_URL = "https://open.cnpja.com/office/{cnpj}"
+TIMEOUT_CONEXAO = 5
+TIMEOUT_LEITURA = 20
+
+# Limite da API pública (consultas por minuto, por IP)
+LIMITE_POR_MINUTO = 5
+BACKOFF_BASE = 2.0
+BACKOFF_MAXIMO = 120.0
+TENTATIVAS_CONSULTA = 3
+CONEXOES_POR_HOST = 10
+
+
+class LimitadorTaxa:
+    # Token bucket compartilhado entre threads: repõe `por_minuto` fichas por
+    # minuto e permite rajadas de até `capacidade` requisições.
+    def __init__(self, por_minuto=LIMITE_POR_MINUTO, capacidade=None):
+        self.taxa = por_minuto / 60.0
+        self.capacidade = capacidade or max(1, int(por_minuto))
+        self.fichas = float(self.capacidade)
+        self.atualizado = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def aguardar(self, parar=None):
+        while True:
+            with self.lock:
+                agora = time.monotonic()
+                self.fichas = min(self.capacidade, self.fichas + (agora - self.atualizado) * self.taxa)
+                self.atualizado = agora
+                if self.fichas >= 1:
+                    self.fichas -= 1
+                    return True
+                espera = (1 - self.fichas) / self.taxa
+            if parar is not None:
+                if parar.wait(espera):
+                    return False
+            else:
+                time.sleep(espera)
+    
+    def tentar(self, reserva=0):
+        # Sem esperar: pega uma ficha só se ainda sobrarem `reserva` depois dela
+        with self.lock:
+            agora = time.monotonic()
+            self.fichas = min(self.capacidade, self.fichas + (agora - self.atualizado) * self.taxa)
+            self.atualizado = agora
+            if self.fichas >= 1 + reserva:
+                self.fichas -= 1
+                return True
+            return False
+    
+    def disponiveis(self):
+        with self.lock:
+            agora = time.monotonic()
+            return min(self.capacidade, self.fichas + (agora - self.atualizado) * self.taxa)
+    
+    def espera(self):
+        # Segundos até a próxima ficha (0 se já houver uma)
+        return max(0.0, (1 - self.disponiveis()) / self.taxa)
+    
+    def penalizar(self, segundos):
+        # Após um 429, segura todas as threads pelo tempo pedido pelo servidor
+        with self.lock:
+            self.fichas = min(self.fichas, 1 - segundos * self.taxa)
+
+
+def tempo_retry_after(response):
+    valor = response.headers.get("Retry-After")
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        return None
+
+
+def criar_adaptador(metricas, conexoes):
+    # HTTPAdapter cujas conexões medem o próprio connect (DNS + TCP + TLS):
+    # o requests só informa o tempo até os cabeçalhos (response.elapsed),
+    # sem separar o que foi abrir conexão do que foi espera pelo servidor.
+    from requests.adapters import HTTPAdapter
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    
+    def pool_medido(base):
+        class ConexaoMedida(base.ConnectionCls):
+            def connect(self):
+                inicio = time.perf_counter()
+                try:
+                    return super().connect()
+                finally:
+                    metricas.local.conexao = getattr(metricas.local, "conexao", 0.0) + time.perf_counter() - inicio
+                    metricas.contar("conexoes_novas")
+        return type(base.__name__ + "Medido", (base,), {"ConnectionCls": ConexaoMedida})
+    
+    pools = {"http": pool_medido(HTTPConnectionPool), "https": pool_medido(HTTPSConnectionPool)}
+    
+    class AdaptadorMedido(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = pools
+    
+    return AdaptadorMedido(pool_connections=1, pool_maxsize=conexoes)
+
+
+class ConsultaEmAndamento:
+    # Requisição em voo para um CNPJ: quem chega depois espera por ela em
+    # vez de abrir outra conexão e gastar mais uma ficha do limite.
+    def __init__(self):
+        self.pronta = threading.Event()
+        self.resultado = None
+        self.erro = None
+        self.antecipada = False
+
+
+class ClienteCNPJa:
+    # Cliente HTTP compartilhado pelas consultas individuais e em lote: mantém
+    # o pool de conexões aberto (keep-alive, sem novo handshake TLS a cada
+    # consulta) e concentra cache, limite de taxa e novas tentativas.
+    def __init__(self, cache=None, limitador=None, timeout=(TIMEOUT_CONEXAO, TIMEOUT_LEITURA),
+                 conexoes=CONEXOES_POR_HOST, http2=False, base_local=None, api_url=API_URL, metricas=None,
+                 indice_socios=None, indice_busca=None, snapshots=None, provedores=None, reforco=False):
+        self.cache = cache
+        self.api_url = api_url
+        self.base_local = base_local
+        self.indice_socios = indice_socios
+        self.indice_busca = indice_busca
+        self.snapshots = snapshots
+        self.limitador = limitador or LimitadorTaxa()
+        self.timeout = timeout
+        self.http2 = False
+        self.metricas = metricas or Metricas()
+        self.metricas.medidor("fichas_disponiveis", self.limitador.disponiveis)
+        
+        # Provedores consultados (cnpj_core.provedores); sem lista, só a CNPJá
+        # em `api_url` com o limitador acima, como antes
+        from .provedores import Agendador, ProvedorCNPJa
+        self.agendador = Agendador(
+            provedores or [ProvedorCNPJa(url=api_url, limitador=self.limitador)], reforco=reforco, metricas=self.metricas
+        )
+        for provedor in self.agendador.provedores[1:]:
+            self.metricas.medidor(f"fichas_{provedor.nome}", provedor.limitador.disponiveis)
+        
+        # Consultas simultâneas ao mesmo CNPJ compartilham uma única requisição
+        self.em_andamento = {}
+        self.em_andamento_lock = threading.Lock()
+        
+        # requests é importado só aqui: a interface abre sem esperar por ele
+        import requests
+        from urllib3.util.request import ACCEPT_ENCODING
+        
+        if http2:
+            # HTTP/2 é opcional e depende do httpx com o pacote h2 instalado
+            try:
+                import httpx
+                self.sessao = httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(max_connections=conexoes, max_keepalive_connections=conexoes),
+                    headers={"Accept": "application/json"}
+                )
+                self.http2 = True
+            except ImportError:
+                print("HTTP/2 indisponível (instale httpx[http2]); usando HTTP/1.1")
+        
+        if not self.http2:
+            self.sessao = requests.Session()
+            adaptador = criar_adaptador(self.metricas, conexoes)
+            self.sessao.mount("https://", adaptador)
+            self.sessao.mount("http://", adaptador)
+            # Inclui br/zstd quando o urllib3 tem suporte instalado para decodificar
+            self.sessao.headers.update({"Accept": "application/json", "Accept-Encoding": ACCEPT_ENCODING})
+    
+    def get(self, url, headers, timeout):
+        import requests
+        inicio = time.perf_counter()
+        if not self.http2:
+            self.metricas.local.conexao = 0.0
+            response = self.sessao.get(url, headers=headers, timeout=timeout)
+            self.medir_resposta(response, time.perf_counter() - inicio, self.metricas.local.conexao)
+            return response
+        
+        # Converte os erros do httpx para os do requests, tratados pela interface
+        import httpx
+        try:
+            response = self.sessao.get(url, headers=headers, timeout=httpx.Timeout(timeout[1], connect=timeout[0]))
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        # O httpx não separa conexão de espera: tudo conta como espera pelo servidor
+        self.medir_resposta(response, time.perf_counter() - inicio, 0.0)
+        return response
+    
+    def medir_resposta(self, response, total, conexao):
+        # response.elapsed vai do envio até os cabeçalhos (inclui abrir a
+        # conexão); o resto até o corpo lido é download
+        ate_cabecalhos = min(total, response.elapsed.total_seconds())
+        if conexao:
+            self.metricas.registrar("conexao", conexao)
+        self.metricas.registrar("espera_servidor", max(0.0, ate_cabecalhos - conexao))
+        self.metricas.registrar("download", total - ate_cabecalhos)
+        # Content-Length é o tamanho trafegado (comprimido, se houver compressão)
+        tamanho = response.headers.get("Content-Length")
+        self.metricas.contar("bytes_recebidos", int(tamanho) if tamanho and tamanho.isdigit() else len(response.content))
+        self.metricas.contar("requisicoes")
+    
+    @staticmethod
+    def verificar_status(response):
+        import requests
+        if response.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"Erro HTTP {response.status_code} ao consultar {response.url}")
+    
+    def indexar(self, empresa, capturar=True):
+        # Alimenta o índice de sócios (cnpj_core.relacionadas), o de busca
+        # por nome (cnpj_core.busca) e os snapshots (cnpj_core.snapshots)
+        # com cada resposta obtida. Os snapshots guardam só respostas novas
+        # da CNPJá (capturadas agora); cópias do cache e dados da base da
+        # Receita entram com capturar=False.
+        indices = [("índice de sócios", self.indice_socios), ("índice de busca", self.indice_busca)]
+        if capturar:
+            indices.append(("snapshots", self.snapshots))
+        for origem, indice in indices:
+            if indice is not None:
+                try:
+                    indice.salvar(empresa)
+                except Exception as e:
+                    self.metricas.erro(origem, e)
+    
+    def contar(self, nome, valor=1):
+        self.metricas.contar(nome, valor)
+    
+    def estatisticas(self):
+        return self.metricas.contagens("acertos", "faltas", "agrupadas")
+    
+    def buscar(self, cnpj, entrada=None, timeout=None, tentativas=TENTATIVAS_CONSULTA, parar=None,
+               usar_local=True, reserva=None, principal=False):
+        # Retorna (status_code, empresa, origem). Se o mesmo CNPJ já estiver
+        # sendo consultado (outra aba, o lote, o histórico), espera por essa
+        # requisição e devolve o mesmo resultado. CNPJs com dígitos
+        # verificadores errados são recusados sem gastar fichas do limite.
+        # Com `reserva` (antecipação), não espera pelo limitador: só consulta
+        # se sobrarem mais de `reserva` fichas, senão InterruptedError. Com
+        # `principal`, só o primeiro provedor é consultado (o monitoramento
+        # compara respostas entre si e outro provedor formata diferente) e a
+        # falha da API é levantada em vez de devolver a cópia do cache.
+        cnpj = limpar_cnpj(cnpj)
+        if not cnpj_valido(cnpj):
+            return 400, None, "validação"
+        chave = (cnpj, usar_local, principal)
+        while True:
+            with self.em_andamento_lock:
+                consulta = self.em_andamento.get(chave)
+                lider = consulta is None
+                if lider:
+                    consulta = self.em_andamento[chave] = ConsultaEmAndamento()
+                    consulta.antecipada = reserva is not None
+            
+            if lider:
+                try:
+                    consulta.resultado = self.buscar_api(cnpj, entrada, timeout, tentativas, parar, usar_local,
+                                                         reserva, principal)
+                    return consulta.resultado
+                except BaseException as e:
+                    consulta.erro = e
+                    raise
+                finally:
+                    with self.em_andamento_lock:
+                        del self.em_andamento[chave]
+                    consulta.pronta.set()
+            
+            self.contar("agrupadas")
+            while not consulta.pronta.wait(0.1):
+                if parar is not None and parar.is_set():
+                    raise InterruptedError("Consulta interrompida")
+            
+            if isinstance(consulta.erro, InterruptedError) or (consulta.erro is not None and consulta.antecipada):
+                continue  # Quem consultava desistiu (ou era só antecipação); tenta de novo por conta própria
+            if consulta.erro is not None:
+                raise consulta.erro
+            return consulta.resultado
+    
+    def buscar_api(self, cnpj, entrada=None, timeout=None, tentativas=TENTATIVAS_CONSULTA, parar=None,
+                   usar_local=True, reserva=None, principal=False):
+        # Resolve pela base local da Receita quando disponível; senão consulta
+        # a API, tentando novamente em 429/5xx e falhas de rede com backoff
+        # exponencial (Retry-After). Com mais de um provedor, a nova tentativa
+        # vai para o próximo saudável sem esperar.
+        import requests
+        
+        if usar_local and self.base_local is not None:
+            try:
+                dados = self.base_local.obter(cnpj)
+            except Exception as e:
+                print(f"Erro ao ler base local: {e}")
+                self.metricas.erro("base local", e)
+                dados = None
+            if dados is not None:
+                self.contar("acertos")
+                self.indexar(dados, capturar=False)
+                return 200, dados, "base local"
+        
+        timeout = timeout or self.timeout
+        provedor = None
+        
+        for tentativa in range(tentativas):
+            ultima = tentativa == tentativas - 1
+            espera = min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** tentativa) * (0.5 + random.random() / 2)
+            
+            if tentativa:
+                self.contar("novas_tentativas")
+            anterior = provedor
+            if reserva is not None:
+                provedor = self.agendador.reservar(cnpj, reserva=reserva, evitar=anterior, principal=principal)
+            else:
+                with self.metricas.medir("espera_limite"):
+                    provedor = self.agendador.reservar(cnpj, parar, evitar=anterior, principal=principal)
+            if anterior is not None and provedor is not anterior:
+                self.contar("trocas_provedor")
+            
+            try:
+                provedor, response = self.agendador.requisitar(
+                    cnpj, provedor, lambda p: self.get(p.endereco(cnpj), self.cabecalhos(p, entrada), timeout),
+                    parar, reforco=reserva is None and not principal
+                )
+            except requests.exceptions.RequestException as e:
+                self.contar("erros_rede")
+                self.metricas.erro(f"api {provedor.nome}", e)
+                if ultima:
+                    if entrada and not principal:
+                        return 200, entrada["empresa"], "cache, offline"
+                    raise
+            else:
+                if response.status_code == 304 and entrada:
+                    self.contar("acertos")
+                    if self.cache is not None:
+                        self.cache.renovar(cnpj, entrada)
+                    return 200, entrada["empresa"], "cache revalidado"
+                
+                if response.status_code in (400, 404):
+                    self.contar("faltas")
+                    return response.status_code, None, self.origem(provedor)
+                
+                if response.status_code == 429 or response.status_code >= 500:
+                    self.contar("respostas_429" if response.status_code == 429 else "respostas_5xx")
+                    if ultima:
+                        if entrada and not principal:
+                            return 200, entrada["empresa"], "cache, API indisponível"
+                        self.verificar_status(response)
+                    retry_after = tempo_retry_after(response)
+                    if retry_after is not None:
+                        espera = min(BACKOFF_MAXIMO, retry_after)
+                else:
+                    self.verificar_status(response)
+                    
+                    with self.metricas.medir("json"):
+                        status_code, empresa = provedor.ler(response)
+                    self.contar("faltas")
+                    if status_code != 200:
+                        return status_code, None, self.origem(provedor)
+                    # Só a resposta do provedor principal vai para o cache e os
+                    # índices: as convertidas não trazem inscrições estaduais nem
+                    # todos os campos dos sócios e passariam por dados da CNPJá
+                    if provedor is self.agendador.principal:
+                        if self.cache is not None:
+                            self.cache.salvar(
+                                cnpj, empresa,
+                                etag=response.headers.get("ETag") if provedor.condicional else None,
+                                last_modified=response.headers.get("Last-Modified") if provedor.condicional else None
+                            )
+                        self.indexar(empresa)
+                    return 200, empresa, self.origem(provedor)
+            
+            # Com outro provedor saudável, a próxima tentativa vai para ele sem esperar
+            if not principal and self.agendador.alternativa(cnpj, provedor):
+                continue
+            if parar is not None:
+                if parar.wait(espera):
+                    raise InterruptedError("Consulta interrompida")
+            else:
+                time.sleep(espera)
+    
+    @staticmethod
+    def cabecalhos(provedor, entrada):
+        # Revalidação condicional quando já existe uma cópia em cache
+        headers = {}
+        if entrada and provedor.condicional:
+            if entrada.get("etag"):
+                headers["If-None-Match"] = entrada["etag"]
+            if entrada.get("last_modified"):
+                headers["If-Modified-Since"] = entrada["last_modified"]
+        return headers
+    
+    def origem(self, provedor):
+        # "api" para o provedor principal; os demais aparecem pelo nome
+        return "api" if provedor is self.agendador.principal else provedor.titulo
+    
+    def consultar(self, cnpj, forcar=False, tentativas=TENTATIVAS_CONSULTA, parar=None):
+        # Consulta completa: usa o cache quando válido e devolve um Empresa,
+        # ou None se o CNPJ não existir na base.
+        validado = validar_cnpj(cnpj)
+        if validado is None:
+            raise ValueError(f"CNPJ inválido: {cnpj!r}")
+        cnpj = validado
+        
+        entrada = self.cache.obter(cnpj) if self.cache is not None else None
+        if entrada and not forcar and not self.cache.expirada(entrada):
+            self.contar("acertos")
+            with self.metricas.medir("parse"):
+                return Empresa.de_json(entrada["empresa"])
+        
+        status_code, dados, _ = self.buscar(
+            cnpj, entrada=entrada, tentativas=tentativas, parar=parar, usar_local=not forcar
+        )
+        if status_code == 404:
+            return None
+        if status_code == 400:
+            raise ValueError(f"CNPJ inválido: {cnpj}")
+        with self.metricas.medir("parse"):
+            return Empresa.de_json(dados)
+    
+    def fechar(self):
+        self.agendador.fechar()
+        self.sessao.close()
@@ -0,0 +1,346 @@
+import os
+import sys
+import csv
+import json
+import argparse
+
+from .caminhos import caminho_cache, caminho_historico_db
+from .formatacao import format_phone, get_nested_value
+from .lote import FORMATOS as FORMATOS_LOTE
+from .projecao import Projecao, Campo
+from .validacao import limpar_cnpj, validar_cnpj
+
+# Exportação em streaming: os registros (cnpj, status, JSON da API) vêm de
+# um gerador e cada um é convertido em linhas da tabela de empresas e das
+# tabelas filhas (sócios, atividades secundárias, inscrições), ligadas pelo
+# CNPJ. Nada é acumulado além de um grupo de linhas do Parquet, então a
+# memória não cresce com o tamanho da exportação.
+#
+#   CSV/JSONL  um arquivo por tabela: saida.csv, saida_socios.csv, ...
+#   Parquet    um arquivo por tabela, gravado em grupos de linhas (pyarrow)
+#   XLSX       uma planilha por tabela, em modo write-only (openpyxl)
+LINHAS_POR_GRUPO = 50000
+LINHAS_POR_PLANILHA = 1048575  # Limite do Excel, sem o cabeçalho
+PAGINA_HISTORICO = 5000
+
+# Mesmas extensões do lote (um resultado .json é JSON Lines), mais Parquet e XLSX
+FORMATOS = {**FORMATOS_LOTE, ".parquet": "parquet", ".xlsx": "xlsx"}
+
+# Colunas com os mesmos nomes dos campos de cnpj_core.modelo
+EMPRESA = Projecao({
+    "cnpj": "taxId",
+    "nome": "company.name",
+    "fantasia": "alias",
+    "abertura": "founded",
+    "situacao": "status.text",
+    "data_situacao": "statusDate",
+    "natureza": "company.nature.text",
+    "porte": "company.size.text",
+    "capital_social": "company.equity",
+    "telefone": Campo("phones", lambda telefones: format_phone(telefones) if telefones else None),
+    "email": Campo("emails", lambda emails: emails[0].get("address") if emails else None),
+    "logradouro": "address.street",
+    "numero": "address.number",
+    "complemento": "address.details",
+    "bairro": "address.district",
+    "cidade": "address.city",
+    "uf": "address.state",
+    "cep": "address.zip",
+    "atividade_principal_codigo": "mainActivity.id",
+    "atividade_principal": "mainActivity.text"
+})
+FILHAS = {
+    "socios": ("company.members", Projecao({
+        "nome": "person.name",
+        "documento": "person.taxId",
+        "tipo": "person.type",
+        "cargo": "role.text",
+        "desde": "since",
+        "idade": "person.age"
+    })),
+    "atividades": ("sideActivities", Projecao({"codigo": "id", "descricao": "text"})),
+    "inscricoes": ("registrations", Projecao({
+        "numero": "number",
+        "uf": "state",
+        "situacao": "status.text",
+        "tipo": "type.text",
+        "data_status": "statusDate"
+    })),
+}
+TABELAS = {"empresas": ["cnpj", "status"] + EMPRESA.nomes[1:]}
+TABELAS.update({tabela: ["cnpj"] + projecao.nomes for tabela, (_, projecao) in FILHAS.items()})
+# Colunas numéricas no Parquet/XLSX; as demais são texto
+DECIMAIS = {"capital_social"}
+INTEIRAS = {"atividade_principal_codigo", "codigo"}
+
+
+def formato_arquivo(caminho):
+    return FORMATOS.get(os.path.splitext(caminho)[1].lower(), "csv")
+
+
+def caminho_tabela(caminho, tabela):
+    # A tabela de empresas fica no próprio arquivo; as filhas ao lado dele
+    if tabela == "empresas":
+        return caminho
+    raiz, extensao = os.path.splitext(caminho)
+    return f"{raiz}_{tabela}{extensao}"
+
+
+def linhas_registro(cnpj, status, empresa):
+    # (tabela, linha) de um registro; sem dados da API só a linha da empresa
+    if not empresa:
+        yield "empresas", (cnpj, status) + (None,) * (len(TABELAS["empresas"]) - 2)
+        return
+    yield "empresas", (cnpj, status) + EMPRESA.tupla(empresa)[1:]
+    for tabela, (caminho, projecao) in FILHAS.items():
+        for linha in projecao.linhas(get_nested_value(empresa, caminho)):
+            yield tabela, (cnpj,) + linha
+
+
+class EscritorCSV:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.arquivos = {}
+        self.writers = {}
+
+    def escrever(self, tabela, linha):
+        writer = self.writers.get(tabela)
+        if writer is None:
+            arquivo = self.arquivos[tabela] = open(
+                caminho_tabela(self.caminho, tabela), 'w', encoding='utf-8', newline=''
+            )
+            writer = self.writers[tabela] = csv.writer(arquivo)
+            writer.writerow(TABELAS[tabela])
+        writer.writerow(["" if valor is None else valor for valor in linha])
+
+    def fechar(self):
+        for arquivo in self.arquivos.values():
+            arquivo.close()
+
+
+class EscritorJSONL(EscritorCSV):
+    def escrever(self, tabela, linha):
+        arquivo = self.arquivos.get(tabela)
+        if arquivo is None:
+            arquivo = self.arquivos[tabela] = open(caminho_tabela(self.caminho, tabela), 'w', encoding='utf-8')
+        arquivo.write(json.dumps(dict(zip(TABELAS[tabela], linha)), ensure_ascii=False) + "\n")
+
+
+def decimal(valor):
+    try:
+        return float(valor) if valor is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def inteiro(valor):
+    try:
+        return int(valor) if valor is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def texto(valor):
+    return valor if valor is None or isinstance(valor, str) else str(valor)
+
+
+def conversor(coluna):
+    return decimal if coluna in DECIMAIS else inteiro if coluna in INTEIRAS else texto
+
+
+class EscritorParquet:
+    # Colunas acumuladas até LINHAS_POR_GRUPO linhas e gravadas como um
+    # grupo de linhas do arquivo Parquet da tabela
+    def __init__(self, caminho):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Exportação em Parquet requer o pacote pyarrow (pip install pyarrow)")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.caminho = caminho
+        self.writers = {}
+        self.buffers = {}
+        tipos = {decimal: pyarrow.float64(), inteiro: pyarrow.int64(), texto: pyarrow.string()}
+        self.esquemas = {
+            tabela: pyarrow.schema([(coluna, tipos[conversor(coluna)]) for coluna in colunas])
+            for tabela, colunas in TABELAS.items()
+        }
+
+    def escrever(self, tabela, linha):
+        buffer = self.buffers.setdefault(tabela, [])
+        buffer.append(linha)
+        if len(buffer) >= LINHAS_POR_GRUPO:
+            self.gravar(tabela)
+
+    def gravar(self, tabela):
+        linhas = self.buffers.pop(tabela, None)
+        if not linhas:
+            return
+        esquema = self.esquemas[tabela]
+        colunas = [
+            [conversor(coluna)(valor) for valor in valores]
+            for coluna, valores in zip(TABELAS[tabela], zip(*linhas))
+        ]
+        if tabela not in self.writers:
+            self.writers[tabela] = self.pq.ParquetWriter(caminho_tabela(self.caminho, tabela), esquema)
+        self.writers[tabela].write_table(self.pa.Table.from_arrays(
+            [self.pa.array(valores, type=campo.type) for valores, campo in zip(colunas, esquema)], schema=esquema
+        ))
+
+    def fechar(self):
+        for tabela in list(self.buffers):
+            self.gravar(tabela)
+        for writer in self.writers.values():
+            writer.close()
+
+
+class EscritorXLSX:
+    # Modo write-only do openpyxl: as linhas vão direto para o arquivo
+    # temporário de cada planilha. Tabelas acima do limite do Excel
+    # continuam em "socios (2)", "socios (3)"...
+    def __init__(self, caminho):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("Exportação em XLSX requer o pacote openpyxl (pip install openpyxl)")
+        self.caminho = caminho
+        self.livro = Workbook(write_only=True)
+        self.planilhas = {}
+        self.conversores = {tabela: [conversor(coluna) for coluna in colunas] for tabela, colunas in TABELAS.items()}
+
+    def escrever(self, tabela, linha):
+        planilha = self.planilhas.get(tabela)
+        if planilha is None or planilha[1] >= LINHAS_POR_PLANILHA:
+            parte = planilha[2] + 1 if planilha else 1
+            folha = self.livro.create_sheet(tabela if parte == 1 else f"{tabela} ({parte})")
+            folha.append(TABELAS[tabela])
+            planilha = self.planilhas[tabela] = [folha, 0, parte]
+        planilha[0].append([converter(valor) for converter, valor in zip(self.conversores[tabela], linha)])
+        planilha[1] += 1
+
+    def fechar(self):
+        if not self.planilhas:
+            self.livro.create_sheet("empresas").append(TABELAS["empresas"])
+        self.livro.save(self.caminho)
+
+
+ESCRITORES = {"csv": EscritorCSV, "jsonl": EscritorJSONL, "parquet": EscritorParquet, "xlsx": EscritorXLSX}
+
+
+def exportar(registros, caminho, formato=None, ao_progresso=None, parar=None):
+    # `registros`: iterável de (cnpj, status, empresa ou None). Devolve o
+    # número de empresas exportadas. `ao_progresso(n)` é chamado a cada mil.
+    escritor = ESCRITORES[formato or formato_arquivo(caminho)](caminho)
+    total = 0
+    try:
+        for cnpj, status, empresa in registros:
+            for tabela, linha in linhas_registro(cnpj, status, empresa):
+                escritor.escrever(tabela, linha)
+            total += 1
+            if ao_progresso and total % 1000 == 0:
+                ao_progresso(total)
+            if parar is not None and parar.is_set():
+                break
+    finally:
+        escritor.fechar()
+    if ao_progresso:
+        ao_progresso(total)
+    return total
+
+
+# Fontes de registros (geradores)
+
+def registros_empresa(empresa):
+    yield limpar_cnpj(empresa.get("taxId", "")), "ok", empresa
+
+
+def registros_historico(historico, cache=None):
+    # Todo o histórico, com os dados completos quando ainda estão no cache
+    for nome, cnpj, _ in historico.iterar(PAGINA_HISTORICO):
+        entrada = cache.obter(cnpj) if cache is not None else None
+        if entrada:
+            yield cnpj, "ok", entrada["empresa"]
+        else:
+            yield cnpj, "sem dados no cache", {"taxId": cnpj, "company": {"name": nome}}
+
+
+def registros_lote(caminho, cache=None):
+    # Resultado de uma consulta em lote (CSV ou JSONL). Os dados completos
+    # vêm da coluna "Dados" (lote gravado com --bruto) ou do cache.
+    with open(caminho, 'r', encoding='utf-8', newline='') as f:
+        if formato_arquivo(caminho) == "jsonl":
+            linhas = (json.loads(linha) for linha in f if linha.strip())
+        else:
+            linhas = csv.DictReader(f)
+        for registro in linhas:
+            cnpj = limpar_cnpj(registro.get("CNPJ") or "")
+            status = registro.get("Status")
+            empresa = registro.get("Dados")
+            if empresa is None and status == "ok" and cache is not None:
+                entrada = cache.obter(cnpj)
+                empresa = entrada["empresa"] if entrada else None
+            if empresa is None and registro.get("Nome Empresarial"):
+                empresa = {"taxId": cnpj, "company": {"name": registro["Nome Empresarial"]}}
+            yield cnpj, status, empresa
+
+
+def registros_cnpjs(cnpjs, cliente):
+    # Consulta (cache ou API) cada CNPJ na hora de exportar
+    for cnpj in cnpjs:
+        validado = validar_cnpj(cnpj)
+        if validado is None:
+            yield limpar_cnpj(cnpj), "inválido", None
+            continue
+        try:
+            empresa = cliente.consultar(validado)
+        except Exception as e:
+            yield validado, f"erro: {e}", None
+            continue
+        yield validado, "ok" if empresa else "não encontrado", empresa.dados if empresa else None
+
+
+def main(argv=None):
+    from .cache import CacheConsultas
+    from .historico import HistoricoDB
+
+    parser = argparse.ArgumentParser(
+        prog="python -m cnpj_core.exportacao",
+        description="Exporta consultas para CSV, JSONL, Parquet ou XLSX, com sócios, atividades "
+                    "e inscrições em tabelas separadas"
+    )
+    parser.add_argument("--saida", required=True, help="arquivo de saída (.csv, .jsonl, .parquet ou .xlsx)")
+    parser.add_argument("--formato", choices=list(ESCRITORES), help="formato (padrão: pela extensão da saída)")
+    sub = parser.add_subparsers(dest="origem", required=True)
+    historico = sub.add_parser("historico", help="todo o histórico de consultas")
+    historico.add_argument("--historico", default=caminho_historico_db())
+    lote = sub.add_parser("lote", help="resultado de uma consulta em lote (CSV ou JSONL)")
+    lote.add_argument("arquivo")
+    cnpjs = sub.add_parser("cnpjs", help="consulta e exporta os CNPJs informados")
+    cnpjs.add_argument("cnpjs", nargs="+", metavar="CNPJ")
+    args = parser.parse_args(argv)
+
+    cache = CacheConsultas(caminho_cache())
+    progresso = lambda n: print(f"\r{n} empresas exportadas", end="", file=sys.stderr, flush=True)
+    if args.origem == "historico":
+        db = HistoricoDB(args.historico)
+        try:
+            exportar(registros_historico(db, cache), args.saida, args.formato, progresso)
+        finally:
+            db.fechar()
+    elif args.origem == "lote":
+        exportar(registros_lote(args.arquivo, cache), args.saida, args.formato, progresso)
+    else:
+        from .cliente import ClienteCNPJa
+        cliente = ClienteCNPJa(cache=cache)
+        try:
+            exportar(registros_cnpjs(args.cnpjs, cliente), args.saida, args.formato, progresso)
+        finally:
+            cliente.fechar()
+    print(file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+from datetime import datetime
+
+from .projecao import Projecao, Campo, acessor
+from .validacao import limpar_cnpj
+
+
+def normalizar_cnpj(texto):
+    return ''.join(filter(str.isdigit, str(texto)))
+
+
+def get_nested_value(data, key):
+    # O caminho é compilado na primeira vez e reaproveitado nas seguintes
+    return acessor(key)(data)
+
+
+def format_cnpj(cnpj):
+    cnpj = limpar_cnpj(cnpj)
+    if len(cnpj) == 14:
+        return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:14]}"
+    return cnpj
+
+
+def format_phone(phones):
+    if not phones:
+        return "Não informado"
+    phone = phones[0]
+    return f"({phone.get('area', '')}) {phone.get('number', '')}"
+
+
+def format_address(address):
+    if not address:
+        return "Não informado"
+    return (
+        f"{address.get('street', '')}, {address.get('number', '')} - "
+        f"{address.get('district', '')}, {address.get('city', '')} - "
+        f"{address.get('state', '')}, CEP: {address.get('zip', '')}"
+    )
+
+
+def format_currency(valor):
+    # Babel só é carregado quando algum valor precisa ser formatado
+    from babel.numbers import format_currency as babel_format_currency
+    return babel_format_currency(valor, 'BRL', locale='pt_BR')
+
+
+def format_date(data):
+    # "AAAA-MM-DD" -> "DD-MM-AAAA"; o strptime só entra fora desse formato
+    if not data:
+        return None
+    if len(data) == 10 and data[4] == data[7] == "-" and (data[:4] + data[5:7] + data[8:]).isdigit():
+        return f"{data[8:]}-{data[5:7]}-{data[:4]}"
+    return datetime.strptime(data, "%Y-%m-%d").strftime("%d-%m-%Y")
+
+
+# Campos da aba de informações, também usados na exportação em lote e no
+# texto copiado (o capital social é formatado em campos_info)
+ESQUEMA_INFO = Projecao({
+    "Nome Empresarial": "company.name",
+    "Nome Fantasia": "alias",
+    "Data de Abertura": Campo("founded", format_date),
+    "Situação Cadastral": "status.text",
+    "Natureza Jurídica": "company.nature.text",
+    "Porte da Empresa": "company.size.text",
+    "Capital Social": "company.equity",
+    "Telefone": Campo("phones", format_phone),
+    "Endereço": Campo("address", format_address),
+    "Atividade Principal": "mainActivity.text"
+})
+CAMPOS_INFO = ESQUEMA_INFO.nomes
+
+# Linhas das abas de sócios (company.members) e inscrições (registrations)
+ESQUEMA_SOCIO = Projecao({
+    "Nome": Campo("person.name", padrao="N/A"),
+    "CPF": Campo("person.taxId", padrao="N/A"),
+    "Tipo": Campo("person.type", padrao="N/A"),
+    "Cargo": Campo("role.text", padrao="N/A"),
+    "Desde": Campo("since", padrao="N/A"),
+    "Idade": Campo("person.age", padrao="N/A")
+})
+ESQUEMA_INSCRICAO = Projecao({
+    "Número": Campo("number", padrao="N/A"),
+    "UF": Campo("state", padrao="N/A"),
+    "Situação": "status.text",
+    "Tipo": "type.text",
+    "Data Status": Campo("statusDate", padrao="N/A")
+})
+
+_CAPITAL = ESQUEMA_INFO.indices["Capital Social"]
+
+
+def campos_info(empresa):
+    # Campos da aba de informações, também usados na exportação em lote
+    valores = list(ESQUEMA_INFO.tupla(empresa))
+    capital_social = float(valores[_CAPITAL] or 0)
+    valores[_CAPITAL] = format_currency(capital_social)
+    return dict(zip(CAMPOS_INFO, valores)), capital_social
@@ -0,0 +1,148 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+from .validacao import limpar_cnpj
+
+
+# Consultas seguidas são gravadas juntas, numa transação só
+ATRASO_GRAVACAO = 2.0
+
+# Busca que pode ser o começo de um CNPJ (alfanumérico, com ou sem pontuação)
+PARECE_CNPJ = re.compile(r"[0-9A-Z./\- ]+", re.IGNORECASE)
+
+
+class HistoricoDB:
+    # Histórico de consultas em SQLite (WAL), com índice único por CNPJ.
+    # As datas são gravadas em ISO ("AAAA-MM-DD HH:MM") para ordenar pelo índice.
+    # O SQLite já trava o arquivo entre processos e não deixa gravações pela
+    # metade, então várias instâncias podem compartilhar o mesmo histórico.
+    ORDENACOES = {
+        "name_asc": "nome COLLATE NOCASE ASC",
+        "date_desc": "data DESC",
+        "date_asc": "data ASC"
+    }
+    
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.lock = threading.Lock()
+        self.pendentes = {}
+        self.timer = None
+        self.conn = sqlite3.connect(caminho, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS historico ("
+                "cnpj TEXT PRIMARY KEY, nome TEXT NOT NULL, data TEXT NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_historico_nome ON historico(nome COLLATE NOCASE)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_historico_data ON historico(data)")
+    
+    def migrar_json(self, caminho_json):
+        # Importa uma única vez o antigo HistoricoConsult_preferences.json
+        if not os.path.exists(caminho_json):
+            return 0
+        with open(caminho_json, 'r') as f:
+            historico = json.load(f)
+        registros = []
+        for item in historico:
+            try:
+                data = datetime.strptime(item['data'], "%d/%m/%Y %H:%M").strftime("%Y-%m-%d %H:%M")
+                registros.append((limpar_cnpj(item['cnpj']).zfill(14)[:14], item['nome'], data))
+            except (KeyError, TypeError, ValueError):
+                continue
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO historico (cnpj, nome, data) VALUES (?, ?, ?)", registros)
+        os.replace(caminho_json, caminho_json + ".migrado")
+        return len(registros)
+    
+    def salvar(self, nome, cnpj):
+        # Só enfileira; a gravação acontece ATRASO_GRAVACAO segundos depois
+        # (ou antes de qualquer leitura), junto com as demais pendentes
+        data = datetime.now().strftime("%Y-%m-%d %H:%M")
+        with self.lock:
+            self.pendentes[cnpj] = (nome, data)
+            if self.timer is None:
+                self.timer = threading.Timer(ATRASO_GRAVACAO, self.gravar_agendado)
+                self.timer.daemon = True
+                self.timer.start()
+    
+    def gravar_pendentes(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.pendentes:
+                return
+            registros = [(cnpj, nome, data) for cnpj, (nome, data) in self.pendentes.items()]
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO historico (cnpj, nome, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(cnpj) DO UPDATE SET nome = excluded.nome, data = excluded.data",
+                    registros
+                )
+            self.pendentes.clear()
+    
+    def gravar_agendado(self):
+        try:
+            self.gravar_pendentes()
+        except Exception as e:
+            print(f"Erro ao gravar histórico: {e}")
+    
+    @staticmethod
+    def filtro(busca):
+        # Busca por prefixo do nome; o que puder ser o começo de um CNPJ
+        # (letras, dígitos e pontuação de CNPJ) também pelo CNPJ, já que o
+        # CNPJ alfanumérico não se distingue de um nome só pelas letras.
+        # Cada lado usa um índice da tabela.
+        busca = (busca or "").strip()
+        if not busca:
+            return "", ()
+        prefixo = busca.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        cnpj = limpar_cnpj(busca)
+        if cnpj and PARECE_CNPJ.fullmatch(busca):
+            return (" WHERE (cnpj >= ? AND cnpj < ?) OR nome LIKE ? ESCAPE '\\'",
+                    (cnpj, cnpj + "~", prefixo + "%"))
+        return " WHERE nome LIKE ? ESCAPE '\\'", (prefixo + "%",)
+    
+    def contar(self, busca=None):
+        self.gravar_pendentes()
+        where, params = self.filtro(busca)
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM historico{where}", params).fetchone()[0]
+    
+    def listar(self, ordem="date_desc", busca=None, limite=-1, deslocamento=0):
+        self.gravar_pendentes()
+        where, params = self.filtro(busca)
+        sql = f"SELECT nome, cnpj, data FROM historico{where} ORDER BY {self.ORDENACOES[ordem]} LIMIT ? OFFSET ?"
+        with self.lock:
+            return self.conn.execute(sql, params + (limite, deslocamento)).fetchall()
+    
+    def iterar(self, lote=5000):
+        # Todo o histórico em ordem de CNPJ, paginado pela chave primária:
+        # cada página é uma busca no índice, sem OFFSET e sem carregar tudo
+        self.gravar_pendentes()
+        ultimo = ""
+        while True:
+            with self.lock:
+                linhas = self.conn.execute(
+                    "SELECT nome, cnpj, data FROM historico WHERE cnpj > ? ORDER BY cnpj LIMIT ?", (ultimo, lote)
+                ).fetchall()
+            yield from linhas
+            if len(linhas) < lote:
+                return
+            ultimo = linhas[-1][1]
+    
+    @staticmethod
+    def formatar_data(data):
+        # "AAAA-MM-DD HH:MM" -> "DD/MM/AAAA HH:MM", como era exibido antes
+        return f"{data[8:10]}/{data[5:7]}/{data[0:4]} {data[11:16]}"
+    
+    def fechar(self):
+        self.gravar_pendentes()
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,210 @@
+import os
+import re
+import csv
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .formatacao import CAMPOS_INFO, format_cnpj, campos_info
+from .validacao import limpar_cnpj, validar_cnpjs
+
+TENTATIVAS_LOTE = 5
+
+# Formato pela extensão da saída; .json também é gravado em JSON Lines
+FORMATOS = {".csv": "csv", ".json": "jsonl", ".jsonl": "jsonl"}
+
+
+def ler_cnpjs(caminho):
+    # Aceita TXT (um CNPJ por linha) ou CSV: usa a primeira célula da linha
+    # com um CNPJ válido (dígitos verificadores conferidos, numérico ou
+    # alfanumérico). Linhas com dígitos mas sem CNPJ válido são devolvidas
+    # como inválidas, sem chegar à API; linhas sem dígitos (cabeçalhos) são
+    # ignoradas.
+    with open(caminho, 'r', encoding='utf-8-sig', errors='replace') as f:
+        linhas = f.read().splitlines()
+    
+    # Candidatas de todas as linhas numa coluna só, validada de uma vez
+    celulas, origem = [], []
+    for i, linha in enumerate(linhas):
+        for celula in re.split(r'[;,\t|]', linha):
+            if len(limpar_cnpj(celula)) == 14:
+                celulas.append(celula)
+                origem.append(i)
+    validados, validos = validar_cnpjs(celulas)
+    
+    encontrados = {}
+    for i, cnpj, valido in zip(origem, validados, validos):
+        if valido and i not in encontrados:
+            encontrados[i] = str(cnpj)
+    
+    cnpjs, invalidos, vistos = [], [], set()
+    for i, linha in enumerate(linhas):
+        encontrado = encontrados.get(i)
+        if encontrado:
+            if encontrado not in vistos:
+                vistos.add(encontrado)
+                cnpjs.append(encontrado)
+        elif any(c.isdigit() for c in linha):
+            invalidos.append(linha.strip())
+    return cnpjs, invalidos
+
+
+def formato_arquivo(caminho):
+    return FORMATOS.get(os.path.splitext(caminho)[1].lower(), "csv")
+
+
+class EscritorResultados:
+    # Grava cada resultado assim que fica pronto (CSV ou JSONL) e permite
+    # retomar: CNPJs já resolvidos no arquivo de saída são pulados.
+    STATUS_FINAIS = ("ok", "não encontrado", "inválido")
+    
+    def __init__(self, caminho, formato=None, retomar=True):
+        self.caminho = caminho
+        self.formato = formato or formato_arquivo(caminho)
+        self.colunas = ["CNPJ", "Status"] + CAMPOS_INFO
+        self.concluidos = self.ler_concluidos() if retomar else set()
+        novo = not retomar or not os.path.exists(caminho) or os.path.getsize(caminho) == 0
+        self.arquivo = open(caminho, 'w' if not retomar else 'a', encoding='utf-8', newline='')
+        if self.formato == "csv":
+            self.writer = csv.writer(self.arquivo)
+            if novo:
+                self.writer.writerow(self.colunas)
+    
+    def ler_concluidos(self):
+        concluidos = set()
+        if not os.path.exists(self.caminho):
+            return concluidos
+        with open(self.caminho, 'r', encoding='utf-8', newline='') as f:
+            if self.formato == "csv":
+                for linha in csv.DictReader(f):
+                    if linha.get("Status") in self.STATUS_FINAIS:
+                        concluidos.add(limpar_cnpj(linha.get("CNPJ") or ""))
+            else:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except ValueError:
+                        continue  # Linha truncada por uma interrupção
+                    if registro.get("Status") in self.STATUS_FINAIS:
+                        concluidos.add(limpar_cnpj(registro.get("CNPJ") or ""))
+        return concluidos
+    
+    def escrever(self, registro):
+        if self.formato == "csv":
+            self.writer.writerow([registro.get(coluna) or "" for coluna in self.colunas])
+        else:
+            self.arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self.arquivo.flush()
+    
+    def fechar(self):
+        self.arquivo.close()
+
+
+class ConsultaLote:
+    # Consulta uma lista de CNPJs em paralelo, sempre passando pelo limitador
+    # de taxa, e grava os resultados em streaming no arquivo de saída.
+    def __init__(self, cnpjs, saida, cliente, formato=None, workers=4, timeout=None,
+                 retomar=True, invalidos=(), bruto=False):
+        # `bruto` guarda também o JSON original da API (coluna "Dados", só
+        # no JSONL), usado depois pela exportação com as tabelas filhas
+        self.cnpjs = cnpjs
+        self.bruto = bruto
+        self.invalidos = list(invalidos)
+        self.escritor = EscritorResultados(saida, formato, retomar)
+        self.workers = workers
+        self.cliente = cliente
+        self.cache = cliente.cache
+        self.timeout = timeout
+        self.parar_evento = threading.Event()
+        self.lock = threading.Lock()
+        self.pendentes = [c for c in cnpjs if c not in self.escritor.concluidos]
+        self.total = len(self.pendentes)
+        self.feitos = 0
+        self.erros = 0
+        self.inicio = None
+    
+    def progresso(self):
+        with self.lock:
+            decorrido = time.monotonic() - self.inicio if self.inicio else 0.0
+            taxa = self.feitos / decorrido if decorrido > 0 else 0.0
+            restante = (self.total - self.feitos) / taxa if taxa > 0 else None
+            return {
+                "feitos": self.feitos,
+                "total": self.total,
+                "erros": self.erros,
+                "pulados": len(self.cnpjs) - self.total,
+                "por_segundo": taxa,
+                "restante_s": restante
+            }
+    
+    def parar(self):
+        self.parar_evento.set()
+    
+    def consultar(self, cnpj):
+        return consultar_registro(self.cliente, cnpj, self.timeout, self.parar_evento, self.bruto)
+    
+    def executar(self):
+        self.inicio = time.monotonic()
+        try:
+            for linha in self.invalidos:
+                if limpar_cnpj(linha) not in self.escritor.concluidos:
+                    self.escritor.escrever({"CNPJ": linha, "Status": "inválido"})
+            
+            fila = iter(self.pendentes)
+            em_andamento = set()
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="lote") as executor:
+                while True:
+                    # Mantém poucas tarefas na fila para não carregar tudo de uma vez
+                    while len(em_andamento) < self.workers * 2 and not self.parar_evento.is_set():
+                        cnpj = next(fila, None)
+                        if cnpj is None:
+                            break
+                        em_andamento.add(executor.submit(self.consultar, cnpj))
+                    if not em_andamento:
+                        break
+                    prontos, em_andamento = wait(em_andamento, return_when=FIRST_COMPLETED)
+                    for future in prontos:
+                        registro = future.result()
+                        if registro is None:
+                            continue
+                        self.escritor.escrever(registro)
+                        with self.lock:
+                            self.feitos += 1
+                            if registro["Status"].startswith("erro"):
+                                self.erros += 1
+        finally:
+            self.escritor.fechar()
+        return self.progresso()
+
+
+def consultar_registro(cliente, cnpj, timeout=None, parar=None, bruto=False):
+    # Linha do resultado de um CNPJ (cache antes da API); None se interrompido
+    cache = cliente.cache
+    entrada = cache.obter(cnpj) if cache is not None else None
+    if entrada and not cache.expirada(entrada):
+        cliente.contar("acertos")
+        return registro_lote(cnpj, "ok", entrada["empresa"], bruto)
+    try:
+        status_code, empresa, _ = cliente.buscar(
+            cnpj, entrada=entrada, timeout=timeout, tentativas=TENTATIVAS_LOTE, parar=parar
+        )
+    except InterruptedError:
+        return None
+    except Exception as e:
+        return registro_lote(cnpj, f"erro: {e}")
+    if status_code == 404:
+        return registro_lote(cnpj, "não encontrado")
+    if status_code == 400:
+        return registro_lote(cnpj, "inválido")
+    return registro_lote(cnpj, "ok", empresa, bruto)
+
+
+def registro_lote(cnpj, status, empresa=None, bruto=False):
+    registro = {"CNPJ": format_cnpj(cnpj), "Status": status}
+    if empresa is not None:
+        campos, _ = campos_info(empresa)
+        registro.update(campos)
+        if bruto:
+            registro["Dados"] = empresa
+    return registro
@@ -0,0 +1,204 @@
+import json
+import time
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# Medições de tempo por etapa e contadores de uso da API, para saber se a
+# lentidão está do nosso lado ou no servidor. Etapas registradas:
+#
+#   espera_limite    aguardando ficha do limitador de taxa (nosso limite)
+#   conexao          DNS + TCP + TLS, só quando abre conexão nova (servidor/rede)
+#   espera_servidor  do envio até receber os cabeçalhos (servidor)
+#   download         leitura do corpo da resposta (rede)
+#   json             decodificação do JSON (nosso)
+#   parse            montagem dos campos exibidos (nosso)
+#   renderizacao     preenchimento das abas, por aba (nosso)
+#   consulta_total   do clique até a primeira aba exibida
+AMOSTRAS_POR_MEDIDA = 1000
+ERROS_GUARDADOS = 100
+
+ETAPAS_REDE = ("conexao", "espera_servidor", "download")
+ETAPAS_APLICATIVO = ("json", "parse", "renderizacao")
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, int(round((len(ordenados) - 1) * p / 100)))]
+
+
+class Metricas:
+    # Compartilhado entre threads. Cada medida guarda as últimas
+    # `amostras` durações (para percentis) e os totais desde o início.
+    # Com `log`, cada medida e erro também vira uma linha JSON no arquivo.
+    def __init__(self, amostras=AMOSTRAS_POR_MEDIDA, log=None):
+        self.amostras = amostras
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.contadores = Counter()
+        self.medidas = {}
+        self.totais = {}
+        self.medidores = {}
+        self.erros = deque(maxlen=ERROS_GUARDADOS)
+        self.log = open(log, 'a', encoding='utf-8') if log else None
+
+    def contar(self, nome, valor=1):
+        with self.lock:
+            self.contadores[nome] += valor
+
+    def contagens(self, *nomes):
+        with self.lock:
+            return {nome: self.contadores[nome] for nome in nomes}
+
+    def registrar(self, nome, segundos, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self.lock:
+            if chave not in self.medidas:
+                self.medidas[chave] = deque(maxlen=self.amostras)
+                self.totais[chave] = [0, 0.0]
+            self.medidas[chave].append(segundos)
+            self.totais[chave][0] += 1
+            self.totais[chave][1] += segundos
+            if self.log:
+                self.escrever_log({"tipo": "medida", "nome": nome, "ms": round(segundos * 1000, 3), **rotulos})
+
+    @contextmanager
+    def medir(self, nome, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nome, time.perf_counter() - inicio, **rotulos)
+
+    def medidor(self, nome, funcao):
+        # Valor lido na hora do resumo (ex.: fichas disponíveis no limitador)
+        self.medidores[nome] = funcao
+
+    def erro(self, origem, erro):
+        registro = {
+            "data": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "origem": origem,
+            "tipo": type(erro).__name__,
+            "mensagem": str(erro)
+        }
+        with self.lock:
+            self.contadores["erros"] += 1
+            self.erros.append(registro)
+            if self.log:
+                self.escrever_log({"tipo": "erro", **registro})
+
+    def escrever_log(self, registro):
+        self.log.write(json.dumps({"ts": round(time.time(), 3), **registro}, ensure_ascii=False) + "\n")
+        self.log.flush()
+
+    def resumo(self):
+        with self.lock:
+            medidas = {}
+            for (nome, rotulos), valores in self.medidas.items():
+                ordenados = sorted(valores)
+                quantidade, soma = self.totais[(nome, rotulos)]
+                medidas[(nome, rotulos)] = {
+                    "quantidade": quantidade,
+                    "media_ms": soma / quantidade * 1000,
+                    "p50_ms": percentil(ordenados, 50) * 1000,
+                    "p95_ms": percentil(ordenados, 95) * 1000,
+                    "p99_ms": percentil(ordenados, 99) * 1000,
+                    "maximo_ms": ordenados[-1] * 1000
+                }
+            contadores = dict(self.contadores)
+            erros = list(self.erros)
+        medidores = {}
+        for nome, funcao in self.medidores.items():
+            try:
+                medidores[nome] = funcao()
+            except Exception:
+                medidores[nome] = None
+        return {"contadores": contadores, "medidas": medidas, "medidores": medidores, "erros": erros}
+
+    def resumo_json(self):
+        resumo = self.resumo()
+        resumo["medidas"] = [
+            {"nome": nome, **dict(rotulos), **{k: round(v, 3) for k, v in valores.items()}}
+            for (nome, rotulos), valores in sorted(resumo["medidas"].items())
+        ]
+        return resumo
+
+    def tempo_medio(self, etapas):
+        # Soma das médias das etapas (todas as variações de rótulo)
+        with self.lock:
+            return sum(
+                soma / quantidade * 1000
+                for (nome, _), (quantidade, soma) in self.totais.items()
+                if nome in etapas and quantidade
+            )
+
+    def texto_prometheus(self, prefixo="cnpj"):
+        resumo = self.resumo()
+        linhas = []
+        for nome, valor in sorted(resumo["contadores"].items()):
+            linhas += [f"# TYPE {prefixo}_{nome}_total counter", f"{prefixo}_{nome}_total {valor}"]
+        for nome, valor in sorted(resumo["medidores"].items()):
+            if valor is not None:
+                linhas += [f"# TYPE {prefixo}_{nome} gauge", f"{prefixo}_{nome} {valor:g}"]
+        declarados = set()
+        with self.lock:
+            totais = dict(self.totais)
+        for (nome, rotulos), valores in sorted(resumo["medidas"].items()):
+            metrica = f"{prefixo}_{nome}_segundos"
+            if metrica not in declarados:
+                declarados.add(metrica)
+                linhas.append(f"# TYPE {metrica} summary")
+            base = ",".join(f'{k}="{v}"' for k, v in rotulos)
+            for quantil, chave in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                rotulo = f'{base},quantile="{quantil}"' if base else f'quantile="{quantil}"'
+                linhas.append(f"{metrica}{{{rotulo}}} {valores[chave] / 1000:.6f}")
+            sufixo = f"{{{base}}}" if base else ""
+            quantidade, soma = totais[(nome, rotulos)]
+            linhas.append(f"{metrica}_count{sufixo} {quantidade}")
+            linhas.append(f"{metrica}_sum{sufixo} {soma:.6f}")
+        return "\n".join(linhas) + "\n"
+
+    def zerar(self):
+        with self.lock:
+            self.contadores.clear()
+            self.medidas.clear()
+            self.totais.clear()
+            self.erros.clear()
+
+    def servir(self, porta, endereco="127.0.0.1"):
+        # Endpoint no formato de texto do Prometheus (/metrics) e em JSON
+        # (/metrics.json), numa thread em segundo plano
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        metricas = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    corpo = json.dumps(metricas.resumo_json(), ensure_ascii=False).encode("utf-8")
+                    tipo = "application/json; charset=utf-8"
+                elif self.path.startswith("/metrics"):
+                    corpo = metricas.texto_prometheus().encode("utf-8")
+                    tipo = "text/plain; version=0.0.4; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        servidor = ThreadingHTTPServer((endereco, porta), Handler)
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+        return servidor
+
+    def fechar(self):
+        with self.lock:
+            if self.log:
+                self.log.close()
+                self.log = None
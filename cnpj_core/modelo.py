@@ -0,0 +1,120 @@
+from dataclasses import dataclass, field, asdict, replace
+from typing import Any, Dict, List, Optional
+
+from .formatacao import get_nested_value
+from .validacao import limpar_cnpj
+
+
+@dataclass
+class Endereco:
+    logradouro: Optional[str] = None
+    numero: Optional[str] = None
+    complemento: Optional[str] = None
+    bairro: Optional[str] = None
+    cidade: Optional[str] = None
+    uf: Optional[str] = None
+    cep: Optional[str] = None
+
+
+@dataclass
+class Socio:
+    nome: Optional[str] = None
+    documento: Optional[str] = None
+    tipo: Optional[str] = None
+    cargo: Optional[str] = None
+    desde: Optional[str] = None
+    idade: Optional[str] = None
+
+
+@dataclass
+class Atividade:
+    codigo: Optional[int] = None
+    descricao: Optional[str] = None
+
+
+@dataclass
+class Inscricao:
+    numero: Optional[str] = None
+    uf: Optional[str] = None
+    situacao: Optional[str] = None
+    tipo: Optional[str] = None
+    data_status: Optional[str] = None
+
+
+@dataclass
+class Empresa:
+    # Resultado de uma consulta. `dados` guarda o JSON original da API, no
+    # formato usado pela interface gráfica e pelo cache.
+    cnpj: str
+    nome: Optional[str] = None
+    fantasia: Optional[str] = None
+    abertura: Optional[str] = None
+    situacao: Optional[str] = None
+    natureza: Optional[str] = None
+    porte: Optional[str] = None
+    capital_social: float = 0.0
+    telefones: List[str] = field(default_factory=list)
+    emails: List[str] = field(default_factory=list)
+    endereco: Optional[Endereco] = None
+    atividade_principal: Optional[Atividade] = None
+    atividades_secundarias: List[Atividade] = field(default_factory=list)
+    socios: List[Socio] = field(default_factory=list)
+    inscricoes: List[Inscricao] = field(default_factory=list)
+    dados: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def de_json(cls, dados):
+        endereco = dados.get("address")
+        principal = dados.get("mainActivity")
+        return cls(
+            cnpj=limpar_cnpj(dados.get("taxId", "")),
+            nome=get_nested_value(dados, "company.name"),
+            fantasia=dados.get("alias"),
+            abertura=dados.get("founded"),
+            situacao=get_nested_value(dados, "status.text"),
+            natureza=get_nested_value(dados, "company.nature.text"),
+            porte=get_nested_value(dados, "company.size.text"),
+            capital_social=float(get_nested_value(dados, "company.equity") or 0),
+            telefones=[f"({p.get('area', '')}) {p.get('number', '')}" for p in dados.get("phones", [])],
+            emails=[e.get("address") for e in dados.get("emails", []) if e.get("address")],
+            endereco=Endereco(
+                logradouro=endereco.get("street"),
+                numero=endereco.get("number"),
+                complemento=endereco.get("details"),
+                bairro=endereco.get("district"),
+                cidade=endereco.get("city"),
+                uf=endereco.get("state"),
+                cep=endereco.get("zip")
+            ) if endereco else None,
+            atividade_principal=Atividade(principal.get("id"), principal.get("text")) if principal else None,
+            atividades_secundarias=[Atividade(a.get("id"), a.get("text")) for a in dados.get("sideActivities", [])],
+            socios=[
+                Socio(
+                    nome=get_nested_value(m, "person.name"),
+                    documento=get_nested_value(m, "person.taxId"),
+                    tipo=get_nested_value(m, "person.type"),
+                    cargo=get_nested_value(m, "role.text"),
+                    desde=m.get("since"),
+                    idade=get_nested_value(m, "person.age")
+                )
+                for m in get_nested_value(dados, "company.members") or []
+            ],
+            inscricoes=[
+                Inscricao(
+                    numero=r.get("number"),
+                    uf=r.get("state"),
+                    situacao=get_nested_value(r, "status.text"),
+                    tipo=get_nested_value(r, "type.text"),
+                    data_status=r.get("statusDate")
+                )
+                for r in dados.get("registrations", [])
+            ],
+            dados=dados
+        )
+
+    def para_dict(self, incluir_dados=False):
+        if incluir_dados:
+            return asdict(self)
+        resultado = asdict(replace(self, dados={}))
+        resultado.pop("dados")
+        return resultado
@@ -0,0 +1,380 @@
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+from .caminhos import caminho_monitoramento, caminho_cache
+from .formatacao import get_nested_value, format_address, format_cnpj
+from .validacao import validar_cnpj
+
+# Monitoramento de fornecedores: cada CNPJ da lista é consultado de novo
+# periodicamente em segundo plano e só os campos acompanhados são guardados
+# (situação, quadro de sócios e endereço). O histórico fica como deltas em
+# relação à versão anterior, e um alerta só é gerado quando algum desses
+# campos muda de fato.
+
+# Parte do limite da API reservada ao monitoramento; o resto fica livre
+# para as consultas feitas pelo usuário
+MONITOR_POR_MINUTO = 2.0
+INTERVALO_BASE_DIAS = 7.0
+INTERVALO_ERRO_HORAS = 6.0
+JITTER = 0.2
+ESPERA_MAXIMA = 300.0
+
+# Situações que aumentam a frequência de verificação
+SITUACOES_RISCO = {"Suspensa", "Inapta", "Nula"}
+RISCO_MAXIMO = 3
+
+ROTULOS = {
+    "situacao": "Situação cadastral",
+    "data_situacao": "Data da situação",
+    "endereco": "Endereço",
+}
+
+ESQUEMA = (
+    "CREATE TABLE IF NOT EXISTS monitorados ("
+    "cnpj TEXT PRIMARY KEY, nome TEXT, adicionado TEXT NOT NULL, "
+    "prioridade INTEGER NOT NULL DEFAULT 0, risco INTEGER NOT NULL DEFAULT 0, "
+    "proxima REAL NOT NULL DEFAULT 0, ultima REAL, falhas INTEGER NOT NULL DEFAULT 0, "
+    "versao INTEGER NOT NULL DEFAULT 0, estado TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_monitorados_proxima ON monitorados(proxima)",
+    "CREATE TABLE IF NOT EXISTS versoes ("
+    "cnpj TEXT NOT NULL, versao INTEGER NOT NULL, data TEXT NOT NULL, delta TEXT NOT NULL, "
+    "PRIMARY KEY (cnpj, versao)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS alertas ("
+    "id INTEGER PRIMARY KEY, cnpj TEXT NOT NULL, data TEXT NOT NULL, campo TEXT NOT NULL, "
+    "antes TEXT, depois TEXT, lido INTEGER NOT NULL DEFAULT 0)",
+    "CREATE INDEX IF NOT EXISTS idx_alertas_lido ON alertas(lido, id)",
+)
+
+
+def resumo_monitorado(empresa):
+    # Projeção dos campos acompanhados; é o que vai para o histórico
+    if empresa is None:
+        return {"situacao": "Não encontrado", "data_situacao": None, "socios": [], "endereco": None}
+    return {
+        "situacao": get_nested_value(empresa, "status.text"),
+        "data_situacao": empresa.get("statusDate"),
+        "socios": sorted(
+            f"{get_nested_value(m, 'person.name') or ''} ({get_nested_value(m, 'role.text') or ''})"
+            for m in get_nested_value(empresa, "company.members") or []
+        ),
+        "endereco": format_address(empresa.get("address")) if empresa.get("address") else None
+    }
+
+
+def diferencas(antes, depois):
+    # Delta entre dois resumos: só os campos que mudaram; sócios como
+    # entradas e saídas em vez da lista inteira
+    delta = {}
+    for campo, valor in depois.items():
+        anterior = antes.get(campo)
+        if campo == "socios":
+            entraram = sorted(set(valor) - set(anterior or []))
+            sairam = sorted(set(anterior or []) - set(valor))
+            if entraram:
+                delta["socios+"] = entraram
+            if sairam:
+                delta["socios-"] = sairam
+        elif valor != anterior:
+            delta[campo] = valor
+    return delta
+
+
+def aplicar_delta(estado, delta):
+    estado = dict(estado)
+    for campo, valor in delta.items():
+        if campo == "socios+":
+            estado["socios"] = sorted(set(estado.get("socios", [])) | set(valor))
+        elif campo == "socios-":
+            estado["socios"] = sorted(set(estado.get("socios", [])) - set(valor))
+        else:
+            estado[campo] = valor
+    return estado
+
+
+def calcular_risco(prioridade, resumo, mudou):
+    risco = prioridade
+    if resumo.get("situacao") != "Ativa":
+        risco += 1
+    if resumo.get("situacao") in SITUACOES_RISCO:
+        risco += 1
+    if mudou:
+        risco += 1
+    return min(RISCO_MAXIMO, risco)
+
+
+class ListaMonitoramento:
+    # Lista de CNPJs monitorados em SQLite (WAL), com versões e alertas
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            for sql in ESQUEMA:
+                self.conn.execute(sql)
+
+    def adicionar(self, cnpjs, prioridade=0):
+        agora = datetime.now().strftime("%Y-%m-%d %H:%M")
+        with self.lock, self.conn:
+            antes = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO monitorados (cnpj, adicionado, prioridade) VALUES (?, ?, ?)",
+                [(cnpj, agora, prioridade) for cnpj in cnpjs]
+            )
+            return self.conn.total_changes - antes
+
+    def remover(self, cnpjs):
+        with self.lock, self.conn:
+            for cnpj in cnpjs:
+                self.conn.execute("DELETE FROM monitorados WHERE cnpj = ?", (cnpj,))
+                self.conn.execute("DELETE FROM versoes WHERE cnpj = ?", (cnpj,))
+
+    def contar(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM monitorados").fetchone()[0]
+
+    def proxima(self):
+        # (cnpj, proxima) do mais atrasado; os nunca verificados têm proxima = 0
+        with self.lock:
+            return self.conn.execute(
+                "SELECT cnpj, proxima FROM monitorados ORDER BY proxima LIMIT 1"
+            ).fetchone()
+
+    def obter(self, cnpj):
+        with self.lock:
+            linha = self.conn.execute(
+                "SELECT prioridade, versao, estado FROM monitorados WHERE cnpj = ?", (cnpj,)
+            ).fetchone()
+        if linha is None:
+            return None
+        prioridade, versao, estado = linha
+        return prioridade, versao, json.loads(estado) if estado else None
+
+    def registrar(self, cnpj, nome, resumo, intervalo):
+        # Grava a nova versão (se mudou), os alertas e o próximo horário.
+        # Devolve a lista de alertas gerados.
+        atual = self.obter(cnpj)
+        if atual is None:
+            return []  # Removido enquanto era consultado
+        prioridade, versao, estado = atual
+
+        delta = diferencas(estado, resumo) if estado is not None else dict(resumo)
+        alertas = []
+        if estado is not None:
+            for campo, valor in delta.items():
+                if campo == "socios+":
+                    alertas += [("Sócio incluído", None, s) for s in valor]
+                elif campo == "socios-":
+                    alertas += [("Sócio retirado", s, None) for s in valor]
+                elif campo != "data_situacao" or "situacao" not in delta:
+                    alertas.append((ROTULOS.get(campo, campo), estado.get(campo), valor))
+
+        risco = calcular_risco(prioridade, resumo, bool(alertas))
+        agora = time.time()
+        proxima = agora + intervalo / (1 + risco) * random.uniform(1 - JITTER, 1 + JITTER)
+        data = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+        with self.lock, self.conn:
+            if delta:
+                versao += 1
+                self.conn.execute(
+                    "INSERT INTO versoes (cnpj, versao, data, delta) VALUES (?, ?, ?, ?)",
+                    (cnpj, versao, data, json.dumps(delta, ensure_ascii=False, separators=(",", ":")))
+                )
+            self.conn.execute(
+                "UPDATE monitorados SET nome = COALESCE(?, nome), risco = ?, proxima = ?, ultima = ?, "
+                "falhas = 0, versao = ?, estado = ? WHERE cnpj = ?",
+                (nome, risco, proxima, agora, versao,
+                 json.dumps(resumo, ensure_ascii=False, separators=(",", ":")), cnpj)
+            )
+            self.conn.executemany(
+                "INSERT INTO alertas (cnpj, data, campo, antes, depois) VALUES (?, ?, ?, ?, ?)",
+                [(cnpj, data, campo, antes, depois) for campo, antes, depois in alertas]
+            )
+        return [
+            {"cnpj": cnpj, "nome": nome, "data": data, "campo": campo, "antes": antes, "depois": depois}
+            for campo, antes, depois in alertas
+        ]
+
+    def registrar_falha(self, cnpj):
+        # Falha de rede ou da API: tenta de novo mais tarde, espaçando cada vez mais
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE monitorados SET falhas = falhas + 1, "
+                "proxima = ? + ? * MIN(falhas + 1, 8) WHERE cnpj = ?",
+                (time.time(), INTERVALO_ERRO_HORAS * 3600 * random.uniform(1 - JITTER, 1 + JITTER), cnpj)
+            )
+
+    def historico(self, cnpj):
+        # Reconstrói as versões completas a partir dos deltas: [(data, resumo)]
+        with self.lock:
+            linhas = self.conn.execute(
+                "SELECT data, delta FROM versoes WHERE cnpj = ? ORDER BY versao", (cnpj,)
+            ).fetchall()
+        estado, versoes = {}, []
+        for data, delta in linhas:
+            estado = aplicar_delta(estado, json.loads(delta))
+            versoes.append((data, estado))
+        return versoes
+
+    def alertas(self, apenas_novos=False, limite=500):
+        where = " WHERE a.lido = 0" if apenas_novos else ""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT a.id, a.cnpj, m.nome, a.data, a.campo, a.antes, a.depois, a.lido "
+                f"FROM alertas a LEFT JOIN monitorados m ON m.cnpj = a.cnpj{where} "
+                "ORDER BY a.id DESC LIMIT ?", (limite,)
+            ).fetchall()
+
+    def marcar_lidos(self):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE alertas SET lido = 1 WHERE lido = 0")
+
+    def fechar(self):
+        with self.lock:
+            self.conn.close()
+
+
+class Monitor:
+    # Agendador em segundo plano: consulta um CNPJ por vez, sempre o mais
+    # atrasado, num ritmo de `por_minuto` com jitter para não disparar em
+    # rajadas. O intervalo entre verificações de um mesmo CNPJ cresce com o
+    # tamanho da lista, para que o ciclo completo caiba no orçamento (50 mil
+    # CNPJs a 2/min levam ~17 dias; os de maior risco voltam antes).
+    def __init__(self, lista, cliente, por_minuto=MONITOR_POR_MINUTO,
+                 intervalo_dias=INTERVALO_BASE_DIAS, ao_alertar=None):
+        self.lista = lista
+        self.cliente = cliente
+        self.por_minuto = por_minuto
+        self.intervalo_dias = intervalo_dias
+        self.ao_alertar = ao_alertar
+        self.parar_evento = threading.Event()
+        self.acordar_evento = threading.Event()
+        self.thread = None
+        self.verificados = 0
+
+    def intervalo(self):
+        # Segundos entre duas verificações do mesmo CNPJ com risco 0
+        ciclo = self.lista.contar() / self.por_minuto * 60 * (1 + JITTER)
+        return max(self.intervalo_dias * 86400, ciclo)
+
+    def iniciar(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.parar_evento.clear()
+            self.thread = threading.Thread(target=self.executar, name="monitoramento", daemon=True)
+            self.thread.start()
+
+    def parar(self):
+        self.parar_evento.set()
+        self.acordar_evento.set()
+
+    def acordar(self):
+        # Reavalia a fila na hora (por exemplo, depois de incluir CNPJs)
+        self.acordar_evento.set()
+
+    def verificar(self, cnpj):
+        # Com cópia em cache a verificação é condicional (ETag): sem mudança, 304.
+        # Sempre pelo provedor principal, para comparar respostas no mesmo formato.
+        cache = self.cliente.cache
+        entrada = cache.obter(cnpj) if cache is not None else None
+        try:
+            status_code, empresa, origem = self.cliente.buscar(
+                cnpj, entrada=entrada, parar=self.parar_evento, usar_local=False, principal=True
+            )
+        except InterruptedError:
+            return []
+        except Exception as e:
+            print(f"Erro ao monitorar {format_cnpj(cnpj)}: {e}")
+            self.lista.registrar_falha(cnpj)
+            return []
+        if status_code == 400 or origem.startswith("cache, "):
+            # A cópia do cache devolvida com a API fora do ar não é uma verificação
+            self.lista.registrar_falha(cnpj)
+            return []
+        self.verificados += 1
+        nome = get_nested_value(empresa, "company.name") if empresa else None
+        return self.lista.registrar(cnpj, nome, resumo_monitorado(empresa), self.intervalo())
+
+    def executar(self):
+        while not self.parar_evento.is_set():
+            proximo = self.lista.proxima()
+            if proximo is None:
+                espera = ESPERA_MAXIMA
+            else:
+                cnpj, quando = proximo
+                espera = quando - time.time()
+                if espera <= 0:
+                    for alerta in self.verificar(cnpj):
+                        if self.ao_alertar:
+                            self.ao_alertar(alerta)
+                    espera = 60.0 / self.por_minuto * random.uniform(1 - JITTER, 1 + JITTER)
+            self.acordar_evento.wait(min(espera, ESPERA_MAXIMA))
+            self.acordar_evento.clear()
+
+
+def main(argv=None):
+    from .cache import CacheConsultas
+    from .cliente import ClienteCNPJa, LimitadorTaxa, LIMITE_POR_MINUTO
+    from .lote import ler_cnpjs
+
+    parser = argparse.ArgumentParser(
+        prog="python -m cnpj_core.monitoramento",
+        description="Monitora mudanças de situação, sócios e endereço de uma lista de CNPJs"
+    )
+    parser.add_argument("--lista", default=caminho_monitoramento(), help="arquivo da lista de monitoramento")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    adicionar = sub.add_parser("adicionar", help="inclui CNPJs (argumentos ou --arquivo CSV/TXT)")
+    adicionar.add_argument("cnpjs", nargs="*", metavar="CNPJ")
+    adicionar.add_argument("--arquivo")
+    adicionar.add_argument("--prioridade", type=int, default=0, choices=range(RISCO_MAXIMO + 1))
+    remover = sub.add_parser("remover", help="retira CNPJs da lista")
+    remover.add_argument("cnpjs", nargs="+", metavar="CNPJ")
+    executar = sub.add_parser("executar", help="verifica continuamente, imprimindo os alertas (Ctrl+C para sair)")
+    executar.add_argument("--por-minuto", type=float, default=LIMITE_POR_MINUTO,
+                          help=f"consultas por minuto (padrão: {LIMITE_POR_MINUTO})")
+    alertas = sub.add_parser("alertas", help="lista os alertas")
+    alertas.add_argument("--novos", action="store_true", help="só os não lidos, marcando-os como lidos")
+    args = parser.parse_args(argv)
+
+    lista = ListaMonitoramento(args.lista)
+    try:
+        if args.comando == "adicionar":
+            cnpjs = [c for c in map(validar_cnpj, args.cnpjs) if c]
+            if args.arquivo:
+                cnpjs += ler_cnpjs(args.arquivo)[0]
+            print(f"{lista.adicionar(cnpjs, args.prioridade)} CNPJs incluídos "
+                  f"({lista.contar()} monitorados)", file=sys.stderr)
+        elif args.comando == "remover":
+            lista.remover([c for c in map(validar_cnpj, args.cnpjs) if c])
+        elif args.comando == "alertas":
+            for _, cnpj, nome, data, campo, antes, depois, _ in lista.alertas(args.novos):
+                print(f"{data}  {format_cnpj(cnpj)}  {nome or ''}  {campo}: {antes or '-'} -> {depois or '-'}")
+            if args.novos:
+                lista.marcar_lidos()
+        else:
+            cliente = ClienteCNPJa(CacheConsultas(caminho_cache()), LimitadorTaxa(args.por_minuto))
+            monitor = Monitor(
+                lista, cliente, por_minuto=args.por_minuto,
+                ao_alertar=lambda a: print(f"{a['data']}  {format_cnpj(a['cnpj'])}  {a['nome'] or ''}  "
+                                           f"{a['campo']}: {a['antes'] or '-'} -> {a['depois'] or '-'}", flush=True)
+            )
+            try:
+                monitor.executar()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                cliente.fechar()
+    finally:
+        lista.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
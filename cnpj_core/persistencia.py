@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Gravação segura dos arquivos JSON do aplicativo (preferências): escreve
+# num temporário da mesma pasta, faz fsync e troca com os.replace, sempre
+# com uma trava entre processos, para que duas instâncias abertas não
+# corrompam nem sobrescrevam o arquivo uma da outra.
+TRAVA_TIMEOUT = 10.0
+ATRASO_GRAVACAO = 1.0
+
+if os.name == 'nt':
+    import msvcrt
+
+    def travar_fd(fd, timeout):
+        limite = time.monotonic() + timeout
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if time.monotonic() >= limite:
+                    raise TimeoutError("Arquivo em uso por outra instância")
+                time.sleep(0.05)
+
+    def destravar_fd(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def travar_fd(fd, timeout):
+        limite = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() >= limite:
+                    raise TimeoutError("Arquivo em uso por outra instância")
+                time.sleep(0.05)
+
+    def destravar_fd(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+@contextmanager
+def trava_arquivo(caminho, timeout=TRAVA_TIMEOUT):
+    # Trava exclusiva num arquivo ".lock" ao lado do original (o próprio
+    # arquivo é trocado por os.replace e não pode guardar a trava)
+    fd = os.open(caminho + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        travar_fd(fd, timeout)
+        try:
+            yield
+        finally:
+            destravar_fd(fd)
+    finally:
+        os.close(fd)
+
+
+def gravar_atomico(caminho, texto):
+    # Nunca deixa o arquivo pela metade: ou fica a versão antiga, ou a nova
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    fd, temporario = tempfile.mkstemp(prefix=os.path.basename(caminho) + ".", suffix=".tmp", dir=pasta)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(texto)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+    if os.name != 'nt':
+        # Garante que a troca de nome também chegou ao disco
+        fd = os.open(pasta, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def ler_json(caminho):
+    # Devolve None se o arquivo não existir. Um arquivo corrompido é
+    # preservado com a extensão ".corrompido" em vez de ser sobrescrito.
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        os.replace(caminho, caminho + ".corrompido")
+        raise
+
+
+class ArquivoJSON:
+    # Dicionário persistido em JSON. Ao gravar, relê o arquivo sob a trava e
+    # aplica só as chaves alteradas nesta instância, preservando o que outra
+    # instância tenha salvo nesse meio-tempo. agendar() junta várias
+    # alterações seguidas numa única gravação.
+    def __init__(self, caminho, padrao=None):
+        self.caminho = caminho
+        self.lock = threading.Lock()
+        self.timer = None
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        try:
+            with trava_arquivo(caminho):
+                dados = ler_json(caminho)
+        except ValueError as e:
+            print(f"Arquivo corrompido, usando valores padrão (cópia em {caminho}.corrompido): {e}")
+            dados = None
+        self.dados = dados if isinstance(dados, dict) else dict(padrao or {})
+        self.gravado = dict(self.dados)
+
+    def salvar(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            alterados = {k: v for k, v in self.dados.items() if self.gravado.get(k, object()) != v}
+            with trava_arquivo(self.caminho):
+                try:
+                    atual = ler_json(self.caminho)
+                except ValueError:
+                    atual = None
+                atual = atual if isinstance(atual, dict) else dict(self.dados)
+                atual.update(alterados)
+                gravar_atomico(self.caminho, json.dumps(atual, ensure_ascii=False, indent=2))
+            self.dados.update(atual)
+            self.gravado = dict(atual)
+            return self.caminho
+
+    def agendar(self, atraso=ATRASO_GRAVACAO):
+        with self.lock:
+            if self.timer is None:
+                self.timer = threading.Timer(atraso, self.salvar_agendado)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def salvar_agendado(self):
+        try:
+            self.salvar()
+        except Exception as e:
+            print(f"Erro ao salvar {self.caminho}: {e}")
+
+    def fechar(self):
+        # Grava o que ainda estiver pendente
+        with self.lock:
+            pendente = self.timer is not None
+        if pendente:
+            self.salvar()
@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import queue
+import heapq
+import shutil
+import signal
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from .cliente import LimitadorTaxa
+from .lote import EscritorResultados, consultar_registro
+from .validacao import limpar_cnpj
+
+# Lote em vários processos, para listas de milhões de CNPJs em que um só
+# processo fica preso no GIL (leitura do JSON, projeção, formatação e
+# gravação da saída). Cada processo tem o próprio cliente e suas threads;
+# entre eles ficam compartilhados só o limite de taxa de cada provedor
+# (memória compartilhada) e a fila de trabalho.
+#
+# A entrada é dividida por prefixo do CNPJ (mesma raiz sempre no mesmo
+# shard, consultas próximas na base local) e cada shard vai inteiro para
+# um processo, então nenhum CNPJ é consultado duas vezes. Cada processo
+# grava o resultado de cada shard em ordem em <saida>.partes/, que também
+# guarda o progresso: interrompido, o lote retoma dali. No fim, as partes
+# são intercaladas pela posição na entrada e a saída sai na ordem original.
+DIGITOS_SHARD = 2
+ITENS_POR_BLOCO = 2000  # Shards maiores são divididos para equilibrar os processos
+INTERVALO_ESPERA = 0.2
+
+
+class LimitadorProcessos(LimitadorTaxa):
+    # O mesmo token bucket do LimitadorTaxa, com fichas e hora da última
+    # reposição em memória compartilhada entre os processos do lote
+    # (time.monotonic é o mesmo relógio para todos os processos da máquina)
+    def __init__(self, por_minuto, capacidade=None, contexto=None):
+        contexto = contexto or multiprocessing.get_context("spawn")
+        self.estado = contexto.RawArray("d", 2)
+        super().__init__(por_minuto, capacidade)
+        self.lock = contexto.Lock()
+
+    @property
+    def fichas(self):
+        return self.estado[0]
+
+    @fichas.setter
+    def fichas(self, valor):
+        self.estado[0] = valor
+
+    @property
+    def atualizado(self):
+        return self.estado[1]
+
+    @atualizado.setter
+    def atualizado(self, valor):
+        self.estado[1] = valor
+
+
+def shard(cnpj, digitos=DIGITOS_SHARD):
+    return limpar_cnpj(cnpj)[:digitos]
+
+
+def pasta_partes(saida):
+    return saida + ".partes"
+
+
+def ler_parte(caminho, execucao):
+    # (posição na entrada, execução, cnpj, registro) de uma parte, em ordem;
+    # uma linha cortada por interrupção é ignorada
+    with open(caminho, "r", encoding="utf-8") as f:
+        for linha in f:
+            try:
+                indice, cnpj, registro = json.loads(linha)
+            except ValueError:
+                continue
+            yield indice, execucao, cnpj, registro
+
+
+def partes(pasta):
+    # {execução: [arquivos]}; o nome é <shard>-<bloco>.<execução>.jsonl
+    arquivos = defaultdict(list)
+    for entrada in os.scandir(pasta):
+        nome = entrada.name.split(".")
+        if len(nome) == 3 and nome[2] == "jsonl" and nome[1].isdigit():
+            arquivos[int(nome[1])].append(entrada.path)
+    return arquivos
+
+
+def fechar_cliente(cliente):
+    cliente.fechar()
+    for indice in (cliente.indice_socios, cliente.indice_busca, cliente.snapshots):
+        if indice is not None:
+            indice.fechar()
+    cliente.metricas.fechar()
+
+
+def trabalhador(fabrica, limitadores, fila, contadores, parar, pasta, execucao, workers, timeout, bruto, resumos):
+    # Processo do lote: pega shards da fila até o fim (None) ou até `parar`.
+    # Ctrl+C chega a todos os processos; quem decide parar é o principal.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cliente = fabrica(limitadores)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lote") as executor:
+            while not parar.is_set():
+                try:
+                    nome, itens = fila.get(timeout=INTERVALO_ESPERA)
+                except queue.Empty:
+                    continue
+                if nome is None:
+                    break
+                consultar = lambda item: consultar_registro(cliente, item[1], timeout, parar, bruto)
+                with open(os.path.join(pasta, f"{nome}.{execucao}.jsonl"), "a", encoding="utf-8") as f:
+                    # Poucas consultas por vez (para parar logo); map devolve na
+                    # ordem da entrada, então a parte fica ordenada
+                    for inicio in range(0, len(itens), workers * 2):
+                        janela = itens[inicio:inicio + workers * 2]
+                        registros = list(executor.map(consultar, janela))
+                        for (indice, cnpj), registro in zip(janela, registros):
+                            if registro is None:
+                                break  # Interrompido: o resto do bloco fica para a retomada
+                            f.write(json.dumps([indice, cnpj, registro], ensure_ascii=False) + "\n")
+                            with contadores.get_lock():
+                                contadores[0] += 1
+                                if registro["Status"].startswith("erro"):
+                                    contadores[1] += 1
+                        f.flush()
+                        if None in registros or parar.is_set():
+                            break
+        resumos.put(cliente.estatisticas())
+    finally:
+        fechar_cliente(cliente)
+
+
+class LoteProcessos:
+    # Mesma interface do ConsultaLote (executar, parar, progresso). `fabrica`
+    # cria o cliente dentro de cada processo a partir dos limitadores
+    # compartilhados e precisa ser serializável (função do módulo ou
+    # functools.partial); `limites` é {provedor: consultas por minuto}.
+    def __init__(self, cnpjs, saida, fabrica, limites, processos=None, workers=4, formato=None,
+                 timeout=None, retomar=True, invalidos=(), bruto=False):
+        self.cnpjs = cnpjs
+        self.saida = saida
+        self.fabrica = fabrica
+        self.processos = processos or os.cpu_count() or 1
+        self.workers = workers
+        self.formato = formato
+        self.timeout = timeout
+        self.retomar = retomar
+        self.bruto = bruto
+        self.invalidos = list(invalidos)
+        self.pasta = pasta_partes(saida)
+        self.contexto = multiprocessing.get_context("spawn")
+        self.limitadores = {
+            nome: LimitadorProcessos(limite, contexto=self.contexto) for nome, limite in limites.items()
+        }
+        self.parar_evento = self.contexto.Event()
+        self.contadores = self.contexto.Array("q", 2)  # feitos, erros
+        self.estatisticas_processos = []
+        self.total = 0
+        self.pulados = 0
+        self.inicio = None
+
+    def progresso(self):
+        decorrido = time.monotonic() - self.inicio if self.inicio else 0.0
+        feitos, erros = self.contadores[:]
+        taxa = feitos / decorrido if decorrido > 0 else 0.0
+        restante = (self.total - feitos) / taxa if taxa > 0 else None
+        return {
+            "feitos": feitos,
+            "total": self.total,
+            "erros": erros,
+            "pulados": self.pulados,
+            "por_segundo": taxa,
+            "restante_s": restante
+        }
+
+    def estatisticas(self):
+        # Soma dos contadores dos clientes de cada processo
+        total = defaultdict(int)
+        for estatisticas in self.estatisticas_processos:
+            for nome, valor in estatisticas.items():
+                total[nome] += valor
+        return {nome: total[nome] for nome in ("acertos", "faltas", "agrupadas")}
+
+    def parar(self):
+        self.parar_evento.set()
+
+    def concluidos_partes(self):
+        # Posições já resolvidas em execuções anteriores (mesmo CNPJ na mesma posição)
+        concluidos = set()
+        for arquivos in partes(self.pasta).values():
+            for arquivo in arquivos:
+                for indice, _, cnpj, registro in ler_parte(arquivo, 0):
+                    if registro.get("Status") in EscritorResultados.STATUS_FINAIS \
+                            and indice < len(self.cnpjs) and self.cnpjs[indice] == cnpj:
+                        concluidos.add(indice)
+        return concluidos
+
+    def dividir(self, concluidos):
+        # Blocos de até ITENS_POR_BLOCO CNPJs do mesmo prefixo, sem repetir
+        # CNPJ; os maiores primeiro para equilibrar os processos
+        shards, vistos = defaultdict(list), set()
+        for indice, cnpj in enumerate(self.cnpjs):
+            if cnpj in concluidos or cnpj in vistos:
+                continue
+            vistos.add(cnpj)
+            shards[shard(cnpj)].append((indice, cnpj))
+        blocos = [
+            (f"{nome}-{inicio // ITENS_POR_BLOCO}", itens[inicio:inicio + ITENS_POR_BLOCO])
+            for nome, itens in shards.items() for inicio in range(0, len(itens), ITENS_POR_BLOCO)
+        ]
+        return sorted(blocos, key=lambda item: -len(item[1]))
+
+    def executar(self):
+        self.inicio = time.monotonic()
+        if not self.retomar:
+            shutil.rmtree(self.pasta, ignore_errors=True)
+        os.makedirs(self.pasta, exist_ok=True)
+        escritor = EscritorResultados(self.saida, self.formato, self.retomar)
+        try:
+            for linha in self.invalidos:
+                if limpar_cnpj(linha) not in escritor.concluidos:
+                    escritor.escrever({"CNPJ": linha, "Status": "inválido"})
+            concluidos = self.concluidos_partes()
+            shards = self.dividir(escritor.concluidos)
+            pendentes = sum(1 for _, itens in shards for indice, _ in itens if indice not in concluidos)
+            self.total = pendentes
+            self.pulados = len(self.cnpjs) - pendentes
+            execucao = max(partes(self.pasta), default=0) + 1
+
+            fila = self.contexto.Queue()
+            fila.cancel_join_thread()  # Parado no meio, o que sobrou na fila é descartado
+            resumos = self.contexto.Queue()
+            for nome, itens in shards:
+                itens = [item for item in itens if item[0] not in concluidos]
+                if itens:
+                    fila.put((nome, itens))
+            processos = [
+                self.contexto.Process(
+                    target=trabalhador, name=f"lote-{numero}",
+                    args=(self.fabrica, self.limitadores, fila, self.contadores, self.parar_evento, self.pasta,
+                          execucao, self.workers, self.timeout, self.bruto, resumos)
+                )
+                for numero in range(min(self.processos, max(1, len(shards))))
+            ]
+            for _ in processos:
+                fila.put((None, None))
+            for processo in processos:
+                processo.start()
+            while any(p.is_alive() for p in processos):
+                self.receber(resumos)
+                for processo in processos:
+                    processo.join(INTERVALO_ESPERA / len(processos))
+            self.receber(resumos)
+
+            completo = not self.parar_evento.is_set() and all(p.exitcode == 0 for p in processos)
+            if completo:
+                self.intercalar(escritor)
+        finally:
+            escritor.fechar()
+        if completo:
+            shutil.rmtree(self.pasta, ignore_errors=True)
+        return self.progresso()
+
+    def receber(self, resumos):
+        while True:
+            try:
+                self.estatisticas_processos.append(resumos.get_nowait())
+            except queue.Empty:
+                return
+
+    def intercalar(self, escritor):
+        # Junta as partes de todas as execuções pela posição na entrada;
+        # de uma posição repetida (erro numa execução, repetida na seguinte)
+        # vale a da última execução
+        leitores = [ler_parte(arquivo, execucao) for execucao, arquivos in partes(self.pasta).items()
+                    for arquivo in arquivos]
+        anterior = None
+        for indice, _, cnpj, registro in heapq.merge(*leitores, key=lambda item: item[:2]):
+            if indice >= len(self.cnpjs) or self.cnpjs[indice] != cnpj:
+                continue  # Parte de uma entrada diferente da atual
+            if anterior is not None and anterior[0] != indice:
+                escritor.escrever(anterior[1])
+            anterior = (indice, registro)
+        if anterior is not None:
+            escritor.escrever(anterior[1])
@@ -0,0 +1,97 @@
+import itertools
+from functools import lru_cache
+
+# Projeções compiladas sobre o JSON da API. Em vez de quebrar "a.b.c" em
+# cada acesso, o esquema é convertido uma vez numa função Python gerada que
+# percorre o payload uma única vez: prefixos comuns ("company.name",
+# "company.nature.text", "company.equity") são resolvidos juntos.
+
+
+class Campo:
+    # Caminho no JSON, formatação opcional do valor encontrado e valor usado
+    # quando algum nível do caminho não existe
+    __slots__ = ("caminho", "formatar", "padrao")
+
+    def __init__(self, caminho, formatar=None, padrao=None):
+        self.caminho = caminho
+        self.formatar = formatar
+        self.padrao = padrao
+
+
+def compilar(caminhos, padroes=None, tupla=True):
+    # Gera `extrair(dados)`, que devolve a tupla com o valor de cada caminho
+    # (ou o valor direto, com tupla=False e um só caminho). Mesma semântica
+    # do get_nested_value: nível ausente ou que não é dict dá o padrão.
+    padroes = list(padroes) if padroes is not None else [None] * len(caminhos)
+    raiz = ([], {})
+    for i, caminho in enumerate(caminhos):
+        no = raiz
+        for chave in caminho.split('.') if caminho else ():
+            no = no[1].setdefault(chave, ([], {}))
+        no[0].append(i)
+
+    linhas = ["def extrair(v0):"]
+    for i in range(len(caminhos)):
+        linhas.append(f"    o{i} = _p{i}")
+    variaveis = itertools.count(1)
+
+    def gerar(no, var, nivel):
+        recuo = "    " * nivel
+        for i in no[0]:
+            linhas.append(f"{recuo}o{i} = {var}")
+        if no[1]:
+            linhas.append(f"{recuo}if isinstance({var}, dict):")
+            for chave, filho in no[1].items():
+                nova = f"v{next(variaveis)}"
+                linhas.append(f"{recuo}    if {chave!r} in {var}:")
+                linhas.append(f"{recuo}        {nova} = {var}[{chave!r}]")
+                gerar(filho, nova, nivel + 2)
+
+    gerar(raiz, "v0", 1)
+    if tupla:
+        linhas.append("    return (" + "".join(f"o{i}, " for i in range(len(caminhos))) + ")")
+    else:
+        linhas.append("    return o0")
+
+    namespace = {f"_p{i}": padrao for i, padrao in enumerate(padroes)}
+    exec(compile("\n".join(linhas), "<projecao>", "exec"), namespace)
+    return namespace["extrair"]
+
+
+@lru_cache(maxsize=1024)
+def acessor(caminho):
+    # Função compilada para um único caminho, reaproveitada entre chamadas
+    return compilar((caminho,), tupla=False)
+
+
+class Projecao:
+    # Esquema declarativo: nome da coluna -> caminho ("company.nature.text")
+    # ou Campo. A mesma projeção serve à aba de informações, à exportação em
+    # lote e ao texto copiado.
+    def __init__(self, campos):
+        self.campos = {nome: c if isinstance(c, Campo) else Campo(c) for nome, c in campos.items()}
+        self.nomes = list(self.campos)
+        self.indices = {nome: i for i, nome in enumerate(self.nomes)}
+        self.extrair = compilar(
+            [c.caminho for c in self.campos.values()], [c.padrao for c in self.campos.values()]
+        )
+        self.formatadores = [(i, c.formatar) for i, c in enumerate(self.campos.values()) if c.formatar]
+
+    def formatar(self, valores):
+        if not self.formatadores:
+            return valores
+        valores = list(valores)
+        for i, formatar in self.formatadores:
+            valores[i] = formatar(valores[i])
+        return tuple(valores)
+
+    def tupla(self, dados):
+        return self.formatar(self.extrair(dados))
+
+    def projetar(self, dados):
+        return dict(zip(self.nomes, self.tupla(dados)))
+
+    def linhas(self, itens):
+        # Uma tupla por item (sócios, inscrições...), na ordem do esquema
+        extrair, formatar = self.extrair, self.formatar
+        return [formatar(extrair(item)) for item in itens or ()]
@@ -0,0 +1,565 @@
+import re
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .cliente import LimitadorTaxa, tempo_retry_after, API_URL, LIMITE_POR_MINUTO, BACKOFF_BASE, BACKOFF_MAXIMO
+from .metricas import percentil
+from .receita import SITUACOES, PORTES, FAIXAS_ETARIAS, TIPOS_SOCIO
+from .validacao import limpar_cnpj
+
+# Várias APIs públicas de CNPJ atrás do mesmo cliente. Cada provedor tem o
+# próprio limite de taxa (as vazões se somam) e a própria saúde: depois de
+# FALHAS_SUSPENSAO falhas seguidas (rede, 429, 5xx) ele sai da escala por um
+# tempo que dobra a cada nova suspensão. Todas as respostas são convertidas
+# para o formato da CNPJa, o único que o resto do programa conhece.
+
+FALHAS_SUSPENSAO = 3
+SUSPENSAO_BASE = 30.0
+SUSPENSAO_MAXIMA = 600.0
+
+# Reforço (hedged request): se a resposta passar do p95 de latência do
+# provedor, a mesma consulta vai para outro que tenha ficha livre na hora, e
+# vale a primeira resposta conclusiva. Até juntar AMOSTRAS_MINIMAS latências
+# o limite é REFORCO_PADRAO.
+AMOSTRAS_LATENCIA = 200
+AMOSTRAS_MINIMAS = 20
+REFORCO_PADRAO = 2.0
+REFORCO_MINIMO = 0.1
+THREADS_REFORCO = 16
+
+# Espera máxima entre duas verificações de fichas (um provedor suspenso pode
+# voltar nesse meio tempo)
+ESPERA_MAXIMA = 1.0
+
+CODIGOS_SITUACAO = {texto: codigo for codigo, texto in SITUACOES.items()}
+SOCIOS_TIPO = {"PESSOA FÍSICA": "NATURAL", "PESSOA JURÍDICA": "LEGAL", "ESTRANGEIRO": "FOREIGN"}
+
+
+def so_digitos(valor):
+    return "".join(c for c in str(valor or "") if c.isdigit())
+
+
+def inteiro(valor):
+    digitos = so_digitos(valor)
+    return int(digitos) if digitos else None
+
+
+def decimal(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def data_iso(valor):
+    # "31/01/2005" -> "2005-01-31"; "2005-01-31" passa direto
+    valor = (valor or "").strip()
+    if len(valor) == 10 and valor[2] == valor[5] == "/":
+        return f"{valor[6:]}-{valor[3:5]}-{valor[:2]}"
+    return valor[:10] or None
+
+
+def codigo_texto(valor):
+    # "206-2 - Sociedade Empresária Limitada" -> (2062, "Sociedade Empresária Limitada")
+    if not valor:
+        return None, None
+    codigo, separador, texto = str(valor).partition(" - ")
+    if separador and so_digitos(codigo) == codigo.replace("-", "").replace(".", "").strip():
+        return inteiro(codigo), texto.strip()
+    return None, str(valor).strip()
+
+
+def situacao(codigo=None, texto=None):
+    if codigo in SITUACOES:
+        return {"id": codigo, "text": SITUACOES[codigo]}
+    texto = (texto or "").strip().capitalize() or None
+    return {"id": CODIGOS_SITUACAO.get(texto), "text": texto}
+
+
+def porte(codigo=None, texto=None):
+    # Mesmos códigos e textos da base local (receita.PORTES)
+    codigo = inteiro(codigo)
+    if codigo is None and texto:
+        chave = texto.strip().upper()
+        codigo = next((c for c, (sigla, descricao) in PORTES.items()
+                       if chave in (sigla, descricao.upper(), descricao.upper().replace(" ", ""))), None)
+    if codigo not in PORTES:
+        return {"id": None, "acronym": None, "text": texto} if texto else None
+    sigla, descricao = PORTES[codigo]
+    return {"id": codigo, "acronym": sigla, "text": descricao}
+
+
+def faixa_etaria(codigo=None, texto=None):
+    # "Entre 31 a 40 anos" -> "31-40", no formato da CNPJa
+    if inteiro(codigo) in FAIXAS_ETARIAS:
+        return FAIXAS_ETARIAS[inteiro(codigo)]
+    numeros = re.findall(r"\d+", texto or "")
+    if len(numeros) == 2:
+        return f"{numeros[0]}-{numeros[1]}"
+    if len(numeros) == 1:
+        return f"{numeros[0]}+"
+    return None
+
+
+def telefones(*numeros):
+    # "(11) 2385-1939", "1123851939" -> {"area": "11", "number": "23851939"}
+    resultado = []
+    for numero in numeros:
+        for parte in str(numero or "").split("/"):
+            digitos = so_digitos(parte)
+            if len(digitos) >= 10:
+                resultado.append({"area": digitos[:2], "number": digitos[2:]})
+    return resultado
+
+
+def atividade(codigo, texto):
+    codigo = inteiro(codigo)
+    return {"id": codigo, "text": texto} if codigo else None
+
+
+def opcao(optante, desde):
+    if optante is None:
+        return None
+    return {"optant": bool(optante), "since": data_iso(desde)}
+
+
+class Provedor:
+    # Uma API de consulta. Subclasses definem a URL, o limite público e a
+    # conversão da resposta (normalizar); a saúde é acompanhada aqui.
+    nome = None
+    titulo = None
+    url = None
+    limite_por_minuto = LIMITE_POR_MINUTO
+    # Envia If-None-Match/If-Modified-Since (a API responde 304)
+    condicional = False
+    # Aceita o CNPJ alfanumérico
+    alfanumerico = False
+
+    def __init__(self, url=None, limitador=None, limite=None, nome=None, titulo=None):
+        self.url = url or self.url
+        self.nome = nome or self.nome
+        self.titulo = titulo or self.titulo or self.nome
+        self.limitador = limitador or LimitadorTaxa(limite or self.limite_por_minuto)
+        self.ativo = True
+        self.lock = threading.Lock()
+        self.latencias = deque(maxlen=AMOSTRAS_LATENCIA)
+        self.falhas = 0
+        self.suspensoes = 0
+        self.suspenso_ate = 0.0
+
+    def endereco(self, cnpj):
+        return self.url.format(cnpj=cnpj)
+
+    def aceita(self, cnpj):
+        return self.ativo and (self.alfanumerico or cnpj.isdigit())
+
+    def ler(self, response):
+        # (status, empresa) de uma resposta 200
+        return 200, self.normalizar(response.json())
+
+    def normalizar(self, dados):
+        return dados
+
+    def suspenso(self, agora=None):
+        return (agora or time.monotonic()) < self.suspenso_ate
+
+    def sucesso(self, segundos):
+        with self.lock:
+            self.latencias.append(segundos)
+            self.falhas = 0
+            self.suspensoes = 0
+
+    def falha(self, response=None):
+        if response is not None and response.status_code == 429:
+            # Segura este provedor pelo tempo pedido; os outros seguem
+            retry_after = tempo_retry_after(response)
+            self.limitador.penalizar(min(BACKOFF_MAXIMO, retry_after if retry_after is not None else BACKOFF_BASE))
+        with self.lock:
+            self.falhas += 1
+            if self.falhas >= FALHAS_SUSPENSAO:
+                self.suspenso_ate = time.monotonic() + min(SUSPENSAO_MAXIMA, SUSPENSAO_BASE * 2 ** self.suspensoes)
+                self.suspensoes += 1
+                self.falhas = 0
+
+    def limiar_reforco(self):
+        with self.lock:
+            if len(self.latencias) < AMOSTRAS_MINIMAS:
+                return REFORCO_PADRAO
+            return max(REFORCO_MINIMO, percentil(sorted(self.latencias), 95))
+
+    def estado(self):
+        agora = time.monotonic()
+        with self.lock:
+            ordenadas = sorted(self.latencias)
+        return {
+            "provedor": self.nome,
+            "ativo": self.ativo,
+            "suspenso_s": round(max(0.0, self.suspenso_ate - agora), 1),
+            "fichas": round(self.limitador.disponiveis(), 1),
+            "p50_ms": round(percentil(ordenadas, 50) * 1000, 1) if ordenadas else None,
+            "p95_ms": round(percentil(ordenadas, 95) * 1000, 1) if ordenadas else None,
+        }
+
+
+class ProvedorCNPJa(Provedor):
+    # open.cnpja.com: já responde no formato usado pelo programa
+    nome = "cnpja"
+    titulo = "CNPJá"
+    url = API_URL
+    condicional = True
+    alfanumerico = True
+
+
+class ProvedorBrasilAPI(Provedor):
+    # brasilapi.com.br (espelho dos dados abertos da Receita; sem inscrições estaduais)
+    nome = "brasilapi"
+    titulo = "BrasilAPI"
+    url = "https://brasilapi.com.br/api/cnpj/v1/{cnpj}"
+    limite_por_minuto = 20
+
+    def normalizar(self, d):
+        cnpj = limpar_cnpj(d.get("cnpj") or "")
+        motivo = inteiro(d.get("motivo_situacao_cadastral"))
+        natureza_codigo, natureza = codigo_texto(d.get("natureza_juridica"))
+        return {
+            "taxId": cnpj,
+            "alias": d.get("nome_fantasia") or None,
+            "founded": data_iso(d.get("data_inicio_atividade")),
+            "head": d.get("identificador_matriz_filial") == 1,
+            "statusDate": data_iso(d.get("data_situacao_cadastral")),
+            "status": situacao(inteiro(d.get("situacao_cadastral")), d.get("descricao_situacao_cadastral")),
+            "reason": {"id": motivo, "text": d.get("descricao_motivo_situacao_cadastral")} if motivo else None,
+            "company": {
+                "id": inteiro(cnpj[:8]),
+                "name": d.get("razao_social"),
+                "equity": decimal(d.get("capital_social")),
+                "nature": {"id": inteiro(d.get("codigo_natureza_juridica")) or natureza_codigo, "text": natureza},
+                "size": porte(d.get("codigo_porte"), d.get("porte")),
+                "simples": opcao(d.get("opcao_pelo_simples"), d.get("data_opcao_pelo_simples")),
+                "simei": opcao(d.get("opcao_pelo_mei"), d.get("data_opcao_pelo_mei")),
+                "members": [
+                    {
+                        "since": data_iso(s.get("data_entrada_sociedade")),
+                        "person": {
+                            "type": TIPOS_SOCIO.get(inteiro(s.get("identificador_de_socio"))),
+                            "name": s.get("nome_socio"),
+                            "taxId": s.get("cnpj_cpf_do_socio") or None,
+                            "age": faixa_etaria(s.get("codigo_faixa_etaria"), s.get("faixa_etaria"))
+                        },
+                        "role": {"id": inteiro(s.get("codigo_qualificacao_socio")), "text": s.get("qualificacao_socio")}
+                    }
+                    for s in d.get("qsa") or []
+                ]
+            },
+            "address": {
+                "municipality": inteiro(d.get("codigo_municipio_ibge")),
+                "street": " ".join(p for p in (d.get("descricao_tipo_de_logradouro"), d.get("logradouro")) if p) or None,
+                "number": d.get("numero"),
+                "details": d.get("complemento") or None,
+                "district": d.get("bairro"),
+                "city": d.get("municipio"),
+                "state": d.get("uf"),
+                "zip": so_digitos(d.get("cep")) or None
+            },
+            "phones": telefones(d.get("ddd_telefone_1"), d.get("ddd_telefone_2")),
+            "emails": [{"address": d["email"]}] if d.get("email") else [],
+            "mainActivity": atividade(d.get("cnae_fiscal"), d.get("cnae_fiscal_descricao")),
+            "sideActivities": [
+                a for a in (atividade(c.get("codigo"), c.get("descricao")) for c in d.get("cnaes_secundarios") or []) if a
+            ],
+            "registrations": []
+        }
+
+
+class ProvedorReceitaWS(Provedor):
+    # receitaws.com.br (plano público: 3 consultas por minuto). Erros vêm
+    # com status 200 e {"status": "ERROR", "message": ...}.
+    nome = "receitaws"
+    titulo = "ReceitaWS"
+    url = "https://receitaws.com.br/v1/cnpj/{cnpj}"
+    limite_por_minuto = 3
+
+    def ler(self, response):
+        dados = response.json()
+        if dados.get("status") == "ERROR":
+            return (400 if "inválido" in (dados.get("message") or "").lower() else 404), None
+        return 200, self.normalizar(dados)
+
+    def normalizar(self, d):
+        cnpj = limpar_cnpj(d.get("cnpj") or "")
+        natureza_codigo, natureza = codigo_texto(d.get("natureza_juridica"))
+        principal = (d.get("atividade_principal") or [{}])[0]
+        return {
+            "taxId": cnpj,
+            "alias": d.get("fantasia") or None,
+            "founded": data_iso(d.get("abertura")),
+            "head": (d.get("tipo") or "").upper() == "MATRIZ",
+            "statusDate": data_iso(d.get("data_situacao")),
+            "status": situacao(texto=d.get("situacao")),
+            "reason": {"id": None, "text": d["motivo_situacao"]} if d.get("motivo_situacao") else None,
+            "company": {
+                "id": inteiro(cnpj[:8]),
+                "name": d.get("nome"),
+                "equity": decimal(d.get("capital_social")),
+                "nature": {"id": natureza_codigo, "text": natureza},
+                "size": porte(texto=d.get("porte")),
+                "simples": opcao((d.get("simples") or {}).get("optante"), (d.get("simples") or {}).get("data_opcao")),
+                "simei": opcao((d.get("simei") or {}).get("optante"), (d.get("simei") or {}).get("data_opcao")),
+                "members": [
+                    {
+                        "since": None,
+                        "person": {"type": None, "name": s.get("nome"), "taxId": None, "age": None},
+                        "role": dict(zip(("id", "text"), codigo_texto(s.get("qual", "").replace("-", " - ", 1))))
+                    }
+                    for s in d.get("qsa") or []
+                ]
+            },
+            "address": {
+                "municipality": None,
+                "street": d.get("logradouro"),
+                "number": d.get("numero"),
+                "details": d.get("complemento") or None,
+                "district": d.get("bairro"),
+                "city": d.get("municipio"),
+                "state": d.get("uf"),
+                "zip": so_digitos(d.get("cep")) or None
+            },
+            "phones": telefones(d.get("telefone")),
+            "emails": [{"address": d["email"]}] if d.get("email") else [],
+            "mainActivity": atividade(principal.get("code"), principal.get("text")),
+            "sideActivities": [
+                a for a in (atividade(c.get("code"), c.get("text")) for c in d.get("atividades_secundarias") or []) if a
+            ],
+            "registrations": []
+        }
+
+
+class ProvedorCNPJws(Provedor):
+    # publica.cnpj.ws (API pública: 3 consultas por minuto); traz as inscrições estaduais
+    nome = "cnpjws"
+    titulo = "CNPJ.ws"
+    url = "https://publica.cnpj.ws/cnpj/{cnpj}"
+    limite_por_minuto = 3
+
+    def normalizar(self, d):
+        e = d.get("estabelecimento") or {}
+        cnpj = limpar_cnpj(e.get("cnpj") or "")
+        natureza = d.get("natureza_juridica") or {}
+        simples = d.get("simples") or {}
+        motivo = e.get("motivo_situacao_cadastral") or {}
+        principal = e.get("atividade_principal") or {}
+        return {
+            "taxId": cnpj,
+            "alias": e.get("nome_fantasia") or None,
+            "founded": data_iso(e.get("data_inicio_atividade")),
+            "head": (e.get("tipo") or "").upper() == "MATRIZ",
+            "statusDate": data_iso(e.get("data_situacao_cadastral")),
+            "status": situacao(texto=e.get("situacao_cadastral")),
+            "reason": {"id": inteiro(motivo.get("id")), "text": motivo.get("descricao")} if motivo else None,
+            "company": {
+                "id": inteiro(d.get("cnpj_raiz")),
+                "name": d.get("razao_social"),
+                "equity": decimal(d.get("capital_social")),
+                "nature": {"id": inteiro(natureza.get("id")), "text": natureza.get("descricao")},
+                "size": porte((d.get("porte") or {}).get("id"), (d.get("porte") or {}).get("descricao")),
+                "simples": opcao(simples.get("simples") == "Sim", simples.get("data_opcao_simples")) if simples else None,
+                "simei": opcao(simples.get("mei") == "Sim", simples.get("data_opcao_mei")) if simples else None,
+                "members": [
+                    {
+                        "since": data_iso(s.get("data_entrada")),
+                        "person": {
+                            "type": SOCIOS_TIPO.get((s.get("tipo") or "").upper()),
+                            "name": s.get("nome"),
+                            "taxId": s.get("cpf_cnpj_socio") or None,
+                            "age": faixa_etaria(texto=s.get("faixa_etaria"))
+                        },
+                        "role": {
+                            "id": inteiro((s.get("qualificacao_socio") or {}).get("id")),
+                            "text": (s.get("qualificacao_socio") or {}).get("descricao")
+                        }
+                    }
+                    for s in d.get("socios") or []
+                ]
+            },
+            "address": {
+                "municipality": inteiro((e.get("cidade") or {}).get("ibge_id")),
+                "street": " ".join(p for p in (e.get("tipo_logradouro"), e.get("logradouro")) if p) or None,
+                "number": e.get("numero"),
+                "details": e.get("complemento") or None,
+                "district": e.get("bairro"),
+                "city": (e.get("cidade") or {}).get("nome"),
+                "state": (e.get("estado") or {}).get("sigla"),
+                "zip": so_digitos(e.get("cep")) or None
+            },
+            "phones": telefones(
+                (e.get("ddd1") or "") + (e.get("telefone1") or ""), (e.get("ddd2") or "") + (e.get("telefone2") or "")
+            ),
+            "emails": [{"address": e["email"]}] if e.get("email") else [],
+            "mainActivity": atividade(principal.get("id") or principal.get("subclasse"), principal.get("descricao")),
+            "sideActivities": [
+                a for a in (
+                    atividade(c.get("id") or c.get("subclasse"), c.get("descricao"))
+                    for c in e.get("atividades_secundarias") or []
+                ) if a
+            ],
+            "registrations": [
+                {
+                    "number": i.get("inscricao_estadual"),
+                    "state": (i.get("estado") or {}).get("sigla"),
+                    "enabled": bool(i.get("ativo")),
+                    "statusDate": data_iso(i.get("atualizado_em")),
+                    "status": {"id": None, "text": "Ativa" if i.get("ativo") else "Inativa"},
+                    "type": None
+                }
+                for i in e.get("inscricoes_estaduais") or []
+            ]
+        }
+
+
+PROVEDORES = {p.nome: p for p in (ProvedorCNPJa, ProvedorBrasilAPI, ProvedorReceitaWS, ProvedorCNPJws)}
+
+# Padrão: só a CNPJá (dados mais completos). Os demais provedores recebem
+# os CNPJs consultados, então só entram quando o usuário os escolhe.
+PROVEDORES_PADRAO = (ProvedorCNPJa.nome,)
+
+
+def criar_provedores(nomes, limitador=None, limitadores=None):
+    # A CNPJá usa o `limitador` informado (o limite configurado pelo usuário);
+    # as demais, o limite público de cada uma. `limitadores` (nome ->
+    # limitador) substitui os dois, como no lote em vários processos.
+    limitadores = limitadores or {}
+    return [
+        PROVEDORES[nome](limitador=limitadores.get(nome) or (limitador if nome == ProvedorCNPJa.nome else None))
+        for nome in nomes
+    ]
+
+
+class Agendador:
+    # Escolhe o provedor de cada requisição: o primeiro da lista, ativo e
+    # não suspenso, que tenha ficha livre; se nenhum tiver, espera pela
+    # primeira ficha de qualquer um. Com todos suspensos, volta a tentar
+    # todos (melhor que parar de vez).
+    def __init__(self, provedores, reforco=True, metricas=None):
+        self.provedores = list(provedores)
+        self.reforco = reforco
+        self.metricas = metricas
+        self.executor = None
+        self.executor_lock = threading.Lock()
+
+    @property
+    def principal(self):
+        return self.provedores[0]
+
+    def provedor(self, nome):
+        for p in self.provedores:
+            if p.nome == nome:
+                return p
+        return None
+
+    def candidatos(self, cnpj, excluir=(), principal=False):
+        provedores = self.provedores[:1] if principal else self.provedores
+        aceitos = [p for p in provedores if p.aceita(cnpj) and p not in excluir]
+        agora = time.monotonic()
+        saudaveis = [p for p in aceitos if not p.suspenso(agora)]
+        return saudaveis or sorted(aceitos, key=lambda p: p.suspenso_ate)
+
+    def reservar(self, cnpj, parar=None, reserva=None, evitar=None, principal=False):
+        # Provedor com uma ficha já retirada; `evitar` (o que acabou de
+        # falhar) fica por último. Com `reserva` (antecipação), não espera:
+        # só usa fichas que sobrem além da reserva de cada um. Um CNPJ que
+        # nenhum provedor ativo aceita (alfanumérico, por exemplo) é válido:
+        # LookupError, não ValueError, para não ser tratado como inválido.
+        while True:
+            candidatos = sorted(self.candidatos(cnpj, principal=principal), key=lambda p: p is evitar)
+            if not candidatos:
+                raise LookupError("Nenhum provedor ativo aceita este CNPJ")
+            for p in candidatos:
+                if p.limitador.tentar(reserva or 0):
+                    return p
+            if reserva is not None:
+                raise InterruptedError("Sem fichas livres para antecipar")
+            espera = min(ESPERA_MAXIMA, min(p.limitador.espera() for p in candidatos))
+            if parar is not None:
+                if parar.wait(espera):
+                    raise InterruptedError("Consulta interrompida")
+            else:
+                time.sleep(espera)
+
+    def alternativa(self, cnpj, excluir):
+        # Outro provedor saudável para a próxima tentativa (sem backoff)
+        agora = time.monotonic()
+        return any(not p.suspenso(agora) for p in self.candidatos(cnpj, excluir=(excluir,)))
+
+    def executar(self, provedor, requisicao):
+        inicio = time.perf_counter()
+        try:
+            response = requisicao(provedor)
+        except Exception:
+            provedor.falha()
+            raise
+        segundos = time.perf_counter() - inicio
+        if self.metricas is not None:
+            self.metricas.registrar("requisicao", segundos, provedor=provedor.nome)
+        if response.status_code == 429 or response.status_code >= 500:
+            provedor.falha(response)
+        else:
+            provedor.sucesso(segundos)
+        return response
+
+    @staticmethod
+    def conclusiva(response):
+        return response.status_code != 429 and response.status_code < 500
+
+    def requisitar(self, cnpj, provedor, requisicao, parar=None, reforco=True):
+        # Devolve (provedor, response). `requisicao(provedor)` faz o GET.
+        # Sem reforço roda na própria thread; com reforço, as duas
+        # requisições rodam no executor e a perdedora termina sozinha (a
+        # resposta dela só conta para a saúde do provedor).
+        if not (reforco and self.reforco) or len(self.provedores) < 2:
+            return provedor, self.executar(provedor, requisicao)
+
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=THREADS_REFORCO, thread_name_prefix="provedor")
+        futuros = {self.executor.submit(self.executar, provedor, requisicao): provedor}
+        limite = time.monotonic() + provedor.limiar_reforco()
+        reforcado = False
+        ultima = None
+        while futuros:
+            restante = limite - time.monotonic() if not reforcado else ESPERA_MAXIMA
+            prontos, _ = wait(futuros, timeout=max(0.0, min(0.1, restante)), return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                p = futuros.pop(futuro)
+                try:
+                    response = futuro.result()
+                except Exception as e:
+                    ultima = (p, e)
+                    continue
+                if self.conclusiva(response):
+                    if p is not provedor and self.metricas is not None:
+                        self.metricas.contar("reforcos_vencedores")
+                    return p, response
+                ultima = (p, response)
+            if parar is not None and parar.is_set():
+                raise InterruptedError("Consulta interrompida")
+            if futuros and not reforcado and time.monotonic() >= limite:
+                reforcado = True
+                segundo = next((p for p in self.candidatos(cnpj, excluir=(provedor,)) if p.limitador.tentar()), None)
+                if segundo is not None:
+                    if self.metricas is not None:
+                        self.metricas.contar("reforcos")
+                    futuros[self.executor.submit(self.executar, segundo, requisicao)] = segundo
+
+        p, resultado = ultima
+        if isinstance(resultado, Exception):
+            raise resultado
+        return p, resultado
+
+    def estado(self):
+        return [p.estado() for p in self.provedores]
+
+    def fechar(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
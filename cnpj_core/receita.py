@@ -0,0 +1,436 @@
+import io
+import os
+import csv
+import sys
+import time
+import sqlite3
+import zipfile
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .caminhos import caminho_base_receita
+from .validacao import limpar_cnpj
+
+# Importação dos dados abertos do CNPJ da Receita Federal
+# (https://dadosabertos.rfb.gov.br/CNPJ/). Os arquivos são CSV sem cabeçalho,
+# separados por ";" e em latin-1, normalmente dentro de zips.
+LINHAS_POR_LOTE = 20000
+ENCODING_RECEITA = "latin-1"
+
+# Prefixo do nome do zip -> tipo; sufixo do CSV extraído -> tipo
+TIPOS_ZIP = [
+    ("estabelecimentos", "estabelecimentos"),
+    ("empresas", "empresas"),
+    ("socios", "socios"),
+    ("simples", "simples"),
+    ("cnaes", "cnaes"),
+    ("municipios", "municipios"),
+    ("naturezas", "naturezas"),
+    ("qualificacoes", "qualificacoes"),
+    ("motivos", "motivos"),
+    ("paises", "paises"),
+]
+TIPOS_CSV = [
+    ("ESTABELE", "estabelecimentos"),
+    ("EMPRECSV", "empresas"),
+    ("SOCIOCSV", "socios"),
+    ("SIMPLES", "simples"),
+    ("CNAECSV", "cnaes"),
+    ("MUNICCSV", "municipios"),
+    ("NATJUCSV", "naturezas"),
+    ("QUALSCSV", "qualificacoes"),
+    ("MOTICSV", "motivos"),
+    ("PAISCSV", "paises"),
+]
+DOMINIOS = ("cnaes", "municipios", "naturezas", "qualificacoes", "motivos", "paises")
+
+# Ordem de junção das partes na base principal
+ORDEM_TIPOS = DOMINIOS + ("empresas", "estabelecimentos", "simples", "socios")
+
+ESQUEMA = [
+    "CREATE TABLE IF NOT EXISTS empresas ("
+    "cnpj_basico TEXT PRIMARY KEY, razao_social TEXT, natureza INTEGER, "
+    "capital REAL, porte INTEGER) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS estabelecimentos ("
+    "cnpj TEXT PRIMARY KEY, cnpj_basico TEXT NOT NULL, matriz INTEGER, fantasia TEXT, "
+    "situacao INTEGER, data_situacao TEXT, motivo INTEGER, data_inicio TEXT, "
+    "cnae_principal INTEGER, cnaes_secundarios TEXT, tipo_logradouro TEXT, logradouro TEXT, "
+    "numero TEXT, complemento TEXT, bairro TEXT, cep TEXT, uf TEXT, municipio INTEGER, "
+    "ddd1 TEXT, telefone1 TEXT, ddd2 TEXT, telefone2 TEXT, email TEXT) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS socios ("
+    "cnpj_basico TEXT NOT NULL, tipo INTEGER, nome TEXT, documento TEXT, "
+    "qualificacao INTEGER, data_entrada TEXT, faixa_etaria INTEGER)",
+    "CREATE TABLE IF NOT EXISTS simples ("
+    "cnpj_basico TEXT PRIMARY KEY, opcao_simples TEXT, data_opcao_simples TEXT, "
+    "data_exclusao_simples TEXT, opcao_mei TEXT, data_opcao_mei TEXT, "
+    "data_exclusao_mei TEXT) WITHOUT ROWID",
+] + [
+    f"CREATE TABLE IF NOT EXISTS {tabela} (codigo INTEGER PRIMARY KEY, descricao TEXT)"
+    for tabela in DOMINIOS
+]
+INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_estabelecimentos_basico ON estabelecimentos(cnpj_basico)",
+    "CREATE INDEX IF NOT EXISTS idx_socios_basico ON socios(cnpj_basico)",
+    "CREATE TABLE IF NOT EXISTS arquivos ("
+    "nome TEXT PRIMARY KEY, tamanho INTEGER, modificado REAL, importado_em TEXT)",
+]
+
+COLUNAS = {
+    "empresas": 5,
+    "estabelecimentos": 23,
+    "socios": 7,
+    "simples": 7,
+}
+
+SITUACOES = {1: "Nula", 2: "Ativa", 3: "Suspensa", 4: "Inapta", 8: "Baixada"}
+PORTES = {
+    0: (None, "Não Informado"),
+    1: ("ME", "Micro Empresa"),
+    3: ("EPP", "Empresa de Pequeno Porte"),
+    5: ("DEMAIS", "Demais"),
+}
+FAIXAS_ETARIAS = {
+    1: "0-12", 2: "13-20", 3: "21-30", 4: "31-40", 5: "41-50",
+    6: "51-60", 7: "61-70", 8: "71-80", 9: "81+",
+}
+TIPOS_SOCIO = {1: "LEGAL", 2: "NATURAL", 3: "FOREIGN"}
+
+
+def tipo_arquivo(nome):
+    base = os.path.basename(nome)
+    minusculo = base.lower()
+    for prefixo, tipo in TIPOS_ZIP:
+        if minusculo.startswith(prefixo):
+            return tipo
+    maiusculo = base.upper()
+    for sufixo, tipo in TIPOS_CSV:
+        if sufixo in maiusculo:
+            return tipo
+    return None
+
+
+def inteiro(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def data_iso(valor):
+    # "20050131" -> "2005-01-31"; "0", "00000000" e vazio viram None
+    valor = (valor or "").strip()
+    if len(valor) != 8 or valor == "00000000":
+        return None
+    return f"{valor[0:4]}-{valor[4:6]}-{valor[6:8]}"
+
+
+def texto(valor):
+    valor = (valor or "").strip()
+    return valor or None
+
+
+def converter_linha(tipo, linha):
+    if tipo in DOMINIOS:
+        return (inteiro(linha[0]), texto(linha[1]))
+    if tipo == "empresas":
+        capital = (linha[4] or "0").replace(".", "").replace(",", ".")
+        try:
+            capital = float(capital)
+        except ValueError:
+            capital = None
+        return (linha[0], texto(linha[1]), inteiro(linha[2]), capital, inteiro(linha[5]))
+    if tipo == "estabelecimentos":
+        return (
+            linha[0] + linha[1] + linha[2], linha[0], inteiro(linha[3]), texto(linha[4]),
+            inteiro(linha[5]), data_iso(linha[6]), inteiro(linha[7]), data_iso(linha[10]),
+            inteiro(linha[11]), texto(linha[12]), texto(linha[13]), texto(linha[14]),
+            texto(linha[15]), texto(linha[16]), texto(linha[17]), texto(linha[18]), texto(linha[19]),
+            inteiro(linha[20]), texto(linha[21]), texto(linha[22]), texto(linha[23]), texto(linha[24]),
+            texto(linha[27]).lower() if texto(linha[27]) else None
+        )
+    if tipo == "socios":
+        return (
+            linha[0], inteiro(linha[1]), texto(linha[2]), texto(linha[3]),
+            inteiro(linha[4]), data_iso(linha[5]), inteiro(linha[10])
+        )
+    if tipo == "simples":
+        return (
+            linha[0], texto(linha[1]), data_iso(linha[2]), data_iso(linha[3]),
+            texto(linha[4]), data_iso(linha[5]), data_iso(linha[6])
+        )
+    raise ValueError(f"Tipo de arquivo desconhecido: {tipo}")
+
+
+def abrir_linhas(caminho):
+    # Gera as linhas de todos os CSVs de um zip (ou de um CSV solto) sem
+    # carregar o arquivo na memória
+    if zipfile.is_zipfile(caminho):
+        with zipfile.ZipFile(caminho) as arquivo_zip:
+            for membro in arquivo_zip.infolist():
+                if membro.is_dir():
+                    continue
+                with arquivo_zip.open(membro) as bruto:
+                    leitor = io.TextIOWrapper(bruto, encoding=ENCODING_RECEITA, newline="")
+                    yield from csv.reader(leitor, delimiter=";", quotechar='"')
+    else:
+        with open(caminho, "r", encoding=ENCODING_RECEITA, newline="") as f:
+            yield from csv.reader(f, delimiter=";", quotechar='"')
+
+
+def criar_esquema(conn, indices=True):
+    for comando in ESQUEMA:
+        conn.execute(comando)
+    if indices:
+        for comando in INDICES:
+            conn.execute(comando)
+
+
+def importar_parte(caminho, tipo, pasta_partes):
+    # Executado em outro processo: grava o arquivo numa base SQLite própria
+    # (sem índices secundários), juntada depois na base principal
+    destino = os.path.join(pasta_partes, f"{tipo}_{os.getpid()}_{time.monotonic_ns()}.db")
+    conn = sqlite3.connect(destino)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    criar_esquema(conn, indices=False)
+
+    colunas = 2 if tipo in DOMINIOS else COLUNAS[tipo]
+    sql = f"INSERT OR REPLACE INTO {tipo} VALUES ({', '.join('?' * colunas)})"
+    lote, total, ignoradas = [], 0, 0
+    for linha in abrir_linhas(caminho):
+        try:
+            lote.append(converter_linha(tipo, linha))
+        except (IndexError, ValueError):
+            ignoradas += 1
+            continue
+        if len(lote) >= LINHAS_POR_LOTE:
+            conn.executemany(sql, lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        conn.executemany(sql, lote)
+        total += len(lote)
+    conn.commit()
+    conn.close()
+    return destino, tipo, total, ignoradas
+
+
+def juntar_partes(conn, partes):
+    # Sócios não têm chave natural: antes de inserir, apaga os sócios atuais
+    # de todas as empresas que aparecem nos arquivos novos
+    partes = sorted(partes, key=lambda p: ORDEM_TIPOS.index(p[1]))
+    for fase in ("apagar", "inserir"):
+        for caminho, tipo in partes:
+            if fase == "apagar" and tipo != "socios":
+                continue
+            conn.execute("ATTACH DATABASE ? AS parte", (caminho,))
+            try:
+                with conn:
+                    if fase == "apagar":
+                        conn.execute(
+                            "DELETE FROM main.socios WHERE cnpj_basico IN "
+                            "(SELECT DISTINCT cnpj_basico FROM parte.socios)"
+                        )
+                    elif tipo == "socios":
+                        conn.execute("INSERT INTO main.socios SELECT * FROM parte.socios")
+                    else:
+                        conn.execute(f"INSERT OR REPLACE INTO main.{tipo} SELECT * FROM parte.{tipo}")
+            finally:
+                conn.execute("DETACH DATABASE parte")
+    for caminho, _ in partes:
+        os.remove(caminho)
+
+
+def listar_arquivos(pasta):
+    arquivos = []
+    for nome in sorted(os.listdir(pasta)):
+        caminho = os.path.join(pasta, nome)
+        tipo = tipo_arquivo(nome)
+        if tipo and os.path.isfile(caminho):
+            arquivos.append((caminho, tipo))
+    return arquivos
+
+
+def importar(pasta, destino=None, workers=None, completo=False, ao_progresso=print):
+    # Importa (ou atualiza) a base local a partir de uma pasta com os arquivos
+    # da Receita. Arquivos já importados com mesmo tamanho e data são pulados,
+    # o que permite atualizar mês a mês só com os arquivos que mudaram.
+    destino = destino or caminho_base_receita()
+    if completo and os.path.exists(destino):
+        os.remove(destino)
+    os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+
+    conn = sqlite3.connect(destino)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    criar_esquema(conn)
+
+    pendentes = []
+    for caminho, tipo in listar_arquivos(pasta):
+        info = os.stat(caminho)
+        anterior = conn.execute(
+            "SELECT tamanho, modificado FROM arquivos WHERE nome = ?", (os.path.basename(caminho),)
+        ).fetchone()
+        if anterior == (info.st_size, info.st_mtime):
+            ao_progresso(f"Sem alterações: {os.path.basename(caminho)}")
+            continue
+        pendentes.append((caminho, tipo, info))
+
+    if not pendentes:
+        conn.close()
+        return 0
+
+    total = 0
+    with tempfile.TemporaryDirectory(prefix="cnpj_receita_", dir=os.path.dirname(os.path.abspath(destino))) as pasta_partes:
+        partes = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futuros = {
+                executor.submit(importar_parte, caminho, tipo, pasta_partes): (caminho, info)
+                for caminho, tipo, info in pendentes
+            }
+            for futuro in as_completed(futuros):
+                caminho, info = futuros[futuro]
+                parte, tipo, linhas, ignoradas = futuro.result()
+                partes.append((parte, tipo))
+                total += linhas
+                aviso = f" ({ignoradas} linhas inválidas)" if ignoradas else ""
+                ao_progresso(f"Lido: {os.path.basename(caminho)} - {linhas} linhas{aviso}")
+
+        ao_progresso("Juntando na base local...")
+        juntar_partes(conn, partes)
+
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO arquivos (nome, tamanho, modificado, importado_em) VALUES (?, ?, ?, ?)",
+            [(os.path.basename(c), i.st_size, i.st_mtime, datetime.now().isoformat(timespec="seconds"))
+             for c, _, i in pendentes]
+        )
+    conn.execute("PRAGMA optimize")
+    conn.close()
+    return total
+
+
+class BaseReceita:
+    # Leitura da base local, devolvendo o mesmo formato de dicionário da API
+    # open.cnpja.com (o usado pelas abas da interface e pelo cache).
+    # Uma conexão somente leitura por thread.
+    def __init__(self, caminho=None):
+        self.caminho = caminho or caminho_base_receita()
+        if not os.path.exists(self.caminho):
+            raise FileNotFoundError(self.caminho)
+        self.local = threading.local()
+
+    def conexao(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            uri = "file:" + self.caminho.replace("\\", "/") + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True)
+            conn.row_factory = sqlite3.Row
+            self.local.conn = conn
+        return conn
+
+    def descricao(self, tabela, codigo):
+        if codigo is None:
+            return None
+        linha = self.conexao().execute(f"SELECT descricao FROM {tabela} WHERE codigo = ?", (codigo,)).fetchone()
+        return linha["descricao"] if linha else None
+
+    def obter(self, cnpj):
+        cnpj = limpar_cnpj(cnpj)
+        conn = self.conexao()
+        est = conn.execute("SELECT * FROM estabelecimentos WHERE cnpj = ?", (cnpj,)).fetchone()
+        if est is None:
+            return None
+        emp = conn.execute("SELECT * FROM empresas WHERE cnpj_basico = ?", (est["cnpj_basico"],)).fetchone()
+        simples = conn.execute("SELECT * FROM simples WHERE cnpj_basico = ?", (est["cnpj_basico"],)).fetchone()
+        socios = conn.execute("SELECT * FROM socios WHERE cnpj_basico = ?", (est["cnpj_basico"],)).fetchall()
+
+        sigla, porte = PORTES.get(emp["porte"] if emp else None, (None, None))
+        logradouro = " ".join(p for p in (est["tipo_logradouro"], est["logradouro"]) if p)
+        telefones = [
+            {"area": ddd, "number": numero}
+            for ddd, numero in ((est["ddd1"], est["telefone1"]), (est["ddd2"], est["telefone2"]))
+            if numero
+        ]
+        secundarias = [inteiro(c) for c in (est["cnaes_secundarios"] or "").split(",") if c.strip()]
+
+        return {
+            "taxId": cnpj,
+            "alias": est["fantasia"],
+            "founded": est["data_inicio"],
+            "head": est["matriz"] == 1,
+            "statusDate": est["data_situacao"],
+            "status": {"id": est["situacao"], "text": SITUACOES.get(est["situacao"])},
+            "reason": {"id": est["motivo"], "text": self.descricao("motivos", est["motivo"])} if est["motivo"] else None,
+            "company": {
+                "id": inteiro(est["cnpj_basico"]),
+                "name": emp["razao_social"] if emp else None,
+                "equity": emp["capital"] if emp else None,
+                "nature": {"id": emp["natureza"], "text": self.descricao("naturezas", emp["natureza"])} if emp else None,
+                "size": {"id": emp["porte"], "acronym": sigla, "text": porte} if emp else None,
+                "simples": {
+                    "optant": simples["opcao_simples"] == "S",
+                    "since": simples["data_opcao_simples"]
+                } if simples else None,
+                "simei": {
+                    "optant": simples["opcao_mei"] == "S",
+                    "since": simples["data_opcao_mei"]
+                } if simples else None,
+                "members": [
+                    {
+                        "since": s["data_entrada"],
+                        "person": {
+                            "type": TIPOS_SOCIO.get(s["tipo"]),
+                            "name": s["nome"],
+                            "taxId": s["documento"],
+                            "age": FAIXAS_ETARIAS.get(s["faixa_etaria"])
+                        },
+                        "role": {"id": s["qualificacao"], "text": self.descricao("qualificacoes", s["qualificacao"])}
+                    }
+                    for s in socios
+                ]
+            },
+            "address": {
+                "municipality": est["municipio"],
+                "street": logradouro or None,
+                "number": est["numero"],
+                "details": est["complemento"],
+                "district": est["bairro"],
+                "city": self.descricao("municipios", est["municipio"]),
+                "state": est["uf"],
+                "zip": est["cep"]
+            },
+            "phones": telefones,
+            "emails": [{"address": est["email"]}] if est["email"] else [],
+            "mainActivity": {
+                "id": est["cnae_principal"],
+                "text": self.descricao("cnaes", est["cnae_principal"])
+            } if est["cnae_principal"] else None,
+            "sideActivities": [{"id": c, "text": self.descricao("cnaes", c)} for c in secundarias if c],
+            # Inscrições estaduais não fazem parte dos dados abertos da Receita
+            "registrations": []
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m cnpj_core.receita",
+        description="Importa os dados abertos do CNPJ (Receita Federal) para a base local"
+    )
+    parser.add_argument("pasta", help="pasta com os zips/CSVs baixados (Empresas, Estabelecimentos, Socios, ...)")
+    parser.add_argument("--base", help=f"arquivo da base local (padrão: {caminho_base_receita()})")
+    parser.add_argument("--workers", type=int, help="arquivos processados em paralelo (padrão: nº de CPUs)")
+    parser.add_argument("--completo", action="store_true", help="recria a base do zero em vez de atualizar")
+    args = parser.parse_args(argv)
+
+    inicio = time.monotonic()
+    total = importar(args.pasta, args.base, args.workers, args.completo)
+    print(f"{total} linhas importadas em {time.monotonic() - inicio:.0f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+import unicodedata
+from datetime import datetime
+
+from .caminhos import caminho_socios, caminho_cache, caminho_base_receita
+from .formatacao import get_nested_value, format_cnpj
+from .projecao import Projecao
+from .validacao import limpar_cnpj
+
+# Índice invertido de sócios: cada consulta (e as importações em massa)
+# grava os vínculos empresa <-> sócio, e os termos do nome/documento do
+# sócio apontam para esses vínculos. Daí saem "em que outras empresas este
+# sócio aparece" e a rede de empresas ligadas por sócios em comum.
+#
+# Um sócio é identificado pelo documento (mascarado pela Receita, ex.:
+# ***123456**) junto com o nome normalizado; só o nome juntaria homônimos.
+
+ATRASO_GRAVACAO = 2.0
+LINHAS_POR_LOTE = 20000
+
+# Limites da busca na rede: vínculos seguidos a partir de cada empresa ou
+# sócio (empresas "hub" com milhares de sócios são cortadas aqui) e linhas
+# por página
+VINCULOS_POR_NO = 50
+PAGINA = 200
+NIVEIS_MAXIMO = 3
+
+ESQUEMA = (
+    "CREATE TABLE IF NOT EXISTS empresas ("
+    "cnpj TEXT PRIMARY KEY, nome TEXT, atualizado TEXT NOT NULL) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS vinculos ("
+    "chave TEXT NOT NULL, cnpj TEXT NOT NULL, nome TEXT, documento TEXT, cargo TEXT, "
+    "PRIMARY KEY (chave, cnpj)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS idx_vinculos_cnpj ON vinculos(cnpj)",
+    "CREATE TABLE IF NOT EXISTS termos ("
+    "termo TEXT NOT NULL, chave TEXT NOT NULL, PRIMARY KEY (termo, chave)) WITHOUT ROWID",
+)
+
+VINCULO = Projecao({"nome": "person.name", "documento": "person.taxId", "cargo": "role.text"})
+
+
+def normalizar_nome(texto):
+    # Maiúsculas, sem acentos e pontuação: "José  d'Ávila" -> "JOSE D AVILA"
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).upper()
+    return " ".join("".join(c if c.isalnum() else " " for c in texto).split())
+
+
+def chave_socio(nome, documento):
+    return f"{limpar_cnpj(documento or '').strip('*')}|{normalizar_nome(nome)}"
+
+
+def termos_socio(nome, documento):
+    termos = {t for t in normalizar_nome(nome).split() if len(t) > 1}
+    digitos = ''.join(filter(str.isdigit, documento or ""))
+    if digitos:
+        termos.add(digitos)
+    return termos
+
+
+def vinculos_empresa(empresa):
+    # (chave, nome, documento, cargo) de cada sócio com nome
+    return [
+        (chave_socio(nome, documento), nome, documento, cargo)
+        for nome, documento, cargo in VINCULO.linhas(get_nested_value(empresa, "company.members"))
+        if nome
+    ]
+
+
+class IndiceSocios:
+    # Mesmo esquema do HistoricoDB: SQLite em WAL, gravações enfileiradas e
+    # feitas juntas (ATRASO_GRAVACAO depois ou antes de qualquer leitura).
+    def __init__(self, caminho=None):
+        self.caminho = caminho or caminho_socios()
+        self.lock = threading.Lock()
+        self.pendentes = {}
+        self.timer = None
+        self.conn = sqlite3.connect(self.caminho, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            for comando in ESQUEMA:
+                self.conn.execute(comando)
+
+    def salvar(self, empresa):
+        cnpj = limpar_cnpj(empresa.get("taxId") if empresa else "")
+        if len(cnpj) != 14:
+            return
+        with self.lock:
+            self.pendentes[cnpj] = (get_nested_value(empresa, "company.name"), vinculos_empresa(empresa))
+            if self.timer is None:
+                self.timer = threading.Timer(ATRASO_GRAVACAO, self.gravar_agendado)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def gravar_pendentes(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.pendentes:
+                return
+            self.gravar([(cnpj, nome, vinculos) for cnpj, (nome, vinculos) in self.pendentes.items()])
+            self.pendentes.clear()
+
+    def gravar_agendado(self):
+        try:
+            self.gravar_pendentes()
+        except Exception as e:
+            print(f"Erro ao gravar índice de sócios: {e}")
+
+    def gravar(self, empresas):
+        # Substitui os vínculos de cada empresa (sócios que saíram deixam de
+        # apontar para ela). Chamado com self.lock já adquirido.
+        data = datetime.now().strftime("%Y-%m-%d %H:%M")
+        with self.conn:
+            self.conn.executemany("DELETE FROM vinculos WHERE cnpj = ?", [(cnpj,) for cnpj, _, _ in empresas])
+            self.conn.executemany(
+                "INSERT INTO empresas (cnpj, nome, atualizado) VALUES (?, ?, ?) "
+                "ON CONFLICT(cnpj) DO UPDATE SET nome = excluded.nome, atualizado = excluded.atualizado",
+                [(cnpj, nome, data) for cnpj, nome, _ in empresas]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO vinculos (chave, cnpj, nome, documento, cargo) VALUES (?, ?, ?, ?, ?)",
+                [(chave, cnpj, nome, documento, cargo)
+                 for cnpj, _, vinculos in empresas for chave, nome, documento, cargo in vinculos]
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO termos (termo, chave) VALUES (?, ?)",
+                {(termo, chave)
+                 for _, _, vinculos in empresas for chave, nome, documento, _ in vinculos
+                 for termo in termos_socio(nome, documento)}
+            )
+
+    def importar_cache(self, pasta=None, ao_progresso=None):
+        # Indexa as respostas já guardadas no cache de consultas
+        pasta = pasta or caminho_cache()
+        self.gravar_pendentes()
+        lote, total = [], 0
+        for nome_arquivo in os.listdir(pasta):
+            if not nome_arquivo.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(pasta, nome_arquivo), 'r', encoding='utf-8') as f:
+                    empresa = json.load(f)["empresa"]
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+            cnpj = limpar_cnpj(empresa.get("taxId", ""))
+            if len(cnpj) == 14:
+                lote.append((cnpj, get_nested_value(empresa, "company.name"), vinculos_empresa(empresa)))
+            if len(lote) >= LINHAS_POR_LOTE:
+                total += self.gravar_lote(lote, ao_progresso, total)
+                lote = []
+        return total + self.gravar_lote(lote, ao_progresso, total)
+
+    def importar_receita(self, caminho=None, ao_progresso=None):
+        # Indexa o quadro de sócios da base local da Receita (python -m
+        # cnpj_core.receita). Os sócios são da empresa (CNPJ básico); o
+        # vínculo fica com o CNPJ da matriz.
+        caminho = caminho or caminho_base_receita()
+        self.gravar_pendentes()
+        uri = "file:" + caminho.replace("\\", "/") + "?mode=ro"
+        origem = sqlite3.connect(uri, uri=True)
+        try:
+            linhas = origem.execute(
+                "SELECT e.cnpj, emp.razao_social, s.nome, s.documento, q.descricao "
+                "FROM socios s "
+                "JOIN estabelecimentos e ON e.cnpj_basico = s.cnpj_basico AND e.matriz = 1 "
+                "LEFT JOIN empresas emp ON emp.cnpj_basico = s.cnpj_basico "
+                "LEFT JOIN qualificacoes q ON q.codigo = s.qualificacao "
+                "ORDER BY s.cnpj_basico"
+            )
+            lote, total, atual = [], 0, None
+            for cnpj, razao_social, nome, documento, cargo in linhas:
+                if not nome:
+                    continue
+                if atual is None or atual[0] != cnpj:
+                    if len(lote) >= LINHAS_POR_LOTE:
+                        total += self.gravar_lote(lote, ao_progresso, total)
+                        lote = []
+                    atual = (cnpj, razao_social, [])
+                    lote.append(atual)
+                atual[2].append((chave_socio(nome, documento), nome, documento, cargo))
+            return total + self.gravar_lote(lote, ao_progresso, total)
+        finally:
+            origem.close()
+
+    def gravar_lote(self, lote, ao_progresso, total):
+        if not lote:
+            return 0
+        with self.lock:
+            self.gravar(lote)
+        if ao_progresso:
+            ao_progresso(total + len(lote))
+        return len(lote)
+
+    def contar(self):
+        self.gravar_pendentes()
+        with self.lock:
+            empresas = self.conn.execute("SELECT COUNT(*) FROM empresas").fetchone()[0]
+            vinculos = self.conn.execute("SELECT COUNT(*) FROM vinculos").fetchone()[0]
+        return empresas, vinculos
+
+    def socios(self, cnpj, limite=VINCULOS_POR_NO):
+        self.gravar_pendentes()
+        with self.lock:
+            return self.conn.execute(
+                "SELECT chave, nome, documento, cargo FROM vinculos WHERE cnpj = ? ORDER BY chave LIMIT ?",
+                (limpar_cnpj(cnpj), limite)
+            ).fetchall()
+
+    def empresas_do_socio(self, busca, limite=PAGINA, deslocamento=0):
+        # Empresas de todos os sócios cujo nome/documento contém todos os
+        # termos buscados (por prefixo): "silva jose", "123456"...
+        # Devolve (cnpj, empresa, sócio, documento, cargo).
+        termos = normalizar_nome(busca).split()
+        if not termos:
+            return []
+        subconsultas = " INTERSECT ".join(["SELECT chave FROM termos WHERE termo >= ? AND termo < ?"] * len(termos))
+        params = [p for termo in termos for p in (termo, termo + "\uffff")]
+        self.gravar_pendentes()
+        with self.lock:
+            return self.conn.execute(
+                f"WITH chaves(chave) AS ({subconsultas}) "
+                "SELECT v.cnpj, e.nome, v.nome, v.documento, v.cargo "
+                "FROM chaves JOIN vinculos v ON v.chave = chaves.chave LEFT JOIN empresas e ON e.cnpj = v.cnpj "
+                "ORDER BY v.chave, v.cnpj LIMIT ? OFFSET ?",
+                params + [limite, deslocamento]
+            ).fetchall()
+
+    def rede(self, cnpj, niveis=1, limite=PAGINA, deslocamento=0, por_no=VINCULOS_POR_NO):
+        # Busca em largura empresa -> sócio -> empresa, até `niveis` empresas
+        # de distância. Cada nó segue no máximo `por_no` vínculos e a busca
+        # para ao completar a página pedida, então a memória fica limitada
+        # mesmo em torno de empresas com milhares de sócios.
+        # Devolve (linhas, ha_mais, cortados): linhas são
+        # (nível, cnpj, empresa, sócio em comum, cargo, cnpj de onde veio).
+        self.gravar_pendentes()
+        cnpj = limpar_cnpj(cnpj)
+        maximo = deslocamento + limite
+        empresas_vistas, socios_vistos = {cnpj}, set()
+        fronteira, linhas, cortados = [cnpj], [], 0
+        with self.lock:
+            for nivel in range(1, min(niveis, NIVEIS_MAXIMO) + 1):
+                proxima = []
+                for origem in fronteira:
+                    socios = self.conn.execute(
+                        "SELECT chave, nome FROM vinculos WHERE cnpj = ? ORDER BY chave LIMIT ?", (origem, por_no + 1)
+                    ).fetchall()
+                    cortados += len(socios) > por_no
+                    for chave, nome in socios[:por_no]:
+                        if chave in socios_vistos:
+                            continue
+                        socios_vistos.add(chave)
+                        empresas = self.conn.execute(
+                            "SELECT v.cnpj, e.nome, v.cargo FROM vinculos v LEFT JOIN empresas e ON e.cnpj = v.cnpj "
+                            "WHERE v.chave = ? ORDER BY v.cnpj LIMIT ?", (chave, por_no + 1)
+                        ).fetchall()
+                        cortados += len(empresas) > por_no
+                        for destino, empresa, cargo in empresas[:por_no]:
+                            if destino in empresas_vistas:
+                                continue
+                            empresas_vistas.add(destino)
+                            linhas.append((nivel, destino, empresa, nome, cargo, origem))
+                            proxima.append(destino)
+                            if len(linhas) > maximo:
+                                return linhas[deslocamento:maximo], True, cortados
+                fronteira = proxima
+        return linhas[deslocamento:], False, cortados
+
+    def fechar(self):
+        self.gravar_pendentes()
+        with self.lock:
+            self.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m cnpj_core.relacionadas",
+        description="Índice de sócios: empresas de um sócio e rede de empresas relacionadas"
+    )
+    parser.add_argument("--indice", default=caminho_socios(), help="arquivo do índice de sócios")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    cache = sub.add_parser("importar-cache", help="indexa as respostas guardadas no cache de consultas")
+    cache.add_argument("--pasta", default=caminho_cache())
+    receita = sub.add_parser("importar-receita", help="indexa os sócios da base local da Receita")
+    receita.add_argument("--base", default=caminho_base_receita())
+    socio = sub.add_parser("socio", help="empresas em que aparece um sócio (nome ou parte do documento)")
+    socio.add_argument("busca", nargs="+")
+    socio.add_argument("--limite", type=int, default=PAGINA)
+    rede = sub.add_parser("rede", help="empresas ligadas a um CNPJ por sócios em comum")
+    rede.add_argument("cnpj")
+    rede.add_argument("--niveis", type=int, default=1, choices=range(1, NIVEIS_MAXIMO + 1))
+    rede.add_argument("--limite", type=int, default=PAGINA)
+    args = parser.parse_args(argv)
+
+    indice = IndiceSocios(args.indice)
+    try:
+        progresso = lambda n: print(f"\r{n} empresas indexadas", end="", file=sys.stderr, flush=True)
+        if args.comando == "importar-cache":
+            indice.importar_cache(args.pasta, progresso)
+            print(file=sys.stderr)
+        elif args.comando == "importar-receita":
+            indice.importar_receita(args.base, progresso)
+            print(file=sys.stderr)
+        elif args.comando == "socio":
+            for cnpj, empresa, nome, documento, cargo in indice.empresas_do_socio(" ".join(args.busca), args.limite):
+                print(f"{format_cnpj(cnpj)}  {empresa or ''}  {nome} ({documento or '-'}, {cargo or '-'})")
+        else:
+            linhas, ha_mais, cortados = indice.rede(args.cnpj, args.niveis, args.limite)
+            for nivel, cnpj, empresa, nome, cargo, origem in linhas:
+                print(f"{nivel}  {format_cnpj(cnpj)}  {empresa or ''}  via {nome} ({cargo or '-'}) "
+                      f"de {format_cnpj(origem)}")
+            if ha_mais or cortados:
+                print(f"Resultado parcial: limite de {args.limite} linhas ou {cortados} nós com vínculos demais",
+                      file=sys.stderr)
+    finally:
+        indice.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
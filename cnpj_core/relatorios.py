@@ -0,0 +1,350 @@
+import sys
+import csv
+import json
+import time
+import asyncio
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from .caminhos import caminho_cache
+from .exportacao import caminho_tabela, registros_lote
+from .formatacao import format_currency
+from .projecao import Projecao
+
+# Relatórios da carteira: uma lista de CNPJs (fornecedores, clientes) é
+# consultada em massa e cada resposta é reduzida na hora a um resumo
+# (atividades, inscrições, porte e capital) que alimenta os agrupamentos.
+# O JSON da API é descartado logo depois, então a memória depende só do
+# número de grupos (CNAEs, UFs, portes), não do tamanho da lista, e os
+# relatórios parciais podem ser lidos a qualquer momento.
+#
+# As consultas são coordenadas por asyncio (fila limitada e tarefas
+# consumidoras); o cliente HTTP é bloqueante (requests), então cada
+# consulta roda num pool de threads do mesmo tamanho da concorrência, sempre
+# passando pelo cache e pelo limitador de taxa do ClienteCNPJa.
+CONCORRENCIA_PADRAO = 8
+TENTATIVAS_RELATORIO = 5
+
+# Situações de inscrição estadual consideradas ativas quando a resposta
+# não traz o campo "enabled"
+SITUACOES_IE_ATIVAS = {"ativa", "ativo", "habilitada", "habilitado", "sem restrição"}
+
+RESUMO = Projecao({
+    "porte": "company.size.text",
+    "capital": "company.equity",
+    "atividade_codigo": "mainActivity.id",
+    "atividade": "mainActivity.text",
+    "secundarias": "sideActivities",
+    "inscricoes": "registrations"
+})
+
+RELATORIOS = {
+    "atividades": ("Atividades (CNAE)", ["CNAE", "Descrição", "Principal", "Secundária"]),
+    "inscricoes": ("Inscrições por UF", ["UF", "Inscrições", "Inativas", "% Inativas"]),
+    "portes": ("Capital por porte", ["Porte", "Empresas", "Com Capital", "Capital Total", "Capital Médio",
+                                     "Maior Capital"]),
+}
+
+
+def inscricao_ativa(inscricao):
+    # True/False, ou None quando a resposta não diz
+    if isinstance(inscricao.get("enabled"), bool):
+        return inscricao["enabled"]
+    texto = (inscricao.get("status") or {}).get("text")
+    if not texto:
+        return None
+    return texto.strip().casefold() in SITUACOES_IE_ATIVAS
+
+
+def capital_social(valor):
+    try:
+        return float(valor) if valor not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def resumir(empresa):
+    # Só o que os relatórios usam; o resto do JSON pode ser descartado
+    porte, capital, codigo, atividade, secundarias, inscricoes = RESUMO.tupla(empresa)
+    return (
+        porte or "Não informado",
+        capital_social(capital),
+        (codigo, atividade) if codigo or atividade else None,
+        [(a.get("id"), a.get("text")) for a in secundarias or () if isinstance(a, dict)],
+        [((i.get("state") or "??"), inscricao_ativa(i)) for i in inscricoes or () if isinstance(i, dict)],
+    )
+
+
+class Agregados:
+    # Agrupamentos incrementais; seguro para ler (tabelas) enquanto as
+    # consultas ainda chegam
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.status = Counter()
+        self.atividades = {}  # codigo -> [descrição, principal, secundária]
+        self.inscricoes = {}  # uf -> [total, inativas]
+        self.portes = {}  # porte -> [empresas, com capital, soma, maior]
+        self.versao = 0  # Muda a cada resultado (a janela só redesenha quando muda)
+
+    def acrescentar(self, status, resumo=None):
+        with self.lock:
+            self.status[status if not status.startswith("erro") else "erro"] += 1
+            self.versao += 1
+            if resumo is None:
+                return
+            porte, capital, principal, secundarias, inscricoes = resumo
+            if principal is not None:
+                self.atividade(*principal)[1] += 1
+            for codigo, descricao in secundarias:
+                self.atividade(codigo, descricao)[2] += 1
+            for uf, ativa in inscricoes:
+                grupo = self.inscricoes.setdefault(uf, [0, 0])
+                grupo[0] += 1
+                if ativa is False:
+                    grupo[1] += 1
+            grupo = self.portes.setdefault(porte, [0, 0, 0.0, None])
+            grupo[0] += 1
+            if capital is not None:
+                grupo[1] += 1
+                grupo[2] += capital
+                grupo[3] = capital if grupo[3] is None else max(grupo[3], capital)
+
+    def atividade(self, codigo, descricao):
+        grupo = self.atividades.setdefault(codigo, [descricao, 0, 0])
+        if not grupo[0] and descricao:
+            grupo[0] = descricao
+        return grupo
+
+    def tabelas(self, formatar=False):
+        # {relatório: linhas}, na ordem das colunas de RELATORIOS
+        dinheiro = format_currency if formatar else (lambda v: v)
+        percentual = (lambda v: f"{v:.1f}%") if formatar else (lambda v: round(v, 1))
+        with self.lock:
+            atividades = sorted(
+                ([formatar_cnae(codigo) if formatar else codigo, descricao or ("" if formatar else None),
+                  principal, secundaria]
+                 for codigo, (descricao, principal, secundaria) in self.atividades.items()),
+                key=lambda linha: (-linha[2], -linha[3])
+            )
+            inscricoes = sorted(
+                ([uf, total, inativas, percentual(100 * inativas / total if total else 0.0)]
+                 for uf, (total, inativas) in self.inscricoes.items()),
+                key=lambda linha: (-linha[2], linha[0])
+            )
+            portes = sorted(
+                ([porte, empresas, com_capital, dinheiro(soma),
+                  dinheiro(soma / com_capital if com_capital else 0.0), dinheiro(maior or 0.0)]
+                 for porte, (empresas, com_capital, soma, maior) in self.portes.items()),
+                key=lambda linha: -linha[1]
+            )
+        return {"atividades": atividades, "inscricoes": inscricoes, "portes": portes}
+
+    def resumo(self):
+        with self.lock:
+            return dict(self.status)
+
+
+def formatar_cnae(codigo):
+    # 6201501 -> 6201-5/01
+    texto = str(codigo or "")
+    if len(texto) == 7 and texto.isdigit():
+        return f"{texto[:4]}-{texto[4]}/{texto[5:]}"
+    return texto
+
+
+class RelatorioCarteira:
+    # Consulta os CNPJs (cache antes da API) e agrega os resultados em
+    # streaming. `executar` bloqueia até o fim; `parar` interrompe.
+    def __init__(self, cnpjs, cliente, concorrencia=CONCORRENCIA_PADRAO, timeout=None, agregados=None):
+        self.cnpjs = cnpjs
+        self.cliente = cliente
+        self.cache = cliente.cache
+        self.concorrencia = max(1, concorrencia)
+        self.timeout = timeout
+        self.agregados = agregados or Agregados()
+        self.parar_evento = threading.Event()
+        self.lock = threading.Lock()
+        self.total = len(cnpjs) if hasattr(cnpjs, "__len__") else None
+        self.feitos = 0
+        self.erros = 0
+        self.inicio = None
+
+    def progresso(self):
+        with self.lock:
+            decorrido = time.monotonic() - self.inicio if self.inicio else 0.0
+            taxa = self.feitos / decorrido if decorrido > 0 else 0.0
+            restante = (self.total - self.feitos) / taxa if taxa > 0 and self.total is not None else None
+            return {
+                "feitos": self.feitos,
+                "total": self.total,
+                "erros": self.erros,
+                "por_segundo": taxa,
+                "restante_s": restante
+            }
+
+    def parar(self):
+        self.parar_evento.set()
+
+    def consultar(self, cnpj):
+        # Roda numa thread do pool: devolve (status, resumo) sem guardar o JSON
+        entrada = self.cache.obter(cnpj) if self.cache is not None else None
+        if entrada and not self.cache.expirada(entrada):
+            self.cliente.contar("acertos")
+            return "ok", resumir(entrada["empresa"])
+        try:
+            status_code, empresa, _ = self.cliente.buscar(
+                cnpj, entrada=entrada, timeout=self.timeout,
+                tentativas=TENTATIVAS_RELATORIO, parar=self.parar_evento
+            )
+        except InterruptedError:
+            return None
+        except Exception as e:
+            return f"erro: {e}", None
+        if status_code == 404:
+            return "não encontrado", None
+        if status_code == 400:
+            return "inválido", None
+        return "ok", resumir(empresa)
+
+    async def executar_async(self):
+        loop = asyncio.get_running_loop()
+        fila = asyncio.Queue(maxsize=self.concorrencia * 2)
+        executor = ThreadPoolExecutor(max_workers=self.concorrencia, thread_name_prefix="relatorio")
+
+        async def produtor():
+            # Alimenta a fila aos poucos: a lista pode ser um gerador
+            for cnpj in self.cnpjs:
+                if self.parar_evento.is_set():
+                    break
+                await fila.put(cnpj)
+            for _ in range(self.concorrencia):
+                await fila.put(None)
+
+        async def consumidor():
+            while True:
+                cnpj = await fila.get()
+                if cnpj is None:
+                    return
+                resultado = await loop.run_in_executor(executor, self.consultar, cnpj)
+                if resultado is None:
+                    continue
+                status, resumo = resultado
+                self.agregados.acrescentar(status, resumo)
+                with self.lock:
+                    self.feitos += 1
+                    if status.startswith("erro"):
+                        self.erros += 1
+
+        try:
+            await asyncio.gather(produtor(), *(consumidor() for _ in range(self.concorrencia)))
+        finally:
+            executor.shutdown(wait=True)
+
+    def executar(self):
+        self.inicio = time.monotonic()
+        asyncio.run(self.executar_async())
+        return self.progresso()
+
+
+def agregar_registros(registros, agregados=None):
+    # Agrega um resultado já gravado (exportacao.registros_lote), sem consultar
+    agregados = agregados or Agregados()
+    for _, status, empresa in registros:
+        if status == "ok" and not (empresa and "mainActivity" in empresa):
+            status = "sem dados"  # Lote gravado sem --bruto e fora do cache
+        agregados.acrescentar(status or "ok", resumir(empresa) if status == "ok" else None)
+    return agregados
+
+
+def salvar_relatorios(agregados, caminho):
+    # JSON com todos os relatórios, ou um CSV por relatório ao lado do nome dado
+    tabelas = agregados.tabelas()
+    if caminho.lower().endswith(".json"):
+        dados = {nome: [dict(zip(RELATORIOS[nome][1], linha)) for linha in linhas] for nome, linhas in tabelas.items()}
+        dados["status"] = agregados.resumo()
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False, indent=2)
+        return [caminho]
+    arquivos = []
+    for nome, linhas in tabelas.items():
+        arquivo = caminho_tabela(caminho, nome)
+        with open(arquivo, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(RELATORIOS[nome][1])
+            writer.writerows(linhas)
+        arquivos.append(arquivo)
+    return arquivos
+
+
+def imprimir(agregados, limite=20):
+    for nome, linhas in agregados.tabelas(formatar=True).items():
+        titulo, colunas = RELATORIOS[nome]
+        print(f"\n{titulo}")
+        print("  ".join(colunas))
+        for linha in linhas[:limite]:
+            print("  ".join("" if v is None else str(v) for v in linha))
+        if len(linhas) > limite:
+            print(f"... mais {len(linhas) - limite}")
+    print("\n" + ", ".join(f"{status}: {n}" for status, n in agregados.resumo().items()))
+
+
+def main(argv=None):
+    from .cache import CacheConsultas
+    from .cliente import ClienteCNPJa, LimitadorTaxa, LIMITE_POR_MINUTO
+    from .lote import ler_cnpjs
+    from .provedores import PROVEDORES, PROVEDORES_PADRAO, criar_provedores
+
+    parser = argparse.ArgumentParser(
+        prog="python -m cnpj_core.relatorios",
+        description="Distribuição de CNAEs, inscrições inativas por UF e capital por porte de uma lista de CNPJs"
+    )
+    parser.add_argument("--saida", help="grava os relatórios (.json, ou um .csv por relatório)")
+    parser.add_argument("--linhas", type=int, default=20, help="linhas exibidas por relatório (padrão: 20)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    consultar = sub.add_parser("consultar", help="consulta (cache ou API) os CNPJs de um CSV/TXT")
+    consultar.add_argument("arquivo")
+    consultar.add_argument("--concorrencia", type=int, default=CONCORRENCIA_PADRAO,
+                           help=f"consultas simultâneas (padrão: {CONCORRENCIA_PADRAO})")
+    consultar.add_argument("--por-minuto", type=float, default=LIMITE_POR_MINUTO,
+                           help=f"consultas por minuto na CNPJá (padrão: {LIMITE_POR_MINUTO})")
+    consultar.add_argument("--provedores", nargs="+", choices=list(PROVEDORES), default=list(PROVEDORES_PADRAO),
+                           help=f"APIs consultadas, em ordem de preferência (padrão: {' '.join(PROVEDORES_PADRAO)})")
+    lote = sub.add_parser("lote", help="usa um resultado de lote já gravado (python -m cnpj_core --lote)")
+    lote.add_argument("arquivo")
+    args = parser.parse_args(argv)
+
+    cache = CacheConsultas(caminho_cache())
+    if args.comando == "lote":
+        agregados = agregar_registros(registros_lote(args.arquivo, cache))
+    else:
+        cnpjs, invalidos = ler_cnpjs(args.arquivo)
+        limitador = LimitadorTaxa(args.por_minuto)
+        cliente = ClienteCNPJa(cache, limitador, provedores=criar_provedores(args.provedores, limitador))
+        relatorio = RelatorioCarteira(cnpjs, cliente, args.concorrencia)
+        agregados = relatorio.agregados
+        thread = threading.Thread(target=relatorio.executar, name="relatorio", daemon=True)
+        thread.start()
+        try:
+            while thread.is_alive():
+                thread.join(1.0)
+                p = relatorio.progresso()
+                print(f"\r{p['feitos']}/{p['total']} consultados, {p['erros']} erros, "
+                      f"{p['por_segundo'] * 60:.0f}/min", end="", file=sys.stderr, flush=True)
+        except KeyboardInterrupt:
+            relatorio.parar()
+            thread.join()
+        finally:
+            print(file=sys.stderr)
+            cliente.fechar()
+        for _ in invalidos:
+            agregados.acrescentar("inválido")
+    imprimir(agregados, args.linhas)
+    if args.saida:
+        print("Gravado em " + ", ".join(salvar_relatorios(agregados, args.saida)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,798 @@
+import os
+import re
+import sys
+import json
+import mmap
+import math
+import time
+import uuid
+import zlib
+import bisect
+import struct
+import argparse
+import threading
+from array import array
+from collections import defaultdict
+
+from .caminhos import caminho_snapshots, caminho_cache
+from .exportacao import EMPRESA, FILHAS, DECIMAIS, INTEIRAS, registros_lote
+from .formatacao import get_nested_value, format_cnpj
+from .persistencia import trava_arquivo
+from .validacao import limpar_cnpj
+
+# Cópia de cada resposta obtida, guardada por coluna para análise. A pasta
+# tem segmentos imutáveis (*.seg), cada um com a tabela de empresas (mesmas
+# colunas da exportação, mais o momento da captura) e as filhas (sócios,
+# atividades secundárias, inscrições) ligadas pelo número da linha.
+#
+#   cnpj        14 bytes fixos por linha
+#   inteiro     int64 (NULO_INTEIRO = vazio), com mínimo/máximo do segmento
+#   decimal     float64 (NaN = vazio), com mínimo/máximo do segmento
+#   dicionario  texto repetido (situação, natureza, cidade...): códigos de
+#               1, 2 ou 4 bytes (0 = vazio) sobre um dicionário ordenado
+#   texto       texto quase sem repetição (nome, CEP...): comprimido (zlib)
+#
+# As colunas de tamanho fixo ficam sem compressão e são lidas direto do
+# arquivo mapeado em memória (mmap); um filtro só lê as colunas que usa e
+# pula o segmento inteiro quando o dicionário ou o mínimo/máximo já
+# descartam todas as linhas. Com NumPy instalado os filtros são vetorizados.
+#
+# Novas respostas viram segmentos pequenos a cada ATRASO_GRAVACAO. Os
+# segmentos ficam em faixas de tamanho (potências de SEGMENTOS_PEQUENOS
+# linhas) e, quando uma faixa junta SEGMENTOS_PEQUENOS deles, eles viram um
+# só da faixa seguinte, até LINHAS_POR_SEGMENTO: cada linha é regravada uma
+# vez por faixa, não a cada junção.
+MAGICO = b"CNPJSNP1"
+VERSAO = 1
+LINHAS_POR_SEGMENTO = 100000
+SEGMENTOS_PEQUENOS = 8
+ATRASO_GRAVACAO = 2.0
+DICIONARIO_MINIMO = 256
+NIVEL_ZLIB = 6
+NULO_INTEIRO = -2 ** 63
+LARGURAS = (("B", 0xFF), ("H", 0xFFFF), ("I", 0xFFFFFFFF))
+TIPOS_NUMPY = {"B": "<u1", "H": "<u2", "I": "<u4", "q": "<i8", "d": "<f8"}
+
+COLUNAS = {"empresas": ["cnpj", "capturado"] + EMPRESA.nomes[1:]}
+COLUNAS.update({tabela: ["linha"] + projecao.nomes for tabela, (_, projecao) in FILHAS.items()})
+TIPOS = {"cnpj": "cnpj", "capturado": "inteiro", "linha": "inteiro"}
+TIPOS.update({coluna: "decimal" for coluna in DECIMAIS})
+TIPOS.update({coluna: "inteiro" for coluna in INTEIRAS})
+
+# Operadores dos filtros; "~" é "contém" (sem diferenciar maiúsculas) e
+# "=" com vírgulas é "um destes"
+OPERADORES = ("=", "!=", ">", ">=", "<", "<=", "~")
+FILTRO = re.compile(r"^\s*([\w.]+)\s*(!=|>=|<=|=|>|<|~)\s*(.*?)\s*$")
+
+
+def tipo_coluna(coluna):
+    return TIPOS.get(coluna, "texto")
+
+
+def linhas_empresa(empresa, capturado):
+    # (linha da empresa, {tabela: linhas filhas sem o número da linha})
+    cnpj = limpar_cnpj(get_nested_value(empresa, "taxId") or "")
+    linha = (cnpj, int(capturado)) + EMPRESA.tupla(empresa)[1:]
+    filhas = {tabela: projecao.linhas(get_nested_value(empresa, caminho))
+              for tabela, (caminho, projecao) in FILHAS.items()}
+    return linha, filhas
+
+
+def numero(valor, converter):
+    # Valor numérico da API ou None (texto que não é número vira vazio)
+    if valor is None or valor == "":
+        return None
+    try:
+        return converter(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def ler_filtro(texto):
+    # "capital_social>1000000" -> ("capital_social", ">", 1000000.0); "uf=SP,RJ" -> ("uf", "=", ["SP", "RJ"])
+    achado = FILTRO.match(texto)
+    if achado is None:
+        raise ValueError(f"Filtro inválido: {texto!r} (use coluna=valor, >, >=, <, <=, != ou ~)")
+    coluna, operador, valor = achado.groups()
+    tabela, _, nome = coluna.rpartition(".")
+    if nome not in COLUNAS.get(tabela or "empresas", ()):
+        raise ValueError(f"Coluna desconhecida: {coluna}")
+    if tipo_coluna(nome) in ("inteiro", "decimal"):
+        converter = int if tipo_coluna(nome) == "inteiro" else float
+        valor = [converter(v) for v in valor.split(",")] if operador == "=" and "," in valor else converter(valor)
+    elif operador == "=" and "," in valor:
+        valor = [v.strip() for v in valor.split(",")]
+    if tipo_coluna(nome) == "cnpj":
+        valor = [limpar_cnpj(v) for v in valor] if isinstance(valor, list) else limpar_cnpj(valor)
+    return coluna, operador, valor
+
+
+def comparador(operador, valor):
+    # Predicado Python equivalente ao filtro (caminho sem NumPy e colunas de texto)
+    if isinstance(valor, list):
+        conjunto = set(valor)
+        return lambda v: v in conjunto
+    if operador == "~":
+        trecho = str(valor).casefold()
+        return lambda v: v is not None and trecho in str(v).casefold()
+    funcoes = {
+        "=": lambda v: v == valor, "!=": lambda v: v != valor,
+        ">": lambda v: v > valor, ">=": lambda v: v >= valor,
+        "<": lambda v: v < valor, "<=": lambda v: v <= valor,
+    }
+    funcao = funcoes[operador]
+    return lambda v: v is not None and (not isinstance(v, float) or not math.isnan(v)) and funcao(v)
+
+
+class Corpo:
+    # Blocos do segmento, alinhados em 8 bytes para leitura direta como array
+    def __init__(self):
+        self.dados = bytearray()
+
+    def anexar(self, bloco):
+        inicio = len(self.dados)
+        self.dados += bloco
+        self.dados += b"\0" * (-len(self.dados) % 8)
+        return [inicio, len(bloco)]
+
+
+def codificar(corpo, tipo, valores):
+    # Grava a coluna no corpo e devolve seus metadados
+    n = len(valores)
+    if tipo == "cnpj":
+        return {"tipo": tipo, "dados": corpo.anexar(
+            b"".join((v or "").encode("ascii", "replace")[:14].ljust(14, b"\0") for v in valores)
+        )}
+    if tipo == "inteiro":
+        numeros = array("q", (NULO_INTEIRO if v is None else v for v in (numero(v, int) for v in valores)))
+        presentes = [v for v in numeros if v != NULO_INTEIRO]
+        return {"tipo": tipo, "dados": corpo.anexar(numeros.tobytes()),
+                "minimo": min(presentes, default=None), "maximo": max(presentes, default=None)}
+    if tipo == "decimal":
+        numeros = array("d", (math.nan if v is None else v for v in (numero(v, float) for v in valores)))
+        presentes = [v for v in numeros if not math.isnan(v)]
+        return {"tipo": tipo, "dados": corpo.anexar(numeros.tobytes()),
+                "minimo": min(presentes, default=None), "maximo": max(presentes, default=None)}
+
+    textos = [None if v is None or v == "" else str(v) for v in valores]
+    distintos = sorted(set(textos) - {None})
+    if len(distintos) <= max(DICIONARIO_MINIMO, n // 2):
+        largura = next(codigo for codigo, maximo in LARGURAS if len(distintos) <= maximo)
+        indice = {texto: i for i, texto in enumerate(distintos, 1)}
+        codigos = array(largura, (indice[t] if t is not None else 0 for t in textos))
+        return {"tipo": "dicionario", "largura": largura, "dados": corpo.anexar(codigos.tobytes()),
+                "dicionario": corpo.anexar(zlib.compress("\0".join(distintos).encode("utf-8"), NIVEL_ZLIB)),
+                "distintos": len(distintos)}
+    blob = "\0".join(t or "" for t in textos).encode("utf-8")
+    return {"tipo": "texto", "dados": corpo.anexar(zlib.compress(blob, NIVEL_ZLIB))}
+
+
+def escrever_segmento(caminho, tabelas, substitui=()):
+    # tabelas: {tabela: {coluna: [valores]}}. Grava num temporário e troca,
+    # para que nenhum leitor veja um segmento pela metade.
+    corpo = Corpo()
+    cabecalho = {"versao": VERSAO, "substitui": list(substitui), "tabelas": {}}
+    for tabela, colunas in COLUNAS.items():
+        dados = tabelas[tabela]
+        linhas = len(dados[colunas[0]])
+        cabecalho["tabelas"][tabela] = {
+            "linhas": linhas,
+            "colunas": {c: codificar(corpo, tipo_coluna(c), dados[c]) for c in colunas}
+        }
+    texto = json.dumps(cabecalho, ensure_ascii=False).encode("utf-8")
+    texto += b" " * (-(len(MAGICO) + 4 + len(texto)) % 8)
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as f:
+        f.write(MAGICO + struct.pack("<I", len(texto)) + texto)
+        f.write(corpo.dados)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+def faixa(linhas):
+    # Faixa de tamanho de um segmento: 0 até SEGMENTOS_PEQUENOS - 1 linhas,
+    # 1 até SEGMENTOS_PEQUENOS ** 2 - 1, e assim por diante
+    nivel = 0
+    while linhas >= SEGMENTOS_PEQUENOS:
+        linhas //= SEGMENTOS_PEQUENOS
+        nivel += 1
+    return nivel
+
+
+def tabelas_vazias():
+    return {tabela: {c: [] for c in colunas} for tabela, colunas in COLUNAS.items()}
+
+
+def acrescentar(tabelas, linha, filhas):
+    # Acrescenta uma empresa (e as filhas, apontando para a linha dela)
+    empresas = tabelas["empresas"]
+    numero = len(empresas["cnpj"])
+    for coluna, valor in zip(COLUNAS["empresas"], linha):
+        empresas[coluna].append(valor)
+    for tabela, linhas in filhas.items():
+        destino = tabelas[tabela]
+        for item in linhas:
+            destino["linha"].append(numero)
+            for coluna, valor in zip(COLUNAS[tabela][1:], item):
+                destino[coluna].append(valor)
+
+
+class Segmento:
+    # Leitura de um segmento mapeado em memória. `np` é o módulo NumPy ou None.
+    def __init__(self, caminho, np=None):
+        self.caminho = caminho
+        self.nome = os.path.basename(caminho)
+        self.np = np
+        with open(caminho, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGICO)] != MAGICO:
+            self.mm.close()
+            raise ValueError(f"{caminho} não é um segmento de snapshots")
+        tamanho = struct.unpack_from("<I", self.mm, len(MAGICO))[0]
+        inicio = len(MAGICO) + 4
+        self.cabecalho = json.loads(self.mm[inicio:inicio + tamanho])
+        self.base = inicio + tamanho
+        self.dicionarios = {}
+
+    def linhas(self, tabela="empresas"):
+        return self.cabecalho["tabelas"][tabela]["linhas"]
+
+    def meta(self, tabela, coluna):
+        return self.cabecalho["tabelas"][tabela]["colunas"][coluna]
+
+    def bloco(self, posicao):
+        inicio, tamanho = posicao
+        return self.mm[self.base + inicio:self.base + inicio + tamanho]
+
+    def vetor(self, posicao, formato, n):
+        # Sem cópia: NumPy (ou memoryview) direto sobre o mmap
+        inicio = self.base + posicao[0]
+        if self.np is not None:
+            return self.np.frombuffer(self.mm, dtype=TIPOS_NUMPY[formato], count=n, offset=inicio)
+        return memoryview(self.mm)[inicio:inicio + posicao[1]].cast(formato)
+
+    def dicionario(self, tabela, coluna):
+        chave = (tabela, coluna)
+        if chave not in self.dicionarios:
+            texto = zlib.decompress(self.bloco(self.meta(tabela, coluna)["dicionario"])).decode("utf-8")
+            self.dicionarios[chave] = [None] + (texto.split("\0") if texto else [])
+        return self.dicionarios[chave]
+
+    def brutos(self, tabela, coluna):
+        # Valores da coluna na forma armazenada (códigos, números, bytes)
+        meta = self.meta(tabela, coluna)
+        n = self.linhas(tabela)
+        if meta["tipo"] == "cnpj":
+            if self.np is not None:
+                return self.np.frombuffer(self.mm, dtype="S14", count=n, offset=self.base + meta["dados"][0])
+            bloco = self.bloco(meta["dados"])
+            return [bloco[i * 14:(i + 1) * 14] for i in range(n)]
+        if meta["tipo"] == "inteiro":
+            return self.vetor(meta["dados"], "q", n)
+        if meta["tipo"] == "decimal":
+            return self.vetor(meta["dados"], "d", n)
+        if meta["tipo"] == "dicionario":
+            return self.vetor(meta["dados"], meta["largura"], n)
+        texto = zlib.decompress(self.bloco(meta["dados"])).decode("utf-8")
+        return [t or None for t in texto.split("\0")] if n else []
+
+    def valores(self, tabela, coluna, linhas=None):
+        # Valores Python da coluna, só nas `linhas` pedidas (todas se None)
+        meta = self.meta(tabela, coluna)
+        brutos = self.brutos(tabela, coluna)
+        indices = range(self.linhas(tabela)) if linhas is None else linhas
+        if meta["tipo"] == "cnpj":
+            return [bytes(brutos[i]).rstrip(b"\0").decode("ascii") or None for i in indices]
+        if meta["tipo"] == "inteiro":
+            return [None if brutos[i] == NULO_INTEIRO else int(brutos[i]) for i in indices]
+        if meta["tipo"] == "decimal":
+            return [None if math.isnan(brutos[i]) else float(brutos[i]) for i in indices]
+        if meta["tipo"] == "dicionario":
+            dicionario = self.dicionario(tabela, coluna)
+            return [dicionario[brutos[i]] for i in indices]
+        return [brutos[i] for i in indices]
+
+    def mascara(self, tabela, coluna, operador, valor):
+        # Linhas da tabela que passam no filtro; None quando nenhuma passa
+        # (o segmento é descartado sem ler a coluna)
+        meta = self.meta(tabela, coluna)
+        np = self.np
+        n = self.linhas(tabela)
+        if meta["tipo"] in ("inteiro", "decimal") and operador != "~" and not isinstance(valor, list):
+            minimo, maximo = meta["minimo"], meta["maximo"]
+            if minimo is None or (operador == "=" and not minimo <= valor <= maximo) \
+                    or (operador in (">", ">=") and (maximo < valor or (operador == ">" and maximo == valor))) \
+                    or (operador in ("<", "<=") and (minimo > valor or (operador == "<" and minimo == valor))):
+                return None
+        if meta["tipo"] == "dicionario":
+            dicionario = self.dicionario(tabela, coluna)
+            if isinstance(valor, list) or operador in ("=", "~"):
+                predicado = comparador(operador, valor)
+                codigos = [i for i, texto in enumerate(dicionario) if i and predicado(texto)]
+                if not codigos:
+                    return None
+                if np is not None:
+                    return np.isin(self.brutos(tabela, coluna), codigos)
+                conjunto = set(codigos)
+                return [c in conjunto for c in self.brutos(tabela, coluna)]
+            if operador in (">", ">=", "<", "<=") and np is not None:
+                # Dicionário ordenado: a comparação de texto vira comparação de códigos
+                corte = (bisect.bisect_right if operador in (">", "<=") else bisect.bisect_left)(dicionario, valor, 1)
+                codigos = self.brutos(tabela, coluna)
+                return (codigos >= corte) if operador in (">", ">=") else ((codigos < corte) & (codigos > 0))
+        if np is not None and meta["tipo"] in ("inteiro", "decimal", "cnpj") and operador != "~":
+            brutos = self.brutos(tabela, coluna)
+            if meta["tipo"] == "cnpj":
+                valor = [v.encode("ascii") for v in valor] if isinstance(valor, list) else valor.encode("ascii")
+            if isinstance(valor, list):
+                return np.isin(brutos, valor)
+            resultado = {"=": np.equal, "!=": np.not_equal, ">": np.greater,
+                         ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}[operador](brutos, valor)
+            if meta["tipo"] == "inteiro":
+                return resultado & (brutos != NULO_INTEIRO)
+            if meta["tipo"] == "decimal":
+                return resultado & ~np.isnan(brutos)
+            return resultado
+        predicado = comparador(operador, valor)
+        resultado = [predicado(v) for v in self.valores(tabela, coluna)]
+        if np is not None:
+            return np.fromiter(resultado, dtype=bool, count=n)
+        return resultado
+
+    def fechar(self):
+        self.dicionarios.clear()
+        try:
+            self.mm.close()
+        except BufferError:
+            pass  # Ainda há arrays apontando para o mapa; o coletor fecha depois
+
+
+class BaseSnapshots:
+    # Pasta de segmentos; segura para várias threads (e várias instâncias:
+    # a criação e a junção de segmentos passam por uma trava de arquivo).
+    def __init__(self, pasta=None, np=True):
+        self.pasta = pasta or caminho_snapshots()
+        os.makedirs(self.pasta, exist_ok=True)
+        self.np = np  # True: NumPy se estiver instalado (importado na primeira leitura)
+        self.lock = threading.RLock()
+        self.segmentos = {}
+        self.atuais = None
+        self.pendentes = []
+        self.timer = None
+
+    def trava(self):
+        return trava_arquivo(os.path.join(self.pasta, "segmentos"))
+
+    # Escrita
+
+    def salvar(self, empresa, capturado=None):
+        # Guarda uma resposta da API (gravada em segundo plano)
+        if not isinstance(empresa, dict) or not empresa.get("taxId"):
+            return
+        with self.lock:
+            self.pendentes.append(linhas_empresa(empresa, capturado or time.time()))
+            if self.timer is None:
+                self.timer = threading.Timer(ATRASO_GRAVACAO, self.gravar_agendado)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def gravar_agendado(self):
+        try:
+            self.gravar_pendentes()
+        except Exception as e:
+            print(f"Erro ao gravar snapshots: {e}")
+
+    def gravar_pendentes(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            pendentes, self.pendentes = self.pendentes, []
+        if pendentes:
+            self.gravar_lote(pendentes)
+            self.juntar_pequenos()
+
+    def novo_caminho(self):
+        return os.path.join(self.pasta, f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.seg")
+
+    def gravar_lote(self, linhas, ao_progresso=None, ja_gravadas=0):
+        # Um segmento a cada LINHAS_POR_SEGMENTO empresas; devolve o total gravado
+        total = 0
+        for inicio in range(0, len(linhas), LINHAS_POR_SEGMENTO):
+            tabelas = tabelas_vazias()
+            for linha, filhas in linhas[inicio:inicio + LINHAS_POR_SEGMENTO]:
+                acrescentar(tabelas, linha, filhas)
+            with self.trava():
+                escrever_segmento(self.novo_caminho(), tabelas)
+            total += len(tabelas["empresas"]["cnpj"])
+            if ao_progresso:
+                ao_progresso(ja_gravadas + total)
+        return total
+
+    def juntar_pequenos(self, forcar=False):
+        # Junta os segmentos menores que LINHAS_POR_SEGMENTO (gravados a
+        # cada poucas consultas) de uma mesma faixa de tamanho, quando ela
+        # tem SEGMENTOS_PEQUENOS; o resultado pode completar a faixa
+        # seguinte. Com `forcar`, junta todos os pequenos de uma vez.
+        # Devolve quantos segmentos foram juntados.
+        juntados = 0
+        with self.trava():
+            while True:
+                self.atualizar()
+                pequenos = sorted(s for s, seg in self.segmentos.items() if seg.linhas() < LINHAS_POR_SEGMENTO)
+                if forcar:
+                    grupo = pequenos if len(pequenos) >= 2 else []
+                else:
+                    faixas = defaultdict(list)
+                    for nome in pequenos:
+                        faixas[faixa(self.segmentos[nome].linhas())].append(nome)
+                    grupo = next((nomes for _, nomes in sorted(faixas.items())
+                                  if len(nomes) >= SEGMENTOS_PEQUENOS), [])
+                if not grupo:
+                    return juntados
+                self.juntar(grupo)
+                juntados += len(grupo)
+                if forcar:
+                    return juntados
+
+    def juntar(self, nomes):
+        # Chamado com a trava de arquivo; um segmento novo substitui `nomes`
+        tabelas = tabelas_vazias()
+        for nome in nomes:
+            segmento = self.segmentos[nome]
+            deslocamento = len(tabelas["empresas"]["cnpj"])
+            for tabela, colunas in COLUNAS.items():
+                for coluna in colunas:
+                    valores = segmento.valores(tabela, coluna)
+                    if coluna == "linha":
+                        valores = [v + deslocamento for v in valores]
+                    tabelas[tabela][coluna].extend(valores)
+        escrever_segmento(self.novo_caminho(), tabelas, substitui=nomes)
+
+    # Leitura
+
+    def atualizar(self):
+        # Abre os segmentos novos e esquece os substituídos por uma junção
+        # (que são apagados aqui; no Windows, só quando ninguém os tiver aberto)
+        with self.lock:
+            if self.np is True:
+                try:
+                    import numpy
+                    self.np = numpy
+                except ImportError:
+                    self.np = None
+            nomes = {e.name for e in os.scandir(self.pasta) if e.name.endswith(".seg")}
+            for nome in sorted(nomes - set(self.segmentos)):
+                try:
+                    self.segmentos[nome] = Segmento(os.path.join(self.pasta, nome), self.np)
+                except (OSError, ValueError) as e:
+                    print(f"Erro ao abrir segmento {nome}: {e}")
+            substituidos = {s for seg in self.segmentos.values() for s in seg.cabecalho["substitui"]}
+            for nome in list(self.segmentos):
+                if nome not in nomes or nome in substituidos:
+                    self.segmentos.pop(nome).fechar()
+                    self.atuais = None
+                    if nome in nomes:
+                        try:
+                            os.remove(os.path.join(self.pasta, nome))
+                        except OSError:
+                            pass
+            if self.atuais is not None and set(self.atuais) != set(self.segmentos):
+                self.atuais = None
+            return [self.segmentos[nome] for nome in sorted(self.segmentos)]
+
+    def mascaras_atuais(self, segmentos):
+        # Por segmento, as linhas que são a captura mais recente do CNPJ
+        with self.lock:
+            if self.atuais is not None:
+                return self.atuais
+            np = self.np
+            if np is not None and segmentos:
+                cnpjs = np.concatenate([s.brutos("empresas", "cnpj") for s in segmentos])
+                capturas = np.concatenate([s.brutos("empresas", "capturado") for s in segmentos])
+                ordem = np.lexsort((np.arange(len(cnpjs)), capturas, cnpjs))
+                ultimas = np.ones(len(ordem), dtype=bool)
+                ultimas[:-1] = cnpjs[ordem][1:] != cnpjs[ordem][:-1]
+                atual = np.zeros(len(cnpjs), dtype=bool)
+                atual[ordem[ultimas]] = True
+                limites = np.cumsum([0] + [s.linhas() for s in segmentos])
+                self.atuais = {s.nome: atual[limites[i]:limites[i + 1]] for i, s in enumerate(segmentos)}
+            else:
+                melhores = {}
+                for s in segmentos:
+                    for i, (cnpj, capturado) in enumerate(zip(s.valores("empresas", "cnpj"),
+                                                             s.valores("empresas", "capturado"))):
+                        if cnpj not in melhores or capturado >= melhores[cnpj][0]:
+                            melhores[cnpj] = (capturado, s.nome, i)
+                marcas = {s.nome: [False] * s.linhas() for s in segmentos}
+                for _, nome, i in melhores.values():
+                    marcas[nome][i] = True
+                self.atuais = marcas
+            return self.atuais
+
+    def selecionar(self, segmento, filtros, atuais):
+        # Índices das empresas do segmento que passam em todos os filtros
+        np = self.np
+        mascara = atuais[segmento.nome] if atuais is not None else None
+        for coluna, operador, valor in filtros:
+            tabela, _, nome = coluna.rpartition(".")
+            parcial = segmento.mascara(tabela or "empresas", nome, operador, valor)
+            if parcial is None:
+                return []
+            if tabela:
+                # Filtro numa tabela filha: empresas com ao menos uma linha que passa
+                ligadas = segmento.brutos(tabela, "linha")
+                if np is not None:
+                    parcial = np.bincount(ligadas[parcial], minlength=segmento.linhas()) > 0
+                else:
+                    marcas = [False] * segmento.linhas()
+                    for linha, passa in zip(ligadas, parcial):
+                        if passa:
+                            marcas[linha] = True
+                    parcial = marcas
+            if mascara is None:
+                mascara = parcial
+            elif np is not None:
+                mascara = mascara & parcial
+            else:
+                mascara = [a and b for a, b in zip(mascara, parcial)]
+        if mascara is None:
+            return range(segmento.linhas())
+        if np is not None:
+            return np.flatnonzero(mascara)
+        return [i for i, passa in enumerate(mascara) if passa]
+
+    def consultar(self, filtros=(), colunas=None, limite=None, todas=False):
+        # Gera um dict por empresa que passa em todos os filtros, só com as
+        # `colunas` pedidas. Filtros: (coluna, operador, valor) ou texto
+        # ("uf=SP", "capital_social>1000000", "socios.cargo~administrador").
+        # Sem `todas`, só a captura mais recente de cada CNPJ.
+        filtros = [ler_filtro(f) if isinstance(f, str) else tuple(f) for f in filtros]
+        colunas = colunas or COLUNAS["empresas"]
+        self.gravar_pendentes()
+        segmentos = self.atualizar()
+        atuais = None if todas else self.mascaras_atuais(segmentos)
+        entregues = 0
+        for segmento in segmentos:
+            indices = self.selecionar(segmento, filtros, atuais)
+            if len(indices) == 0:
+                continue
+            if limite is not None:
+                indices = indices[:limite - entregues]
+            valores = [segmento.valores("empresas", c, indices) for c in colunas]
+            for linha in zip(*valores):
+                yield dict(zip(colunas, linha))
+            entregues += len(indices)
+            if limite is not None and entregues >= limite:
+                return
+
+    def contar(self, filtros=(), todas=False):
+        filtros = [ler_filtro(f) if isinstance(f, str) else tuple(f) for f in filtros]
+        self.gravar_pendentes()
+        segmentos = self.atualizar()
+        atuais = None if todas else self.mascaras_atuais(segmentos)
+        return sum(len(self.selecionar(s, filtros, atuais)) for s in segmentos)
+
+    def agrupar(self, coluna, filtros=(), somar=None, todas=False):
+        # {valor da coluna: [empresas, soma de `somar`]}, lendo só as duas colunas
+        filtros = [ler_filtro(f) if isinstance(f, str) else tuple(f) for f in filtros]
+        self.gravar_pendentes()
+        segmentos = self.atualizar()
+        atuais = None if todas else self.mascaras_atuais(segmentos)
+        grupos = defaultdict(lambda: [0, 0.0])
+        np = self.np
+        for segmento in segmentos:
+            indices = self.selecionar(segmento, filtros, atuais)
+            if len(indices) == 0:
+                continue
+            if np is not None and segmento.meta("empresas", coluna)["tipo"] == "dicionario" \
+                    and (not somar or tipo_coluna(somar) in ("inteiro", "decimal")):
+                # Contagem direta sobre os códigos do dicionário
+                codigos = segmento.brutos("empresas", coluna)[indices]
+                dicionario = segmento.dicionario("empresas", coluna)
+                quantidades = np.bincount(codigos, minlength=len(dicionario))
+                if somar:
+                    valores = segmento.brutos("empresas", somar)[indices].astype("<f8")
+                    nulos = np.isnan(valores) if tipo_coluna(somar) == "decimal" \
+                        else segmento.brutos("empresas", somar)[indices] == NULO_INTEIRO
+                    somas = np.bincount(codigos, weights=np.where(nulos, 0.0, valores), minlength=len(dicionario))
+                for codigo in np.flatnonzero(quantidades):
+                    grupo = grupos[dicionario[codigo]]
+                    grupo[0] += int(quantidades[codigo])
+                    if somar:
+                        grupo[1] += float(somas[codigo])
+                continue
+            chaves = segmento.valores("empresas", coluna, indices)
+            somas = segmento.valores("empresas", somar, indices) if somar else [None] * len(chaves)
+            for chave, valor in zip(chaves, somas):
+                grupo = grupos[chave]
+                grupo[0] += 1
+                if valor is not None:
+                    grupo[1] += valor
+        return dict(grupos)
+
+    def obter(self, cnpj):
+        # Última captura do CNPJ remontada no formato da API (só os campos guardados)
+        cnpj = limpar_cnpj(cnpj)
+        self.gravar_pendentes()
+        melhor = None
+        for segmento in self.atualizar():
+            for i in self.selecionar(segmento, [("cnpj", "=", cnpj)], None):
+                capturado = segmento.valores("empresas", "capturado", [i])[0]
+                if melhor is None or capturado >= melhor[0]:
+                    melhor = (capturado, segmento, int(i))
+        if melhor is None:
+            return None
+        _, segmento, i = melhor
+        linha = {c: segmento.valores("empresas", c, [i])[0] for c in COLUNAS["empresas"]}
+        filhas = {}
+        for tabela in FILHAS:
+            ligadas = [j for j, v in enumerate(segmento.valores(tabela, "linha")) if v == i]
+            colunas = COLUNAS[tabela][1:]
+            filhas[tabela] = [dict(zip(colunas, valores)) for valores in
+                              zip(*(segmento.valores(tabela, c, ligadas) for c in colunas))] if ligadas else []
+        return empresa_snapshot(linha, filhas)
+
+    def info(self):
+        self.gravar_pendentes()
+        segmentos = self.atualizar()
+        return {
+            "segmentos": len(segmentos),
+            "capturas": sum(s.linhas() for s in segmentos),
+            "bytes": sum(os.path.getsize(s.caminho) for s in segmentos),
+        }
+
+    def importar_cache(self, pasta=None, ao_progresso=None):
+        # Guarda as respostas do cache de consultas, com a data em que foram salvas
+        pasta = pasta or caminho_cache()
+        self.gravar_pendentes()
+        lote, total = [], 0
+        for nome_arquivo in os.listdir(pasta):
+            if not nome_arquivo.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(pasta, nome_arquivo), "r", encoding="utf-8") as f:
+                    entrada = json.load(f)
+                lote.append(linhas_empresa(entrada["empresa"], entrada.get("salvo_em") or time.time()))
+            except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                continue
+            if len(lote) >= LINHAS_POR_SEGMENTO:
+                total += self.gravar_lote(lote, ao_progresso, total)
+                lote = []
+        return total + self.gravar_lote(lote, ao_progresso, total)
+
+    def importar_lote(self, caminho, ao_progresso=None):
+        # Guarda um resultado de lote em JSONL gravado com --bruto
+        self.gravar_pendentes()
+        capturado = os.path.getmtime(caminho)
+        lote, total = [], 0
+        for _, _, empresa in registros_lote(caminho):
+            if empresa and empresa.get("taxId"):
+                lote.append(linhas_empresa(empresa, capturado))
+            if len(lote) >= LINHAS_POR_SEGMENTO:
+                total += self.gravar_lote(lote, ao_progresso, total)
+                lote = []
+        return total + self.gravar_lote(lote, ao_progresso, total)
+
+    def fechar(self):
+        try:
+            self.gravar_pendentes()
+        finally:
+            with self.lock:
+                for segmento in self.segmentos.values():
+                    segmento.fechar()
+                self.segmentos.clear()
+                self.atuais = None
+
+
+def aninhar(destino, caminho, valor):
+    chaves = caminho.split(".")
+    for chave in chaves[:-1]:
+        destino = destino.setdefault(chave, {})
+    destino[chaves[-1]] = valor
+
+
+def empresa_snapshot(linha, filhas):
+    # Inverso da projeção: monta o dict da API a partir das colunas
+    empresa = {}
+    for nome, campo in EMPRESA.campos.items():
+        valor = linha.get(nome)
+        if valor is None:
+            continue
+        if nome == "telefone":
+            digitos = "".join(c for c in valor if c.isdigit())
+            valor = [{"area": digitos[:2], "number": digitos[2:]}]
+        elif nome == "email":
+            valor = [{"address": valor}]
+        aninhar(empresa, campo.caminho, valor)
+    for tabela, (caminho, projecao) in FILHAS.items():
+        itens = []
+        for registro in filhas.get(tabela, []):
+            item = {}
+            for nome, campo in projecao.campos.items():
+                if registro.get(nome) is not None:
+                    aninhar(item, campo.caminho, registro[nome])
+            itens.append(item)
+        aninhar(empresa, caminho, itens)
+    return empresa
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m cnpj_core.snapshots",
+        description="Cópias das respostas obtidas, guardadas por coluna para consultas e análises"
+    )
+    parser.add_argument("--pasta", default=caminho_snapshots(), help="pasta dos segmentos")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    cache = sub.add_parser("importar-cache", help="guarda as respostas do cache de consultas")
+    cache.add_argument("--pasta-cache", default=caminho_cache())
+    lote = sub.add_parser("importar-lote", help="guarda um resultado de lote em JSONL (gravado com --bruto)")
+    lote.add_argument("arquivo")
+    sub.add_parser("juntar", help="junta os segmentos pequenos num só")
+    sub.add_parser("info", help="quantidade de segmentos, capturas e tamanho em disco")
+    consulta = sub.add_parser("consultar", help="empresas que passam nos filtros (ex.: situacao=Baixada uf=SP "
+                                                "'capital_social>1000000')")
+    consulta.add_argument("filtros", nargs="*", metavar="FILTRO")
+    consulta.add_argument("--colunas", nargs="+", default=["cnpj", "nome", "situacao", "uf", "capital_social"])
+    consulta.add_argument("--limite", type=int)
+    consulta.add_argument("--contar", action="store_true", help="só a quantidade")
+    consulta.add_argument("--todas", action="store_true", help="todas as capturas, não só a última de cada CNPJ")
+    grupo = sub.add_parser("agrupar", help="quantidade de empresas (e soma de uma coluna) por valor de outra")
+    grupo.add_argument("coluna")
+    grupo.add_argument("filtros", nargs="*", metavar="FILTRO")
+    grupo.add_argument("--somar", help="coluna numérica somada em cada grupo (ex.: capital_social)")
+    obter = sub.add_parser("obter", help="última captura de um CNPJ, em JSON")
+    obter.add_argument("cnpj")
+    args = parser.parse_args(argv)
+
+    for coluna in getattr(args, "colunas", None) or []:
+        if coluna not in COLUNAS["empresas"]:
+            parser.error(f"coluna desconhecida: {coluna} (use {', '.join(COLUNAS['empresas'])})")
+    try:
+        filtros = [ler_filtro(f) for f in getattr(args, "filtros", None) or []]
+    except ValueError as e:
+        parser.error(str(e))
+
+    base = BaseSnapshots(args.pasta)
+    try:
+        progresso = lambda n: print(f"\r{n} capturas guardadas", end="", file=sys.stderr, flush=True)
+        if args.comando == "importar-cache":
+            base.importar_cache(args.pasta_cache, progresso)
+            print(file=sys.stderr)
+        elif args.comando == "importar-lote":
+            base.importar_lote(args.arquivo, progresso)
+            print(file=sys.stderr)
+        elif args.comando == "juntar":
+            print(f"{base.juntar_pequenos(forcar=True)} segmentos juntados", file=sys.stderr)
+        elif args.comando == "info":
+            info = base.info()
+            print(f"{info['capturas']} capturas em {info['segmentos']} segmentos, "
+                  f"{info['bytes'] / 1024 / 1024:.1f} MiB")
+        elif args.comando == "consultar":
+            inicio = time.perf_counter()
+            if args.contar:
+                print(base.contar(filtros, args.todas))
+            else:
+                for registro in base.consultar(filtros, args.colunas, args.limite, args.todas):
+                    if "cnpj" in registro:
+                        registro["cnpj"] = format_cnpj(registro["cnpj"])
+                    print("  ".join("" if v is None else str(v) for v in registro.values()))
+            print(f"{(time.perf_counter() - inicio) * 1000:.0f} ms", file=sys.stderr)
+        elif args.comando == "agrupar":
+            grupos = base.agrupar(args.coluna, filtros, args.somar)
+            for chave, (quantidade, soma) in sorted(grupos.items(), key=lambda g: -g[1][0]):
+                print(f"{chave or '(vazio)'}  {quantidade}" + (f"  {soma:.2f}" if args.somar else ""))
+        else:
+            empresa = base.obter(args.cnpj)
+            if empresa is None:
+                print("CNPJ sem captura guardada", file=sys.stderr)
+                return 1
+            print(json.dumps(empresa, ensure_ascii=False, indent=2))
+    finally:
+        base.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
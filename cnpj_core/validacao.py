@@ -0,0 +1,106 @@
+import re
+
+# Validação dos dígitos verificadores (módulo 11) do CNPJ, inclusive no
+# formato alfanumérico da Receita (IN RFB 2.229/2024): os 12 primeiros
+# caracteres podem ser letras maiúsculas ou dígitos, e cada caractere vale
+# seu código ASCII menos 48 ("0" = 0, "A" = 17). Os dois últimos continuam
+# sendo dígitos numéricos.
+PESOS_DV1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+PESOS_DV2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+SEPARADORES = ".-/ \t"
+FORMATO = re.compile(r"[0-9A-Z]{12}[0-9]{2}")
+
+# Entradas maiores que isso nunca viram um CNPJ válido (14 caracteres mais
+# pontuação e espaços de sobra); evita matrizes enormes no caminho em lote.
+LARGURA_MAXIMA = 32
+
+REMOVER_SEPARADORES = str.maketrans("", "", SEPARADORES)
+
+# Classes de caractere usadas no caminho vetorizado
+INVALIDO, MANTER, IGNORAR = 0, 1, 2
+
+
+def limpar_cnpj(texto):
+    # Remove a pontuação e padroniza em maiúsculas, preservando letras
+    return str(texto).strip().upper().translate(REMOVER_SEPARADORES)
+
+
+def digito_verificador(base, pesos):
+    resto = sum((ord(c) - 48) * p for c, p in zip(base, pesos)) % 11
+    return "0" if resto < 2 else str(11 - resto)
+
+
+def cnpj_valido(cnpj):
+    # Espera o CNPJ já limpo (14 caracteres, sem pontuação)
+    if not FORMATO.fullmatch(cnpj) or cnpj == cnpj[0] * 14:
+        return False  # Sequências repetidas passam no módulo 11, mas não existem
+    dv1 = digito_verificador(cnpj[:12], PESOS_DV1)
+    dv2 = digito_verificador(cnpj[:12] + dv1, PESOS_DV2)
+    return cnpj[12:] == dv1 + dv2
+
+
+def validar_cnpj(texto):
+    # Caminho da caixa de texto: devolve o CNPJ limpo, ou None se inválido
+    cnpj = limpar_cnpj(texto)
+    return cnpj if cnpj_valido(cnpj) else None
+
+
+def validar_cnpjs(valores):
+    # Caminho em lote: recebe uma coluna de textos e devolve (cnpjs, validos),
+    # com os CNPJs limpos ("" nos inválidos) e uma máscara booleana. Usa NumPy
+    # quando instalado; sem ele, valida um a um.
+    try:
+        import numpy as np
+    except ImportError:
+        cnpjs = [validar_cnpj(v) or "" for v in valores]
+        return cnpjs, [bool(c) for c in cnpjs]
+    return validar_cnpjs_numpy(np, valores)
+
+
+def validar_cnpjs_numpy(np, valores):
+    textos = np.asarray(valores, dtype=str)
+    n = len(textos)
+    if n == 0:
+        return np.array([], dtype="U14"), np.zeros(0, dtype=bool)
+    
+    # Cada texto vira uma linha de códigos Unicode (UTF-32) de largura fixa;
+    # fora do ASCII nada é válido, então o resto do cálculo usa um byte por caractere
+    validos = np.char.str_len(textos) <= LARGURA_MAXIMA
+    largura = max(1, min(LARGURA_MAXIMA, textos.dtype.itemsize // 4))
+    codigos = textos.astype(f"U{largura}").view(np.uint32).reshape(n, largura)
+    validos &= (codigos < 128).all(axis=1)
+    codigos = np.where(codigos < 128, codigos, 0).astype(np.uint8)
+    
+    # Tabelas por código: maiúsculas e classe do caractere
+    maiusculas = np.arange(256, dtype=np.uint8)
+    maiusculas[ord("a"):ord("z") + 1] -= 32
+    classe = np.full(256, INVALIDO, dtype=np.uint8)
+    classe[ord("0"):ord("9") + 1] = MANTER
+    classe[ord("A"):ord("Z") + 1] = MANTER
+    classe[0] = IGNORAR  # Preenchimento da largura fixa
+    for c in SEPARADORES:
+        classe[ord(c)] = IGNORAR
+    
+    codigos = maiusculas[codigos]
+    classes = classe[codigos]
+    manter = classes == MANTER
+    validos &= (classes != INVALIDO).all(axis=1)
+    validos &= manter.sum(axis=1) == 14
+    
+    # Nas linhas válidas sobram exatamente 14 caracteres: compacta todos de uma vez
+    limpos = np.zeros((n, 14), dtype=np.uint8)
+    limpos[validos] = codigos[manter & validos[:, None]].reshape(-1, 14)
+    
+    # Dígitos verificadores sempre numéricos; cálculo do módulo 11 por matriz
+    valores_num = limpos.astype(np.int64) - 48
+    validos &= ((valores_num[:, 12:] >= 0) & (valores_num[:, 12:] <= 9)).all(axis=1)
+    validos &= (limpos != limpos[:, :1]).any(axis=1)
+    resto1 = (valores_num[:, :12] @ np.array(PESOS_DV1)) % 11
+    dv1 = np.where(resto1 < 2, 0, 11 - resto1)
+    resto2 = (valores_num[:, :12] @ np.array(PESOS_DV2[:12]) + dv1 * PESOS_DV2[12]) % 11
+    dv2 = np.where(resto2 < 2, 0, 11 - resto2)
+    validos &= (valores_num[:, 12] == dv1) & (valores_num[:, 13] == dv2)
+    
+    limpos[~validos] = 0
+    cnpjs = limpos.astype(np.uint32).view("U14").reshape(n)
+    return cnpjs, validos